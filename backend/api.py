@@ -1,48 +1,169 @@
 import os
+import re
+import time
+import json
+import base64
+import binascii
+import hashlib
+import threading
+import contextvars
+import argparse
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from urllib.parse import parse_qs, quote
 from typing import List, Optional, Dict, Any
+import anyio
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from datetime import date
+from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
-from pydantic import BaseModel
-from sqlalchemy import create_engine, text
-import json
+from fastapi.responses import RedirectResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.exc import OperationalError
 import typing
 from fastapi.responses import Response
 
+from normalization import normalize_cnpj, fold_text
+from response_cache import ResponseCache
+from compression import CompressionMiddleware, accepts_encoding
+from export import (EXPORT_BATCH_SIZE, EXPORT_FORMATS, iter_ndjson,
+                    iter_csv, iter_arrow, require_arrow, gzip_stream)
+
+
+try:
+    import orjson
+except ImportError:  # dependência opcional: sem ela, json da stdlib
+    orjson = None
+
+# Saída indentada só quando pedida (`?pretty=1`); ver PrettyQueryMiddleware.
+_pretty_output = contextvars.ContextVar("pretty_output", default=False)
 
-class PrettyJSONResponse(Response):
+
+class CompactJSONResponse(Response):
+    """
+    JSON compacto (orjson, se instalado) por padrão; indentado com 4
+    espaços quando a requisição pede `?pretty=1`.
+    """
     media_type = "application/json"
 
     def render(self, content: typing.Any) -> bytes:
+        if _pretty_output.get():
+            return json.dumps(
+                content,
+                ensure_ascii=False,
+                allow_nan=False,
+                indent=4,
+                separators=(", ", ": "),
+            ).encode("utf-8")
+        if orjson is not None:
+            return orjson.dumps(content)
         return json.dumps(
             content,
             ensure_ascii=False,
             allow_nan=False,
-            indent=4,       
-            separators=(", ", ": "),
+            separators=(",", ":"),
         ).encode("utf-8")
 
+
+class PrettyQueryMiddleware:
+    """Middleware ASGI que liga a saída indentada para `?pretty=1|true`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        pretty = query.get("pretty", [""])[-1].lower() in ("1", "true")
+        token = _pretty_output.set(pretty)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _pretty_output.reset(token)
+
 # ============================================================================
 # CONFIGURAÇÃO DO AMBIENTE E BANCO DE DADOS
 # ============================================================================
 
 
 DB_PATH = os.path.join(os.getcwd(), "teste_intu.db")
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+# A API só lê: conexões abertas em modo somente leitura (URI `mode=ro`).
+# Com o banco em WAL (deixado assim pela carga), leitores de vários
+# processos/workers não bloqueiam uns aos outros nem a recarga.
+SQLALCHEMY_DATABASE_URL = f"sqlite:///file:{quote(DB_PATH)}?mode=ro&uri=true"
+
+# Threads de requisição por worker; o pool de conexões tem o mesmo
+# tamanho, então nenhuma thread espera por conexão.
+API_THREADS = int(os.environ.get("API_THREADS", "8"))
+
+# PRAGMAs de leitura aplicados a cada conexão nova do pool.
+READ_PRAGMAS = {
+    "busy_timeout": 5000,
+    "cache_size": -32768,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=API_THREADS,
+    max_overflow=0,
+    pool_timeout=30,
 )
 
+# Exportações seguram a conexão durante todo o download (cursor em
+# streaming). Com o pool acima, API_THREADS exportações lentas
+# esgotariam as conexões e as consultas falhariam após `pool_timeout`.
+# Por isso elas usam um engine próprio, sem pool: cada download abre
+# a sua conexão somente leitura e a fecha ao terminar.
+export_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=NullPool,
+)
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(export_engine, "connect")
+def _apply_read_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in READ_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+# Cache de respostas: o banco só muda quando o pipeline recarrega, e a
+# carga grava a versão do dataset em `dataset_meta` (ver stage_3_db_test).
+RESPONSE_CACHE_CONTROL = "public, max-age=60"
+VERSION_CHECK_INTERVAL = 1.0
+
+response_cache = ResponseCache()
+_version_lock = threading.Lock()
+_version_state = {"value": None, "checked_at": float("-inf")}
+
+@asynccontextmanager
+async def lifespan(app):
+    # Rotas síncronas rodam no threadpool do anyio: limita-o ao tamanho
+    # do pool de conexões.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = API_THREADS
+    yield
+    engine.dispose()
+    export_engine.dispose()
+
+
 app = FastAPI(
     title="API Despesas Operadoras - Teste Intu",
     description="API para consulta de dados financeiros de operadoras ANS.",
     version="1.0.0",
-    default_response_class=PrettyJSONResponse
-
+    default_response_class=CompactJSONResponse,
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -51,6 +172,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(PrettyQueryMiddleware)
 
 # ============================================================================
 # MODELOS DE DADOS (PYDANTIC SCHEMAS)
@@ -71,9 +194,43 @@ class Despesa(BaseModel):
 
 class PaginatedResponse(BaseModel):
     data: List[Operadora]
-    total: int
-    page: int
+    total: Optional[int]
+    page: Optional[int]
     limit: int
+    next_cursor: Optional[str] = None
+
+
+# Máximo de CNPJs por chamada da consulta em lote.
+BATCH_MAX_CNPJS = 1000
+# Tamanho máximo de página da listagem de operadoras.
+LIST_MAX_LIMIT = 100
+
+
+class LoteRequest(BaseModel):
+    cnpjs: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_CNPJS)
+    incluir_despesas: bool = True
+
+
+class OperadoraDetalhe(Operadora):
+    despesas: Optional[List[Despesa]] = None
+
+
+class LoteResponse(BaseModel):
+    operadoras: List[OperadoraDetalhe]
+    nao_encontrados: List[str]
+
+
+class PontoSerie(BaseModel):
+    periodo: str
+    total: float
+    qtd_lancamentos: int
+    crescimento_pct: Optional[float]
+
+
+class SerieResponse(BaseModel):
+    cnpj: str
+    granularidade: str
+    pontos: List[PontoSerie]
 
 
 class EstatisticasResponse(BaseModel):
@@ -82,6 +239,87 @@ class EstatisticasResponse(BaseModel):
     top_5_operadoras: List[Dict[str, Any]]
     distribuicao_uf: List[Dict[str, Any]]
 
+# ============================================================================
+# CACHE DE RESPOSTAS
+# ============================================================================
+
+
+def get_dataset_version():
+    """
+    Retorna a versão do dataset gravada pela carga (ou None).
+
+    A leitura no banco é feita no máximo uma vez por
+    `VERSION_CHECK_INTERVAL` segundos por processo.
+    """
+    with _version_lock:
+        now = time.monotonic()
+        if now - _version_state["checked_at"] >= VERSION_CHECK_INTERVAL:
+            try:
+                with engine.connect() as conn:
+                    _version_state["value"] = conn.execute(text(
+                        "SELECT valor FROM dataset_meta WHERE chave = 'versao'"
+                    )).scalar()
+            except OperationalError:
+                # Banco anterior à tabela dataset_meta: sem cache.
+                _version_state["value"] = None
+            _version_state["checked_at"] = now
+        return _version_state["value"]
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(response_model):
+    return TypeAdapter(response_model)
+
+
+def render_json(response_model, data):
+    """Valida `data` contra o modelo de resposta e serializa em bytes."""
+    adapter = _type_adapter(response_model)
+    content = adapter.dump_python(adapter.validate_python(data), mode="json")
+    return CompactJSONResponse(content).body
+
+
+def cached_json(request, response_model, build):
+    """
+    Responde com cache em memória, ETag e revalidação condicional.
+
+    A chave é a rota + parâmetros da query; o ETag combina a versão do
+    dataset com essa chave. O 304 (ETag igual ou `*`) só sai depois que
+    o recurso existe: com o corpo em cache, sem consultar o banco nem
+    serializar nada; senão, `build` roda antes, e um 404/400 propaga
+    como tal.
+
+    Args:
+        request (Request): Requisição atual.
+        response_model: Tipo usado para validar/serializar a resposta.
+        build (callable): Consulta o banco e devolve os dados (só é
+            chamada em caso de cache miss). Exceções HTTP propagam.
+
+    Returns:
+        Response: 200 com o corpo JSON ou 304 sem corpo.
+    """
+    version = get_dataset_version()
+    if version is None:
+        return Response(render_json(response_model, build()),
+                        media_type="application/json")
+
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    key_hash = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+    etag = f'"{version}-{key_hash}"'
+    headers = {"ETag": etag, "Cache-Control": RESPONSE_CACHE_CONTROL}
+
+    body = response_cache.get(key, version)
+    if body is None:
+        body = render_json(response_model, build())
+        response_cache.set(key, version, body)
+
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/")
+                  for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type="application/json", headers=headers)
+
 # ============================================================================
 # ROTAS DA API (ENDPOINTS)
 # ============================================================================
@@ -92,52 +330,204 @@ def read_root():
 
 @app.get("/api/operadoras", response_model=PaginatedResponse)
 def list_operadoras(
-    page: int = 1,
-    limit: int = 10,
-    search: Optional[str] = None
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=LIST_MAX_LIMIT),
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None
 ):
-    offset = (page - 1) * limit
+    if cursor:
+        after = decode_cursor(cursor)
+        page = None
+    else:
+        after = None
+    if include_total is None:
+        include_total = cursor is None
 
-    with engine.connect() as conn:
-        sql_base = "SELECT CAST(cnpj AS TEXT) as cnpj, razao_social, uf, modalidade FROM dim_operadoras"
-        count_base = "SELECT COUNT(*) FROM dim_operadoras"
-        
-        params = {"limit": limit, "offset": offset}
-        where_clause = ""
+    return cached_json(
+        request, PaginatedResponse,
+        lambda: query_operadoras(page, limit, search, after, include_total))
+
+
+def encode_cursor(sort_key):
+    """Gera o cursor opaco (base64url) com a chave de ordenação da linha."""
+    raw = json.dumps(list(sort_key), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Lê um cursor gerado por `encode_cursor` (HTTP 400 se inválido)."""
+    try:
+        sort_key = json.loads(base64.urlsafe_b64decode(
+            cursor.encode("ascii")))
+        if not isinstance(sort_key, list) or not isinstance(
+                sort_key[-1], str):
+            raise ValueError(sort_key)
+    except (ValueError, TypeError, IndexError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return sort_key
 
-        if search:
-            where_clause = (
-                " WHERE razao_social LIKE :search OR CAST(cnpj AS TEXT) LIKE :search"
-            )
-            params["search"] = f"%{search}%"
 
-        query_count = text(f"{count_base}{where_clause}")
-        total = conn.execute(query_count, params).scalar()
+@lru_cache(maxsize=8)
+def _search_index_cached(version):
+    return _search_index_exists()
+
+
+def _search_index_exists():
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'busca_operadoras'"
+        )).first() is not None
+
+
+def search_index_available():
+    """Indica se a carga gerou o índice FTS5 `busca_operadoras`."""
+    version = get_dataset_version()
+    if version is None:
+        return _search_index_exists()
+    return _search_index_cached(version)
+
+
+def build_search(search):
+    """
+    Traduz o termo de busca em filtro SQL sobre `dim_operadoras o`.
+
+    - Só dígitos e pontuação de CNPJ: busca por prefixo do CNPJ como
+      intervalo na PRIMARY KEY (`cnpj >= '123' AND cnpj < '123:'`).
+    - Texto: MATCH no índice FTS5, com os termos sem acento e como
+      prefixo ("saude uni" -> "SAUDE"* "UNI"*); os resultados vêm
+      ranqueados (bm25).
+    - Sem FTS5 no banco: LIKE, como antes (varredura completa).
+
+    Returns:
+        tuple: (source, where, params, ranked), onde `source` é a
+        cláusula FROM.
+    """
+    source = "dim_operadoras o"
+    if not search or not search.strip():
+        return source, "", {}, False
+
+    digits = re.sub(r"[.\-/\s]", "", search)
+    if digits.isdigit():
+        return (source, " WHERE o.cnpj >= :cnpj_lo AND o.cnpj < :cnpj_hi",
+                {"cnpj_lo": digits, "cnpj_hi": digits + ":"}, False)
+
+    terms = re.findall(r"\w+", fold_text(search))
+    if terms and search_index_available():
+        match = " ".join(f'"{term}"*' for term in terms)
+        # CROSS JOIN fixa a ordem: o FTS5 acha os rowids e só então
+        # busca cada operadora pela chave (sem varrer dim_operadoras).
+        return ("busca_operadoras f "
+                "CROSS JOIN dim_operadoras o ON o.rowid = f.rowid",
+                " WHERE busca_operadoras MATCH :match",
+                {"match": match}, True)
+
+    return (source, " WHERE (o.razao_social LIKE :search OR o.cnpj LIKE :search)",
+            {"search": f"%{search}%"}, False)
+
+
+@lru_cache(maxsize=256)
+def _count_operadoras_cached(version, search):
+    return _count_operadoras(search)
+
+
+def _count_operadoras(search):
+    source, where_clause, params, _ = build_search(search)
+    with engine.connect() as conn:
+        return conn.execute(text(
+            f"SELECT COUNT(*) FROM {source}{where_clause}"),
+            params).scalar()
+
+
+def count_operadoras(search):
+    """
+    Conta as operadoras do filtro, reaproveitando o resultado enquanto a
+    versão do dataset não mudar (a contagem não é refeita a cada página).
+    """
+    version = get_dataset_version()
+    if version is None:
+        return _count_operadoras(search)
+    return _count_operadoras_cached(version, search)
+
+
+def query_operadoras(page, limit, search, after=None, include_total=True):
+    """
+    Lista operadoras, em ordem de (razao_social, cnpj) ou, numa busca
+    textual, por relevância (score, razao_social, cnpj).
+
+    Com `after` (cursor), usa paginação por chave: a busca continua do
+    ponto do cursor, com custo independente da profundidade (sem busca,
+    pelo índice `idx_operadoras_razao`). Sem cursor, mantém
+    `page`/`limit` (OFFSET) para o frontend. Nos dois modos,
+    `next_cursor` aponta para a página seguinte (None na última).
+    """
+    source, where_clause, params, ranked = build_search(search)
+    params["limit"] = limit + 1
+    columns = "o.cnpj, o.razao_social, o.uf, o.modalidade"
+
+    if ranked:
+        sort_columns = ["score", "razao_social", "cnpj"]
+        sql_from = (f"SELECT * FROM (SELECT {columns}, f.rank AS score "
+                    f"FROM {source}{where_clause})")
+        where_clause = ""
+    else:
+        sort_columns = ["o.razao_social", "o.cnpj"]
+        sql_from = f"SELECT {columns} FROM {source}"
+
+    if after is not None:
+        if len(after) != len(sort_columns):
+            raise HTTPException(status_code=400, detail="Cursor inválido.")
+        marks = [f":after_{i}" for i in range(len(after))]
+        params.update({mark[1:]: value for mark, value in zip(marks, after)})
+        if not ranked and after[0] is None:
+            # NULLs vêm primeiro na ordenação do SQLite.
+            keyset = ("((o.razao_social IS NULL AND o.cnpj > :after_1) "
+                      "OR o.razao_social IS NOT NULL)")
+        else:
+            keyset = f"({', '.join(sort_columns)}) > ({', '.join(marks)})"
+        where_clause += f" AND {keyset}" if where_clause else f" WHERE {keyset}"
+        offset_clause = ""
+    else:
+        params["offset"] = (page - 1) * limit
+        offset_clause = " OFFSET :offset"
 
+    with engine.connect() as conn:
         query_data = text(
-            f"{sql_base}{where_clause} "
-            "ORDER BY razao_social LIMIT :limit OFFSET :offset"
+            f"{sql_from}{where_clause} ORDER BY {', '.join(sort_columns)} "
+            f"LIMIT :limit{offset_clause}"
         )
-        result = conn.execute(query_data, params).mappings().all()
+        result = [dict(row) for row in
+                  conn.execute(query_data, params).mappings()]
+
+    next_cursor = None
+    if len(result) > limit:
+        result = result[:limit]
+        last = result[-1]
+        next_cursor = encode_cursor(
+            [last[column.removeprefix("o.")] for column in sort_columns])
 
     return {
         "data": result,
-        "total": total,
+        "total": count_operadoras(search) if include_total else None,
         "page": page,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 
 @app.get("/api/operadoras/{cnpj}", response_model=Operadora)
 def get_operadora(cnpj: str):
+    # A chave é normalizada aqui (14 dígitos, texto) e comparada direto
+    # com a coluna: sem CAST, a busca usa a PRIMARY KEY de dim_operadoras.
+    cnpj_key = normalize_cnpj(cnpj)
     with engine.connect() as conn:
-        # CORREÇÃO DE TIPO AQUI TAMBÉM
         query = text("""
-            SELECT CAST(cnpj AS TEXT) as cnpj, razao_social, uf, modalidade 
+            SELECT cnpj, razao_social, uf, modalidade 
             FROM dim_operadoras 
-            WHERE CAST(cnpj AS TEXT) = :cnpj
+            WHERE cnpj = :cnpj
         """)
-        result = conn.execute(query, {"cnpj": cnpj}).mappings().first()
+        result = conn.execute(query, {"cnpj": cnpj_key}).mappings().first()
 
     if not result:
         raise HTTPException(
@@ -148,11 +538,70 @@ def get_operadora(cnpj: str):
     return result
 
 
+@app.post("/api/operadoras/lote", response_model=LoteResponse)
+def get_operadoras_lote(lote: LoteRequest):
+    """
+    Perfis (e históricos) de até `BATCH_MAX_CNPJS` operadoras de uma vez.
+
+    Uma consulta por tabela, com `IN` expandido sobre as chaves
+    normalizadas (usa a PRIMARY KEY e `idx_despesas_cnpj`), no lugar de
+    duas requisições e três consultas por operadora.
+    """
+    keys = {}
+    for cnpj in lote.cnpjs:
+        key = normalize_cnpj(cnpj)
+        if key is not None:
+            keys.setdefault(key, cnpj)
+
+    perfis, despesas = {}, {}
+    if keys:
+        with engine.connect() as conn:
+            q_perfis = text("""
+                SELECT cnpj, razao_social, uf, modalidade
+                FROM dim_operadoras
+                WHERE cnpj IN :cnpjs
+            """).bindparams(bindparam("cnpjs", expanding=True))
+            for row in conn.execute(q_perfis, {"cnpjs": list(keys)}).mappings():
+                perfis[row["cnpj"]] = dict(row)
+
+            if lote.incluir_despesas and perfis:
+                q_despesas = text("""
+                    SELECT cnpj, data_referencia, valor_despesa
+                    FROM fact_despesas
+                    WHERE cnpj IN :cnpjs
+                    ORDER BY cnpj, data_referencia DESC
+                """).bindparams(bindparam("cnpjs", expanding=True))
+                for cnpj, data_ref, valor in conn.execute(
+                        q_despesas, {"cnpjs": list(perfis)}):
+                    despesas.setdefault(cnpj, []).append(
+                        {"data_referencia": data_ref,
+                         "valor_despesa": valor})
+
+    operadoras = []
+    for key, perfil in ((k, perfis.get(k)) for k in keys):
+        if perfil is None:
+            continue
+        if lote.incluir_despesas:
+            perfil["despesas"] = despesas.get(key, [])
+        operadoras.append(perfil)
+
+    nao_encontrados = [cnpj for cnpj in lote.cnpjs
+                       if normalize_cnpj(cnpj) not in perfis]
+
+    return {"operadoras": operadoras, "nao_encontrados": nao_encontrados}
+
+
 @app.get("/api/operadoras/{cnpj}/despesas", response_model=List[Despesa])
-def get_historico_despesas(cnpj: str):
+def get_historico_despesas(cnpj: str, request: Request):
+    return cached_json(request, List[Despesa],
+                       lambda: query_historico_despesas(cnpj))
+
+
+def query_historico_despesas(cnpj):
+    cnpj_key = normalize_cnpj(cnpj)
     with engine.connect() as conn:
-        check_op = text("SELECT 1 FROM dim_operadoras WHERE CAST(cnpj AS TEXT) = :cnpj")
-        exists = conn.execute(check_op, {"cnpj": cnpj}).first()
+        check_op = text("SELECT 1 FROM dim_operadoras WHERE cnpj = :cnpj")
+        exists = conn.execute(check_op, {"cnpj": cnpj_key}).first()
 
         if not exists:
             raise HTTPException(
@@ -163,51 +612,243 @@ def get_historico_despesas(cnpj: str):
         query = text("""
             SELECT data_referencia, valor_despesa
             FROM fact_despesas
-            WHERE CAST(cnpj AS TEXT) = :cnpj
+            WHERE cnpj = :cnpj
             ORDER BY data_referencia DESC
         """)
-        result = conn.execute(query, {"cnpj": cnpj}).mappings().all()
+        result = [dict(row) for row in
+                  conn.execute(query, {"cnpj": cnpj_key}).mappings()]
 
     return result
 
-@app.get("/api/estatisticas", response_model=EstatisticasResponse)
-def get_estatisticas():
+# Agrupamento de cada granularidade da série sobre agg_operadora_trimestre.
+SERIE_PERIODOS = {
+    "trimestre": "data_referencia",
+    "ano": "substr(data_referencia, 1, 4)",
+}
+
+
+@app.get("/api/operadoras/{cnpj}/serie", response_model=SerieResponse)
+def get_serie_despesas(
+    cnpj: str,
+    request: Request,
+    granularidade: str = "trimestre"
+):
+    if granularidade not in SERIE_PERIODOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Granularidade inválida. Use um de {list(SERIE_PERIODOS)}.")
+    return cached_json(request, SerieResponse,
+                       lambda: query_serie_despesas(cnpj, granularidade))
+
+
+def query_serie_despesas(cnpj, granularidade):
+    """
+    Série de despesas da operadora, já somada por período.
+
+    Lê o agregado materializado pela carga (uma linha por trimestre) em
+    vez dos lançamentos brutos; o crescimento em relação ao período
+    anterior é calculado no SQL com LAG.
+    """
+    cnpj_key = normalize_cnpj(cnpj)
+    periodo = SERIE_PERIODOS[granularidade]
     with engine.connect() as conn:
-        q_total = text("SELECT SUM(valor_despesa) FROM fact_despesas")
-        total_despesas = conn.execute(q_total).scalar() or 0.0
+        query = text(f"""
+            WITH serie AS (
+                SELECT {periodo} AS periodo,
+                       SUM(total) AS total,
+                       SUM(qtd_lancamentos) AS qtd_lancamentos
+                FROM agg_operadora_trimestre
+                WHERE cnpj = :cnpj
+                GROUP BY 1
+            )
+            SELECT periodo, total, qtd_lancamentos,
+                   CASE WHEN anterior > 0
+                        THEN ROUND((total - anterior) / anterior * 100, 2)
+                   END AS crescimento_pct
+            FROM (SELECT *, LAG(total) OVER (ORDER BY periodo) AS anterior
+                  FROM serie)
+            ORDER BY periodo
+        """)
+        pontos = [dict(row) for row in
+                  conn.execute(query, {"cnpj": cnpj_key}).mappings()]
+
+        if not pontos:
+            check_op = text("SELECT 1 FROM dim_operadoras WHERE cnpj = :cnpj")
+            if not conn.execute(check_op, {"cnpj": cnpj_key}).first():
+                raise HTTPException(
+                    status_code=404,
+                    detail="Operadora não encontrada."
+                )
+
+    return {"cnpj": cnpj_key, "granularidade": granularidade,
+            "pontos": pontos}
 
-        q_media = text("SELECT AVG(valor_despesa) FROM fact_despesas")
-        media_despesas = conn.execute(q_media).scalar() or 0.0
+
+@app.get("/api/estatisticas", response_model=EstatisticasResponse)
+def get_estatisticas(request: Request):
+    return cached_json(request, EstatisticasResponse, query_estatisticas)
+
+
+def query_estatisticas():
+    # Lê os agregados materializados pela carga (stage_3_db_test): o custo
+    # não depende do tamanho de fact_despesas.
+    with engine.connect() as conn:
+        q_resumo = text("""
+            SELECT total_geral, media_lancamento FROM agg_resumo WHERE id = 1
+        """)
+        resumo = conn.execute(q_resumo).mappings().first()
 
         q_top5 = text("""
-            SELECT o.razao_social, SUM(d.valor_despesa) as total
-            FROM fact_despesas d
-            JOIN dim_operadoras o ON d.cnpj = o.cnpj
-            GROUP BY o.razao_social
-            ORDER BY total DESC
+            SELECT razao_social, total
+            FROM agg_top_operadoras
+            ORDER BY posicao
             LIMIT 5
         """)
-        top_5 = conn.execute(q_top5).mappings().all()
-
-        q_uf = text("""
-            SELECT o.uf, SUM(d.valor_despesa) as total
-            FROM fact_despesas d
-            JOIN dim_operadoras o ON d.cnpj = o.cnpj
-            WHERE o.uf != 'Não Informado'
-            GROUP BY o.uf
-            ORDER BY total DESC
-        """)
-        dist_uf = conn.execute(q_uf).mappings().all()
+        top_5 = [dict(row) for row in conn.execute(q_top5).mappings()]
+
+        q_uf = text("SELECT uf, total FROM agg_uf ORDER BY total DESC")
+        dist_uf = [dict(row) for row in conn.execute(q_uf).mappings()]
 
     return {
-        "total_geral": total_despesas,
-        "media_lancamento": media_despesas,
+        "total_geral": resumo["total_geral"] if resumo else 0.0,
+        "media_lancamento": resumo["media_lancamento"] if resumo else 0.0,
         "top_5_operadoras": top_5,
         "distribuicao_uf": dist_uf
     }
 
 
+EXPORT_COLUMNS = ["cnpj", "razao_social", "uf", "modalidade",
+                  "data_referencia", "valor_despesa"]
+EXPORT_TYPES = ["str", "str", "str", "str", "str", "float"]
+
+
+def _parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400,
+                            detail=f"{name} inválida: use AAAA-MM-DD.")
+
+
+def build_export_query(cnpj, uf, modalidade, data_inicio, data_fim):
+    """Monta o SELECT filtrado da exportação (fato + dimensão)."""
+    filters, params = [], {}
+    if cnpj:
+        keys = sorted({key for key in map(normalize_cnpj, cnpj) if key})
+        marks = [f":cnpj_{i}" for i in range(len(keys))]
+        # Nenhum CNPJ válido: o filtro não deve casar com nada.
+        filters.append(f"d.cnpj IN ({', '.join(marks)})" if keys else "0")
+        params.update({mark[1:]: key for mark, key in zip(marks, keys)})
+    if uf:
+        filters.append("o.uf = :uf")
+        params["uf"] = uf.upper()
+    if modalidade:
+        filters.append("o.modalidade = :modalidade")
+        params["modalidade"] = modalidade
+    if data_inicio:
+        filters.append("d.data_referencia >= :data_inicio")
+        params["data_inicio"] = data_inicio
+    if data_fim:
+        filters.append("d.data_referencia <= :data_fim")
+        params["data_fim"] = data_fim
+
+    where_clause = f" WHERE {' AND '.join(filters)}" if filters else ""
+    join = "JOIN" if uf or modalidade else "LEFT JOIN"
+    return text(
+        "SELECT d.cnpj, o.razao_social, o.uf, o.modalidade, "
+        "d.data_referencia, d.valor_despesa "
+        f"FROM fact_despesas d {join} dim_operadoras o ON o.cnpj = d.cnpj"
+        f"{where_clause}"
+    ), params
+
+
+def iter_export_batches(query, params):
+    """
+    Percorre o resultado com cursor no servidor, em lotes.
+
+    A conexão é aberta dentro do gerador, no `export_engine` (fora do
+    pool das consultas), e fica viva só enquanto o StreamingResponse
+    consome os lotes.
+    """
+    with export_engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=EXPORT_BATCH_SIZE
+        ).execute(query, params)
+        for partition in result.partitions(EXPORT_BATCH_SIZE):
+            yield [tuple(row) for row in partition]
+
+
+@app.get("/api/export/despesas")
+def export_despesas(
+    request: Request,
+    formato: str = "ndjson",
+    cnpj: Optional[List[str]] = Query(None),
+    uf: Optional[str] = None,
+    modalidade: Optional[str] = None,
+    data_inicio: Optional[str] = None,
+    data_fim: Optional[str] = None
+):
+    """
+    Exporta `fact_despesas` filtrada em NDJSON, CSV ou Arrow IPC.
+
+    O resultado é transmitido em lotes (memória limitada), e comprimido
+    em gzip quando o `Accept-Encoding` do cliente aceita gzip (q > 0).
+    """
+    if formato not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato inválido. Use um de {sorted(EXPORT_FORMATS)}.")
+    if formato == "arrow":
+        try:
+            require_arrow()
+        except ImportError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+
+    query, params = build_export_query(
+        cnpj, uf, modalidade,
+        _parse_date(data_inicio, "data_inicio"),
+        _parse_date(data_fim, "data_fim"))
+    batches = iter_export_batches(query, params)
+
+    if formato == "ndjson":
+        body = iter_ndjson(batches, EXPORT_COLUMNS)
+    elif formato == "csv":
+        body = iter_csv(batches, EXPORT_COLUMNS)
+    else:
+        body = iter_arrow(batches, EXPORT_COLUMNS, EXPORT_TYPES)
+
+    media_type, extension = EXPORT_FORMATS[formato]
+    headers = {"Content-Disposition":
+               f'attachment; filename="despesas.{extension}"',
+               "Vary": "Accept-Encoding"}
+    # Só gzip: a exportação não tem stream em brotli.
+    if accepts_encoding(request.headers.get("accept-encoding", ""), "gzip"):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
 app.mount("/app", StaticFiles(directory="frontend", html=True), name="frontend")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor da API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("API_WORKERS", "1")),
+                        help="Processos uvicorn (cada um com seu pool de "
+                             "API_THREADS conexões somente leitura).")
+    parser.add_argument("--no-reload", action="store_true",
+                        help="Desliga o auto-reload (já desligado com "
+                             "--workers > 1).")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    uvicorn.run("api:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    args = parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.port,
+                workers=args.workers,
+                reload=args.workers == 1 and not args.no_reload)
\ No newline at end of file
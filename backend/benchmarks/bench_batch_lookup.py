@@ -0,0 +1,51 @@
+"""
+Benchmark da consulta em lote (`POST /api/operadoras/lote`).
+
+Simula a conciliação que busca perfil e histórico de 1.000 operadoras:
+primeiro com duas requisições por operadora (`/api/operadoras/{cnpj}` e
+`/despesas`), depois com uma chamada ao endpoint em lote. Usa o mesmo
+banco sintético e servidor local do `load_test.py`.
+
+Uso:
+    python backend/benchmarks/bench_batch_lookup.py
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+import requests
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from load_test import build_dataset, run_server  # noqa: E402
+
+LOOKUPS = 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        cnpjs = random.Random(1).sample(build_dataset(workdir), LOOKUPS)
+        with run_server(workdir, workers=1) as base_url:
+            session = requests.Session()
+
+            start = time.perf_counter()
+            for cnpj in cnpjs:
+                session.get(f"{base_url}/api/operadoras/{cnpj}").json()
+                session.get(f"{base_url}/api/operadoras/{cnpj}/despesas").json()
+            one_by_one = time.perf_counter() - start
+
+            start = time.perf_counter()
+            body = session.post(f"{base_url}/api/operadoras/lote",
+                                json={"cnpjs": cnpjs}).json()
+            batch = time.perf_counter() - start
+
+    assert len(body["operadoras"]) == LOOKUPS
+    print(f"{LOOKUPS} operadoras: uma a uma {one_by_one:.2f}s "
+          f"({2 * LOOKUPS} requisições) | lote {batch * 1000:.0f} ms "
+          f"(1 requisição)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark das buscas por CNPJ usadas pela API (`/api/operadoras/{cnpj}`).
+
+Compara, em bancos SQLite de tamanhos crescentes, o filtro antigo
+(`WHERE CAST(cnpj AS TEXT) = :cnpj`, que impede o uso de índice) com o
+filtro sargável (`WHERE cnpj = :cnpj` sobre a chave normalizada de 14
+dígitos). Com o índice, o tempo por busca fica praticamente constante
+(O(log n)); com o CAST, cresce linearmente com a tabela fato.
+
+Uso:
+    python backend/benchmarks/bench_cnpj_lookup.py
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stage_3_db_test import SQLITE_SCHEMA, SQLITE_INDEXES  # noqa: E402
+
+FACT_SIZES = [10_000, 100_000, 1_000_000]
+ROWS_PER_OPERATOR = 50
+LOOKUPS = 200
+
+QUERY_CAST = ("SELECT data_referencia, valor_despesa FROM fact_despesas "
+              "WHERE CAST(cnpj AS TEXT) = ? ORDER BY data_referencia DESC")
+QUERY_SARGABLE = ("SELECT data_referencia, valor_despesa FROM fact_despesas "
+                  "WHERE cnpj = ? ORDER BY data_referencia DESC")
+
+
+def build_db(path, fact_rows):
+    """Cria um banco sintético com o schema e os índices do loader."""
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    operators = [f"{i:014d}" for i in range(fact_rows // ROWS_PER_OPERATOR)]
+    conn.executemany("INSERT INTO dim_operadoras (cnpj) VALUES (?)",
+                     ((c,) for c in operators))
+    quarters = ["2025-01-01", "2025-04-01", "2025-07-01"]
+    conn.executemany(
+        "INSERT INTO fact_despesas (cnpj, data_referencia, valor_despesa) "
+        "VALUES (?, ?, ?)",
+        ((operators[i % len(operators)], quarters[i % 3], float(i))
+         for i in range(fact_rows)))
+    for ddl in SQLITE_INDEXES.values():
+        conn.execute(ddl)
+    conn.commit()
+    return conn, operators
+
+
+def time_lookups(conn, query, keys):
+    """Tempo médio (ms) por busca."""
+    start = time.perf_counter()
+    for key in keys:
+        conn.execute(query, (key,)).fetchall()
+    return (time.perf_counter() - start) * 1000 / len(keys)
+
+
+def main():
+    print(f"{'linhas fato':>12} | {'CAST (ms)':>10} | {'sargável (ms)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in FACT_SIZES:
+            conn, operators = build_db(os.path.join(tmp, f"{size}.db"), size)
+            keys = random.sample(operators, min(LOOKUPS, len(operators)))
+            cast_ms = time_lookups(conn, QUERY_CAST, keys[:20])
+            index_ms = time_lookups(conn, QUERY_SARGABLE, keys)
+            print(f"{size:>12,} | {cast_ms:>10.3f} | {index_ms:>13.3f}")
+            if size == FACT_SIZES[-1]:
+                for label, query in (("CAST", QUERY_CAST),
+                                     ("sargável", QUERY_SARGABLE)):
+                    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}",
+                                        (keys[0],)).fetchall()
+                    print(f"   plano {label}: {[row[-1] for row in plan]}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
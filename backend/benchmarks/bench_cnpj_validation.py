@@ -0,0 +1,55 @@
+"""
+Benchmark da validação de CNPJ da etapa 2.1.
+
+Compara `df['CNPJ'].apply(validate_cnpj_math)` (uma chamada Python por
+lançamento) com `validate_cnpj_vectorized` (NumPy, uma vez por CNPJ
+distinto) em colunas sintéticas com o perfil dos dados da ANS: poucos
+milhares de operadoras repetidas em milhões de lançamentos.
+
+Uso:
+    python backend/benchmarks/bench_cnpj_validation.py
+"""
+import os
+import sys
+import time
+import random
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
+                                             'tests')))
+
+from stage_2_1_validation import (validate_cnpj_math,  # noqa: E402
+                                  validate_cnpj_vectorized)
+from test_validation import make_valid_cnpj  # noqa: E402
+
+ROW_COUNTS = [100_000, 1_000_000, 5_000_000]
+OPERATORS = 2_000
+
+
+def main():
+    rng = random.Random(0)
+    operators = [make_valid_cnpj(rng) for _ in range(OPERATORS)]
+    operators += [c[:13] + '0' for c in operators[:OPERATORS // 10]]
+
+    print(f"{'lançamentos':>12} | {'apply (s)':>9} | {'vetorizado (s)':>14} | "
+          f"{'ganho':>6}")
+    for rows in ROW_COUNTS:
+        series = pd.Series(rng.choices(operators, k=rows), dtype=object)
+
+        start = time.perf_counter()
+        expected = series.apply(validate_cnpj_math)
+        apply_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = validate_cnpj_vectorized(series)
+        vector_s = time.perf_counter() - start
+
+        assert result.equals(expected)
+        print(f"{rows:>12,} | {apply_s:>9.2f} | {vector_s:>14.3f} | "
+              f"{apply_s / vector_s:>5.0f}x")
+
+
+if __name__ == "__main__":
+    main()
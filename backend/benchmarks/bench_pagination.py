@@ -0,0 +1,88 @@
+"""
+Benchmark da listagem paginada de operadoras (`/api/operadoras`).
+
+Percorre o cadastro inteiro de páginas de 100 linhas, de duas formas.
+A primeira é a paginação antiga por OFFSET, com um `COUNT(*)` a cada
+página. A segunda é a paginação por chave (cursor) sobre
+`(razao_social, cnpj)`. Com OFFSET, cada página relê todas as anteriores,
+então percorrer tudo é O(n²). Com cursor, o custo é O(n).
+
+Uso:
+    python backend/benchmarks/bench_pagination.py
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stage_3_db_test import SQLITE_SCHEMA  # noqa: E402
+
+REGISTRY_SIZES = [10_000, 50_000, 200_000]
+PAGE_SIZE = 100
+
+QUERY_OFFSET = ("SELECT cnpj, razao_social, uf, modalidade "
+                "FROM dim_operadoras ORDER BY razao_social "
+                "LIMIT ? OFFSET ?")
+QUERY_COUNT = "SELECT COUNT(*) FROM dim_operadoras"
+QUERY_FIRST = ("SELECT cnpj, razao_social, uf, modalidade "
+               "FROM dim_operadoras ORDER BY razao_social, cnpj LIMIT ?")
+QUERY_KEYSET = ("SELECT cnpj, razao_social, uf, modalidade "
+                "FROM dim_operadoras WHERE (razao_social, cnpj) > (?, ?) "
+                "ORDER BY razao_social, cnpj LIMIT ?")
+
+
+def build_db(path, size):
+    """Cria um cadastro sintético com o schema (e índices) do loader."""
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO dim_operadoras (cnpj, razao_social, uf) VALUES (?, ?, ?)",
+        ((f"{i:014d}", f"OPERADORA {(i * 7919) % size:07d}", "SP")
+         for i in range(size)))
+    conn.commit()
+    return conn
+
+
+def walk_offset(conn):
+    """Percorre tudo com OFFSET + COUNT por página."""
+    rows, offset = 0, 0
+    while True:
+        conn.execute(QUERY_COUNT).fetchone()
+        page = conn.execute(QUERY_OFFSET, (PAGE_SIZE, offset)).fetchall()
+        if not page:
+            return rows
+        rows += len(page)
+        offset += PAGE_SIZE
+
+
+def walk_keyset(conn):
+    """Percorre tudo por cursor (razao_social, cnpj)."""
+    page = conn.execute(QUERY_FIRST, (PAGE_SIZE,)).fetchall()
+    rows = 0
+    while page:
+        rows += len(page)
+        last = page[-1]
+        page = conn.execute(QUERY_KEYSET,
+                            (last[1], last[0], PAGE_SIZE)).fetchall()
+    return rows
+
+
+def main():
+    print(f"{'operadoras':>12} | {'OFFSET (s)':>10} | {'cursor (s)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in REGISTRY_SIZES:
+            conn = build_db(os.path.join(tmp, f"{size}.db"), size)
+            timings = []
+            for walk in (walk_offset, walk_keyset):
+                start = time.perf_counter()
+                assert walk(conn) == size
+                timings.append(time.perf_counter() - start)
+            print(f"{size:>12,} | {timings[0]:>10.3f} | {timings[1]:>10.3f}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
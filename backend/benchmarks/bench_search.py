@@ -0,0 +1,114 @@
+"""
+Benchmark da busca de operadoras (`/api/operadoras?search=...`).
+
+Compara, em cadastros sintéticos crescentes, a busca antiga
+(`razao_social LIKE '%x%' OR cnpj LIKE '%x%'`, que sempre varre a tabela)
+com o índice FTS5 sem acentos que a carga gera (`busca_operadoras`), e
+com a busca por prefixo de CNPJ na PRIMARY KEY. Cada busca mede a
+primeira página (10 linhas) mais a contagem total, como na API.
+
+O LIKE custa O(cadastro) em qualquer busca. O FTS5 custa O(resultados):
+um termo seletivo fica em poucos ms mesmo com meio milhão de operadoras,
+enquanto um termo muito comum ("SAU", presente em 1/6 dos nomes
+sintéticos) precisa ranquear todos os acertos.
+
+Uso:
+    python backend/benchmarks/bench_search.py
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stage_3_db_test import (SQLITE_SCHEMA, SEARCH_SCHEMA,  # noqa: E402
+                             refresh_search_index)
+
+REGISTRY_SIZES = [10_000, 100_000, 500_000]
+SEARCHES = 50
+SYLLABLES = ["BA", "CO", "DI", "FA", "GU", "LI", "MA", "NE", "PO", "RI",
+             "SA", "TE", "VA", "ZO"]
+COMMON_WORDS = ["SAÚDE", "MÉDICA", "ASSISTÊNCIA", "UNIMED", "ODONTO", "CLÍNICA",
+         "HOSPITAL", "COOPERATIVA", "PLANO", "VIDA", "BEM", "ESTAR",
+         "SÃO", "JOSÉ", "SANTA", "CASA", "GRUPO", "SERVIÇOS"]
+
+QUERY_LIKE = ("SELECT cnpj, razao_social FROM dim_operadoras "
+              "WHERE razao_social LIKE :s OR cnpj LIKE :s "
+              "ORDER BY razao_social LIMIT 10")
+COUNT_LIKE = ("SELECT COUNT(*) FROM dim_operadoras "
+              "WHERE razao_social LIKE :s OR cnpj LIKE :s")
+QUERY_FTS = ("SELECT o.cnpj, o.razao_social FROM busca_operadoras f "
+             "CROSS JOIN dim_operadoras o ON o.rowid = f.rowid "
+             "WHERE busca_operadoras MATCH :m "
+             "ORDER BY f.rank, o.razao_social, o.cnpj LIMIT 10")
+COUNT_FTS = ("SELECT COUNT(*) FROM busca_operadoras "
+             "WHERE busca_operadoras MATCH :m")
+QUERY_PREFIX = ("SELECT cnpj, razao_social FROM dim_operadoras "
+                "WHERE cnpj >= :lo AND cnpj < :hi "
+                "ORDER BY razao_social, cnpj LIMIT 10")
+COUNT_PREFIX = ("SELECT COUNT(*) FROM dim_operadoras "
+                "WHERE cnpj >= :lo AND cnpj < :hi")
+
+
+def build_db(path, size, rng):
+    """
+    Cria um cadastro sintético e o índice de busca da carga.
+
+    Cada nome tem duas palavras comuns e uma rara (vocabulário que cresce
+    com o cadastro, como nomes próprios). Devolve também as palavras raras.
+    """
+    rare_words = sorted({"".join(rng.choices(SYLLABLES, k=4))
+                         for _ in range(size // 5)})
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    conn.executescript(SEARCH_SCHEMA)
+    conn.executemany(
+        "INSERT INTO dim_operadoras (cnpj, razao_social) VALUES (?, ?)",
+        ((f"{rng.randrange(10**14):014d}",
+          " ".join(rng.sample(COMMON_WORDS, 2) + [rng.choice(rare_words)]))
+         for _ in range(size)))
+    refresh_search_index(conn)
+    conn.commit()
+    return conn, rare_words
+
+
+def time_searches(conn, pairs):
+    """Tempo médio (ms) por busca (página + contagem)."""
+    start = time.perf_counter()
+    for (query, count), params in pairs:
+        conn.execute(query, params).fetchall()
+        conn.execute(count, params).fetchone()
+    return (time.perf_counter() - start) * 1000 / len(pairs)
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'operadoras':>12} | {'LIKE (ms)':>10} | "
+          f"{'FTS5 raro (ms)':>14} | {'FTS5 comum (ms)':>15} | "
+          f"{'prefixo CNPJ (ms)':>17}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in REGISTRY_SIZES:
+            conn, rare_words = build_db(os.path.join(tmp, f"{size}.db"),
+                                        size, rng)
+            terms = rng.sample(rare_words, SEARCHES)
+            prefixes = [f"{rng.randrange(1000):03d}" for _ in range(SEARCHES)]
+            like_ms = time_searches(conn, [
+                ((QUERY_LIKE, COUNT_LIKE), {"s": f"%{t}%"})
+                for t in terms[:10]])
+            rare_ms = time_searches(conn, [
+                ((QUERY_FTS, COUNT_FTS), {"m": f'"{t}"*'}) for t in terms])
+            common_ms = time_searches(conn, [
+                ((QUERY_FTS, COUNT_FTS), {"m": '"SAU"*'})] * 5)
+            prefix_ms = time_searches(conn, [
+                ((QUERY_PREFIX, COUNT_PREFIX), {"lo": p, "hi": p + ":"})
+                for p in prefixes])
+            print(f"{size:>12,} | {like_ms:>10.2f} | {rare_ms:>14.2f} | "
+                  f"{common_ms:>15.2f} | {prefix_ms:>17.2f}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Teste de carga da API com 1, 2 e 4 workers uvicorn.
+
+Monta um banco sintético com a carga da etapa 3, sobe `api:app` em uma
+porta local para cada quantidade de workers e dispara requisições
+concorrentes durante alguns segundos. A mistura imita o dashboard:
+estatísticas, históricos de CNPJs aleatórios e buscas. Para cada
+configuração, reporta requisições por segundo e latências p50/p99.
+
+Com `--exporters N`, N clientes extras baixam `/api/export/despesas`
+devagar durante o teste (cliente lento segurando o stream). As
+exportações usam conexões próprias, fora do pool das consultas, então
+req/s e p99 das consultas não devem desabar nem gerar erros mesmo com
+N >= API_THREADS.
+
+Os workers são processos independentes, cada um com seu pool de
+conexões somente leitura (API_THREADS); o SQLite em WAL permite que
+todos leiam o mesmo arquivo ao mesmo tempo. O ganho com mais workers
+depende dos núcleos disponíveis (`os.cpu_count()`).
+
+Uso:
+    python backend/benchmarks/load_test.py [--workers 1 2 4]
+        [--duration 10] [--concurrency 32] [--exporters 8]
+"""
+import os
+import sys
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+import io
+
+import requests
+import pandas as pd
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND_DIR)
+
+import stage_3_db_test  # noqa: E402
+
+OPERATORS = 5_000
+QUARTERS = 8
+SEARCH_TERMS = ["SAUDE", "MEDICA", "ODONTO", "VIDA", "CLINICA", "UNIMED"]
+
+
+def build_dataset(workdir):
+    """Gera os CSVs de entrada e roda a carga da etapa 3 em `workdir`."""
+    rng = random.Random(7)
+    cnpjs = [f"{rng.randrange(10**14):014d}" for _ in range(OPERATORS)]
+    rows = [(cnpj, f"{rng.choice(SEARCH_TERMS)} {i}", rng.choice("ABCDE"),
+             f"{year}", quarter, rng.uniform(1e3, 1e6))
+            for i, cnpj in enumerate(cnpjs)
+            for year in (2024, 2025)
+            for quarter in range(1, QUARTERS // 2 + 1)]
+    df = pd.DataFrame(rows, columns=['CNPJ', 'RazaoSocial', 'UF', 'Ano',
+                                     'Trimestre', 'ValorDespesas'])
+    df['UF'] = 'S' + df['UF']
+    df['Modalidade'] = 'Medicina de Grupo'
+    df['RegistroANS'] = '300001'
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        os.makedirs(os.path.join('data', 'processed'))
+        os.makedirs('frontend')
+        df.to_csv(stage_3_db_test.CSV_VALIDO, sep=';', index=False)
+        df.to_csv(stage_3_db_test.CSV_ENRIQUECIDO, sep=';', index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_3_db_test.create_and_load_db().close()
+    finally:
+        os.chdir(cwd)
+    return cnpjs
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_server(workdir, workers):
+    """Sobe o uvicorn com `workers` processos e espera ficar pronto."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--app-dir",
+         BACKEND_DIR, "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{base_url}/api/estatisticas", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError("Servidor não subiu.")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+EXPORT_READ_SIZE = 64 * 1024
+EXPORT_READ_PAUSE = 0.05
+
+
+def run_load(base_url, cnpjs, duration, concurrency, exporters=0):
+    """Dispara requisições concorrentes por `duration` segundos."""
+    latencies, errors, exports = [], [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            roll = rng.random()
+            if roll < 0.4:
+                path = "/api/estatisticas"
+            elif roll < 0.8:
+                path = f"/api/operadoras/{rng.choice(cnpjs)}/despesas"
+            else:
+                path = (f"/api/operadoras?search={rng.choice(SEARCH_TERMS)}"
+                        f"&page={rng.randint(1, 20)}")
+            start = time.perf_counter()
+            try:
+                ok = session.get(base_url + path).status_code == 200
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    def exporter():
+        session = requests.Session()
+        done, failed = 0, 0
+        while time.perf_counter() < deadline:
+            try:
+                with session.get(base_url + "/api/export/despesas"
+                                 "?formato=csv", stream=True) as response:
+                    failed += response.status_code != 200
+                    for _ in response.iter_content(EXPORT_READ_SIZE):
+                        if time.perf_counter() >= deadline:
+                            break
+                        time.sleep(EXPORT_READ_PAUSE)
+                    else:
+                        done += 1
+            except requests.RequestException:
+                failed += 1
+        with lock:
+            exports.append(done)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(concurrency)]
+    threads += [threading.Thread(target=exporter) for _ in range(exporters)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": sum(errors),
+        "exports": sum(exports),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--exporters", type=int, default=0,
+                        help="Clientes lentos baixando a exportação em "
+                             "paralelo às consultas.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"CPUs disponíveis: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as workdir:
+        cnpjs = build_dataset(workdir)
+        print(f"{'workers':>8} | {'req/s':>8} | {'p50 (ms)':>9} | "
+              f"{'p99 (ms)':>9} | {'erros':>5} | {'exports':>7}")
+        for workers in args.workers:
+            with run_server(workdir, workers) as base_url:
+                result = run_load(base_url, cnpjs, args.duration,
+                                  args.concurrency, args.exporters)
+            print(f"{workers:>8} | {result['rps']:>8.0f} | "
+                  f"{result['p50']:>9.1f} | {result['p99']:>9.1f} | "
+                  f"{result['errors']:>5} | {result['exports']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import os
+import pickle
+import urllib3
+import numpy as np
+import pandas as pd
+
+from http_cache import fetch_to_file
+from manifest import file_fingerprint, is_unchanged
+from join_keys import KeyDictionary, encode_reg_ans, MISSING_CODE
+
+RAW_DIR = os.path.join("data", "raw")
+PROCESSED_DIR = os.path.join("data", "processed")
+CADOP_CSV = os.path.join(RAW_DIR, "Relatorio_cadop.csv")
+SNAPSHOT_PATH = os.path.join(PROCESSED_DIR, "cadop_registry.pkl")
+CADOP_URL = ("https://dadosabertos.ans.gov.br/FTP/PDA/"
+             "operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv")
+HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                   "AppleWebKit/537.36 (KHTML, like Gecko) "
+                   "Chrome/91.0.4472.124 Safari/537.36")
+}
+# Versão do layout do snapshot: mudou o formato, o pickle antigo é ignorado.
+SNAPSHOT_VERSION = 2
+
+# Tentativas de leitura (separador, encoding), na ordem.
+READ_ATTEMPTS = [(';', 'latin1'), (',', 'utf-8')]
+REG_ANS_COLUMNS = ['REGISTRO_OPERADORA', 'REGISTRO_ANS', 'CD_OPERADORA',
+                   'REG_ANS', 'REGISTRO ANS', 'REGISTROANS']
+CANONICAL_COLUMNS = ['reg_ans', 'CNPJ', 'RazaoSocial', 'Modalidade', 'UF']
+
+
+def download_cadop():
+    """
+    Garante o Relatório de Cadastros (CADOP) atualizado em disco.
+
+    Utiliza User-Agent customizado para driblar bloqueios de segurança do
+    site da ANS. O arquivo passa pelo cache HTTP condicional
+    (`http_cache`): cadastro inalterado custa um 304 (ou nenhuma
+    requisição dentro do prazo de validade do cache).
+    """
+    print("   [Download] Verificando dados cadastrais (CNPJ/Razão Social)...")
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    try:
+        status = fetch_to_file(CADOP_URL, CADOP_CSV, headers=HEADERS,
+                               verify=False, timeout=60)
+    except Exception as e:
+        print(f"   [Erro] Falha ao baixar Cadop: {e}")
+        raise e
+
+    if status == 'updated':
+        print("   [Sucesso] Download concluído!")
+    else:
+        print(f"   [Cache] Usando cadastro local ({status}): {CADOP_CSV}")
+
+
+def read_cadop_csv(path=CADOP_CSV):
+    """
+    Lê o CSV bruto do CADOP, tentando separador/encoding alternativos.
+
+    Args:
+        path (str): Caminho do arquivo.
+
+    Returns:
+        pd.DataFrame: Todas as colunas como texto, cabeçalho normalizado
+        (maiúsculas, sem aspas e espaços nas bordas).
+    """
+    df = None
+    for sep, encoding in READ_ATTEMPTS:
+        try:
+            df = pd.read_csv(path, sep=sep, encoding=encoding, dtype=str)
+        except Exception:
+            continue
+        if len(df.columns) >= 2:
+            break
+        print("      [Aviso] Tentando ler Cadop com outro separador...")
+
+    if df is None:
+        raise ValueError(f"Não foi possível ler o cadastro: {path}")
+
+    df.columns = [c.strip().upper().replace('"', '') for c in df.columns]
+    return df
+
+
+def normalize_cadop(df):
+    """
+    Renomeia as colunas do CADOP para os nomes usados no pipeline.
+
+    Args:
+        df (pd.DataFrame): Saída de `read_cadop_csv`.
+
+    Returns:
+        pd.DataFrame: Colunas canônicas presentes (`CANONICAL_COLUMNS`).
+
+    Raises:
+        KeyError: Se não houver coluna de Registro ANS.
+    """
+    target_col = next((c for c in REG_ANS_COLUMNS if c in df.columns), None)
+    if not target_col:
+        raise KeyError(f"Coluna ANS não encontrada. Colunas: "
+                       f"{list(df.columns)}")
+
+    renames = {target_col: 'reg_ans', 'MODALIDADE': 'Modalidade'}
+    social_col = 'RAZAO_SOCIAL' if 'RAZAO_SOCIAL' in df.columns else next(
+        (c for c in df.columns if 'SOCIAL' in c), None)
+    if social_col:
+        renames[social_col] = 'RazaoSocial'
+
+    df = df.rename(columns=renames)
+    return df[[c for c in CANONICAL_COLUMNS if c in df.columns]]
+
+
+class CadopRegistry:
+    """
+    Cadastro de operadoras (CADOP) indexado por Registro ANS e por CNPJ.
+
+    As chaves ficam codificadas em inteiros: o Registro ANS em int32 e o
+    CNPJ como código (int32) do dicionário compartilhado `cnpj_keys`.
+    Cada índice tem chave única (primeira ocorrência no arquivo), então
+    uma consulta é uma busca em tabela hash de inteiros, e um join com as
+    despesas é um `take` por posição (O(1) por linha), sem `pd.merge`.
+
+    Args:
+        frame (pd.DataFrame): Cadastro normalizado (`normalize_cadop`).
+        fingerprint (dict): Impressão digital do CSV de origem.
+    """
+
+    def __init__(self, frame, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.rows = len(frame)
+        self.cnpj_keys = KeyDictionary(frame.get('CNPJ', ()))
+
+        frame = frame.copy()
+        if 'CNPJ' in frame.columns:
+            frame['CNPJ'] = self.cnpj_keys.encode(frame['CNPJ'])
+        self.by_reg_ans = self._build_index(
+            frame, 'reg_ans', encode_reg_ans(frame['reg_ans'])
+            if 'reg_ans' in frame.columns else None)
+        self.by_cnpj = self._build_index(
+            frame, 'CNPJ', frame['CNPJ'].to_numpy()
+            if 'CNPJ' in frame.columns else None)
+
+    @staticmethod
+    def _build_index(frame, key, codes):
+        if codes is None:
+            return None
+        index = frame.drop(columns=[key])
+        index.index = pd.Index(codes)
+        index = index[index.index != MISSING_CODE]
+        return index[~index.index.duplicated(keep='first')]
+
+    def _index(self, by):
+        index = {'reg_ans': self.by_reg_ans, 'CNPJ': self.by_cnpj}[by]
+        if index is None:
+            raise KeyError(f"Cadastro sem a coluna '{by}'.")
+        return index
+
+    def encode(self, by, keys):
+        """
+        Codifica chaves textuais no mesmo esquema dos índices.
+
+        Args:
+            by (str): 'reg_ans' ou 'CNPJ'.
+            keys (pd.Series): Chaves.
+
+        Returns:
+            np.ndarray: Códigos inteiros (`MISSING_CODE` se ausente).
+        """
+        if by == 'reg_ans':
+            return encode_reg_ans(keys)
+        return self.cnpj_keys.encode(keys)
+
+    def get(self, by, key):
+        """
+        Busca uma operadora pela chave.
+
+        Args:
+            by (str): 'reg_ans' ou 'CNPJ'.
+            key (str): Valor da chave.
+
+        Returns:
+            dict: Campos do cadastro (CNPJ em texto), ou None se não
+            encontrada.
+        """
+        found = self.lookup(by, pd.Series([key], dtype=object))
+        if found.isna().all(axis=1).iloc[0]:
+            return None
+        return found.iloc[0].to_dict()
+
+    def lookup_codes(self, by, codes, columns=None):
+        """
+        Traz os campos do cadastro para um array de chaves já codificadas.
+
+        O CNPJ sai codificado (Int32, com NA quando não há cadastro); os
+        demais campos saem em texto (NaN quando não há cadastro).
+
+        Args:
+            by (str): 'reg_ans' ou 'CNPJ'.
+            codes (np.ndarray): Chaves codificadas (ver `encode`).
+            columns (list): Campos desejados; todos se None.
+
+        Returns:
+            pd.DataFrame: Uma linha por código, na mesma ordem.
+        """
+        index = self._index(by)
+        columns = [c for c in (columns or index.columns)
+                   if c in index.columns]
+        positions = index.index.get_indexer(np.asarray(codes))
+        found = positions >= 0
+        if len(index) == 0:
+            positions = np.zeros(len(positions), dtype=np.intp)
+            index = index.reindex([MISSING_CODE])
+
+        result = {}
+        for col in columns:
+            values = index[col].to_numpy()
+            picked = values.take(positions, mode='clip')
+            if col == 'CNPJ':
+                # Operadora sem CNPJ no cadastro também vira NA.
+                picked = picked.astype(np.int32)
+                result[col] = pd.arrays.IntegerArray(
+                    picked, ~found | (picked == MISSING_CODE))
+            else:
+                result[col] = np.where(found, picked.astype(object), np.nan)
+        return pd.DataFrame(result, columns=columns)
+
+    def lookup(self, by, keys, columns=None):
+        """
+        Traz os campos do cadastro para uma coluna de chaves (left join).
+
+        Atalho para `encode` + `lookup_codes`, com o CNPJ de volta em
+        texto.
+
+        Args:
+            by (str): 'reg_ans' ou 'CNPJ'.
+            keys (pd.Series): Chaves das despesas (texto).
+            columns (list): Campos desejados; todos se None.
+
+        Returns:
+            pd.DataFrame: Uma linha por chave, alinhada ao índice de
+            `keys` (NaN quando não há cadastro).
+        """
+        result = self.lookup_codes(by, self.encode(by, keys), columns)
+        if 'CNPJ' in result.columns:
+            decoded = self.cnpj_keys.decode(result['CNPJ'])
+            result['CNPJ'] = np.where(pd.isna(decoded), np.nan, decoded)
+        result.index = keys.index
+        return result
+
+
+def load_registry(path=CADOP_CSV, snapshot_path=SNAPSHOT_PATH):
+    """
+    Carrega o cadastro, reaproveitando o snapshot se o CSV não mudou.
+
+    O CSV é lido, normalizado e indexado só quando o snapshot não existe
+    ou foi gerado de outro arquivo (tamanho/mtime ou SHA-256 do manifesto).
+    Nas demais execuções (ex: Etapa 2.2 logo após a 1.3), basta abrir o
+    pickle.
+
+    Args:
+        path (str): CSV do CADOP.
+        snapshot_path (str): Arquivo do snapshot.
+
+    Returns:
+        CadopRegistry: Cadastro indexado.
+    """
+    if os.path.exists(snapshot_path):
+        try:
+            with open(snapshot_path, 'rb') as f:
+                version, registry = pickle.load(f)
+            if (version == SNAPSHOT_VERSION
+                    and is_unchanged(registry.fingerprint, path)):
+                print(f"   [Cache] Cadastro indexado reaproveitado: "
+                      f"{snapshot_path}")
+                return registry
+        except Exception as e:
+            print(f"      [Aviso] Snapshot do cadastro ignorado: {e}")
+
+    print("   -> Lendo dados cadastrais...")
+    registry = CadopRegistry(normalize_cadop(read_cadop_csv(path)),
+                             fingerprint=file_fingerprint(path))
+
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((SNAPSHOT_VERSION, registry), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+    return registry
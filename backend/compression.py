@@ -0,0 +1,139 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # dependência opcional: sem ela, só gzip
+    brotli = None
+
+# Respostas menores que isso não compensam o custo de comprimir.
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+# Qualidade 4 do brotli: compressão próxima do gzip 9 com custo de CPU
+# adequado a respostas dinâmicas.
+BROTLI_QUALITY = 4
+
+
+def accepts_encoding(accept_encoding, name):
+    """
+    Indica se o cabeçalho Accept-Encoding permite a codificação `name`.
+
+    Respeita `q=0` (recusa explícita) e o curinga `*`.
+
+    Args:
+        accept_encoding (str): Valor do cabeçalho (pode ser vazio).
+        name (str): Codificação, ex: 'gzip'.
+
+    Returns:
+        bool: True se a codificação é aceita.
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip()] = quality
+    return accepted.get(name, accepted.get("*", 0)) > 0
+
+
+def choose_encoding(accept_encoding):
+    """
+    Escolhe a codificação a partir do cabeçalho Accept-Encoding.
+
+    Prefere brotli (se instalado) a gzip; respeita `q=0`.
+
+    Args:
+        accept_encoding (str): Valor do cabeçalho (pode ser vazio).
+
+    Returns:
+        str: 'br', 'gzip' ou None.
+    """
+    if brotli is not None and accepts_encoding(accept_encoding, "br"):
+        return "br"
+    if accepts_encoding(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    """Comprime `body` na codificação escolhida por `choose_encoding`."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compressão negociada (brotli/gzip).
+
+    Comprime apenas respostas de corpo único (JSON da API) com pelo menos
+    `minimum_size` bytes. Respostas em streaming e respostas que já têm
+    Content-Encoding (ex: exportação em gzip) passam sem alteração. Na
+    versão comprimida, um ETag forte vira fraco (W/) e `Accept-Encoding`
+    é acrescentado ao `Vary`, para os caches intermediários.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        encoding = choose_encoding(
+            request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = list(start_message.get("headers", []))
+            names = {name.lower() for name, _ in headers}
+            body = message.get("body", b"")
+            if (message.get("more_body", False)
+                    or b"content-encoding" in names
+                    or len(body) < self.minimum_size):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            new_headers, vary = [], [b"Accept-Encoding"]
+            for name, value in headers:
+                lowered = name.lower()
+                if lowered == b"content-length":
+                    continue
+                if lowered == b"vary":
+                    vary.insert(-1, value)
+                    continue
+                if lowered == b"etag" and not value.startswith(b"W/"):
+                    value = b"W/" + value
+                new_headers.append((name, value))
+            new_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", b", ".join(vary)),
+            ]
+            start_message["headers"] = new_headers
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,92 @@
+import io
+import csv
+import json
+import zlib
+
+# Linhas buscadas do cursor por vez: a memória da exportação é limitada
+# pelo tamanho do lote, não pelo resultado.
+EXPORT_BATCH_SIZE = 5_000
+GZIP_LEVEL = 6
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+def iter_ndjson(batches, columns):
+    """Serializa lotes de tuplas como JSON por linha (NDJSON)."""
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                       separators=(",", ":")) + "\n"
+            for row in batch).encode("utf-8")
+
+
+def iter_csv(batches, columns):
+    """Serializa lotes de tuplas como CSV (';', UTF-8, com cabeçalho)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', lineterminator='\n')
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def require_arrow():
+    """
+    Importa o pyarrow sob demanda (dependência opcional).
+
+    Raises:
+        ImportError: Se o pyarrow não estiver instalado.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "O formato 'arrow' requer o pacote opcional pyarrow "
+            "(pip install pyarrow).") from e
+    return pyarrow
+
+
+def iter_arrow(batches, columns, types):
+    """
+    Serializa lotes de tuplas como um stream Arrow IPC.
+
+    Cada lote vira um record batch, enviado assim que é escrito.
+
+    Args:
+        batches: Iterável de listas de tuplas.
+        columns (list): Nomes das colunas.
+        types (list): Tipo de cada coluna ('str' ou 'float').
+    """
+    pa = require_arrow()
+    arrow_types = {"str": pa.string(), "float": pa.float64()}
+    schema = pa.schema([(name, arrow_types[kind])
+                        for name, kind in zip(columns, types)])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            arrays = [pa.array(values, type=field.type)
+                      for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def gzip_stream(chunks, level=GZIP_LEVEL):
+    """Comprime um iterável de bytes em gzip, bloco a bloco."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+STATE_COLUMNS = ["count", "total", "total_err", "mean", "m2"]
+
+
+class GroupStats:
+    """
+    Acumuladores mescláveis de contagem, soma, média e variância por grupo.
+
+    Cada bloco é resumido por grupo (n, soma, média e M2 = soma dos
+    quadrados dos desvios) e combinado ao estado com a fórmula paralela
+    de Chan et al. (generalização do Welford para dois conjuntos). A
+    memória depende do número de grupos, não de linhas, e dois estados
+    parciais (ex: calculados em processos diferentes) podem ser
+    combinados com `merge`, em qualquer ordem.
+
+    A soma guarda também o erro de arredondamento de cada combinação
+    (TwoSum), para acompanhar a soma compensada do `groupby().sum()`
+    mesmo com muitos blocos.
+
+    Args:
+        keys (list): Colunas de agrupamento.
+        value (str): Coluna numérica agregada.
+    """
+
+    def __init__(self, keys, value):
+        self.keys = list(keys)
+        self.value = value
+        self.state = pd.DataFrame(
+            {col: pd.Series(dtype="float64") for col in STATE_COLUMNS},
+            index=pd.MultiIndex.from_arrays([[]] * len(self.keys),
+                                            names=self.keys))
+
+    def __len__(self):
+        return len(self.state)
+
+    def update(self, df):
+        """
+        Acrescenta um bloco de linhas ao estado.
+
+        Linhas com chave nula são ignoradas, como no `groupby` padrão.
+
+        Args:
+            df (pd.DataFrame): Bloco com as colunas `keys` e `value`.
+        """
+        grouped = df.groupby(self.keys, observed=True, sort=False)[self.value]
+        partial = grouped.agg(count="count", total="sum", mean="mean")
+        partial["total_err"] = 0.0
+        # Grupo só com valores nulos: média 0 (peso zero na combinação).
+        partial["mean"] = partial["mean"].fillna(0.0)
+        # M2 = var(ddof=0) * n; grupos de um só valor têm M2 = 0.
+        partial["m2"] = (grouped.var(ddof=0).fillna(0.0)
+                         * partial["count"])
+        self._combine(partial.astype("float64"))
+
+    def merge(self, other):
+        """Combina o estado de outro `GroupStats` (mesmas chaves) a este."""
+        self._combine(other.state)
+        return self
+
+    def _combine(self, other):
+        if self.state.empty:
+            self.state = other.copy()
+            return
+        index = self.state.index.union(other.index)
+        a = self.state.reindex(index, fill_value=0.0)
+        b = other.reindex(index, fill_value=0.0)
+
+        count = a["count"] + b["count"]
+        # TwoSum: `total + total_err` é exatamente a soma das duas partes.
+        total = a["total"] + b["total"]
+        b_virtual = total - a["total"]
+        error = ((a["total"] - (total - b_virtual))
+                 + (b["total"] - b_virtual))
+        # Sem observações válidas dos dois lados, evita 0/0.
+        safe = count.where(count > 0, 1.0)
+        delta = b["mean"] - a["mean"]
+        self.state = pd.DataFrame({
+            "count": count,
+            "total": total,
+            "total_err": a["total_err"] + b["total_err"] + error,
+            "mean": a["mean"] + delta * b["count"] / safe,
+            "m2": (a["m2"] + b["m2"]
+                   + delta ** 2 * a["count"] * b["count"] / safe),
+        }, index=index)
+
+    def result(self):
+        """
+        Estatísticas finais, na forma de `groupby(keys)[value].agg(...)`.
+
+        Returns:
+            pd.DataFrame: Chaves (ordenadas) + sum, mean, std (amostral,
+            NaN para n < 2) e count.
+        """
+        state = self.state.sort_index()
+        count = state["count"]
+        total = state["total"] + state["total_err"]
+        variance = (state["m2"] / (count - 1)).where(count > 1)
+        return pd.DataFrame({
+            "sum": total,
+            "mean": (total / count).where(count > 0),
+            "std": np.sqrt(variance.clip(lower=0.0)),
+            "count": count.astype("int64"),
+        }, index=state.index).reset_index()
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+
+CACHE_DIR = os.path.join("data", "cache", "http")
+
+# Tempo (s) em que uma resposta é usada sem nem revalidar no servidor.
+# Após esse prazo, a revalidação condicional custa apenas um 304.
+CACHE_MAX_AGE = 15 * 60
+# Tamanho máximo do cache em disco; acima disso, os itens acessados há
+# mais tempo são removidos (LRU).
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+_evict_lock = threading.Lock()
+
+
+def _cache_paths(url, cache_dir):
+    """Retorna os caminhos (corpo, metadados) de uma URL no cache."""
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return (os.path.join(cache_dir, f"{key}.body"),
+            os.path.join(cache_dir, f"{key}.json"))
+
+
+def _write_atomic(path, data, mode='wb'):
+    """Grava via arquivo temporário + rename (seguro entre threads)."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    encoding = None if 'b' in mode else 'utf-8'
+    with open(tmp_path, mode, encoding=encoding) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_meta(meta_path, meta):
+    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False), mode='w')
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, keep=None):
+    """
+    Remove entradas menos usadas até o cache caber em `max_bytes`.
+
+    Args:
+        cache_dir (str): Pasta do cache.
+        max_bytes (int): Tamanho máximo permitido (bytes).
+        keep (str): Caminho de metadados que nunca deve ser removido
+            (a entrada recém-gravada).
+
+    Returns:
+        int: Quantidade de entradas removidas.
+    """
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(cache_dir, name)
+            meta = _load_meta(meta_path) or {}
+            entries.append((meta.get('accessed_at', 0),
+                            meta.get('size', 0), meta_path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, meta_path in sorted(entries):
+            if total <= max_bytes:
+                break
+            if meta_path == keep:
+                continue
+            body_path = meta_path[:-len('.json')] + '.body'
+            for path in (body_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+
+def cached_get(url, session=None, limiter=None, headers=None,
+               max_age=CACHE_MAX_AGE, cache_dir=CACHE_DIR,
+               max_bytes=CACHE_MAX_BYTES, **kwargs):
+    """
+    GET com cache em disco e revalidação condicional (ETag/Last-Modified).
+
+    - Dentro de `max_age`: devolve o corpo salvo sem tocar a rede.
+    - Depois: envia If-None-Match/If-Modified-Since. Um 304 apenas renova
+      o prazo; um 200 substitui o corpo salvo.
+    - Falha de rede com cópia local: devolve a cópia (stale) com aviso.
+
+    Args:
+        url (str): Recurso remoto.
+        session (requests.Session): Sessão HTTP (opcional).
+        limiter: Objeto com `.request(session, url, **kw)` para
+            politeness por host (opcional).
+        headers (dict): Cabeçalhos extras (ex: User-Agent).
+        max_age (int): Segundos em que o cache é usado sem revalidar.
+        cache_dir (str): Pasta do cache.
+        max_bytes (int): Tamanho máximo do cache antes da evicção LRU.
+        **kwargs: Repassados ao `get` (ex: `timeout`, `verify`).
+
+    Returns:
+        tuple: (bytes do corpo, status) onde status é 'fresh',
+        'revalidated', 'updated' ou 'stale'.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    meta = _load_meta(meta_path) if os.path.exists(body_path) else None
+    now = time.time()
+
+    if meta and now - meta.get('fetched_at', 0) < max_age:
+        meta['accessed_at'] = now
+        _save_meta(meta_path, meta)
+        with open(body_path, 'rb') as f:
+            return f.read(), 'fresh'
+
+    request_headers = dict(headers or {})
+    if meta and meta.get('etag'):
+        request_headers['If-None-Match'] = meta['etag']
+    if meta and meta.get('last_modified'):
+        request_headers['If-Modified-Since'] = meta['last_modified']
+
+    session = session or requests
+    try:
+        if limiter is not None:
+            response = limiter.request(session, url,
+                                       headers=request_headers, **kwargs)
+        else:
+            response = session.get(url, headers=request_headers, **kwargs)
+        if response.status_code != 304:
+            response.raise_for_status()
+    except requests.RequestException as e:
+        if not meta:
+            raise
+        print(f"   [Cache] Falha ao revalidar {url} ({e}); "
+              f"usando cópia local.")
+        with open(body_path, 'rb') as f:
+            return f.read(), 'stale'
+
+    if response.status_code == 304 and meta:
+        meta['fetched_at'] = meta['accessed_at'] = now
+        _save_meta(meta_path, meta)
+        with open(body_path, 'rb') as f:
+            return f.read(), 'revalidated'
+
+    content = response.content
+    _write_atomic(body_path, content)
+    _save_meta(meta_path, {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': now,
+        'accessed_at': now,
+        'size': len(content),
+    })
+    evict(cache_dir, max_bytes, keep=meta_path)
+    return content, 'updated'
+
+
+def fetch_to_file(url, dest_path, **kwargs):
+    """
+    Mantém `dest_path` sincronizado com a URL usando `cached_get`.
+
+    O arquivo de destino só é regravado quando o conteúdo remoto mudou
+    (ou quando ainda não existe).
+
+    Args:
+        url (str): Recurso remoto.
+        dest_path (str): Arquivo local a manter atualizado.
+        **kwargs: Repassados a `cached_get`.
+
+    Returns:
+        str: Status devolvido por `cached_get`.
+    """
+    content, status = cached_get(url, **kwargs)
+    if status == 'updated' or not os.path.exists(dest_path):
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        _write_atomic(dest_path, content)
+    return status
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from normalization import normalize_cnpj_series, CNPJ_LENGTH
+
+# Código das chaves ausentes/inválidas nos arrays de códigos.
+MISSING_CODE = -1
+REG_ANS_MAX = np.iinfo(np.int32).max
+
+
+def _take(values, codes, fill):
+    """`values[codes]`, com `fill` onde o código é ausente (-1)."""
+    codes = np.asarray(codes)
+    if len(values) == 0:
+        return np.full(len(codes), fill, dtype=values.dtype)
+    return np.where(codes >= 0, values[codes], fill).astype(values.dtype)
+
+
+def encode_reg_ans(series):
+    """
+    Converte o Registro ANS para inteiros de 32 bits.
+
+    Só os valores distintos são convertidos (o mesmo registro se repete
+    em milhares de lançamentos). Aceita texto ('300001'), inteiros e
+    floats vindos de CSV ('300001.0').
+
+    Args:
+        series (pd.Series): Coluna de Registros ANS.
+
+    Returns:
+        np.ndarray: int32, `MISSING_CODE` onde vazio ou não numérico.
+    """
+    codes, uniques = pd.factorize(series)
+    numeric = pd.to_numeric(
+        pd.Series(uniques, dtype=object).astype(str).str.strip(),
+        errors='coerce')
+    valid = (numeric.notna() & (numeric >= 0) & (numeric <= REG_ANS_MAX)
+             & (numeric % 1 == 0))
+    values = numeric.where(valid, MISSING_CODE).to_numpy().astype(np.int32)
+    return _take(values, codes, MISSING_CODE)
+
+
+def encode_cnpj(series):
+    """
+    Converte CNPJs para a chave canônica em int64 (14 dígitos cabem).
+
+    A normalização (`normalize_cnpj_series`) roda só nos valores
+    distintos; o inverso é `decode_cnpj`.
+
+    Args:
+        series (pd.Series): Coluna de CNPJs (texto ou numérica).
+
+    Returns:
+        np.ndarray: int64, `MISSING_CODE` onde inválido.
+    """
+    codes, uniques = pd.factorize(series)
+    normalized = normalize_cnpj_series(pd.Series(uniques, dtype=object))
+    values = pd.to_numeric(normalized).fillna(MISSING_CODE).to_numpy()
+    return _take(values.astype(np.int64), codes, MISSING_CODE)
+
+
+def decode_cnpj(codes):
+    """
+    Restaura o texto de 14 dígitos a partir de `encode_cnpj`.
+
+    Args:
+        codes (np.ndarray): CNPJs em int64.
+
+    Returns:
+        np.ndarray: object, None onde o código é ausente.
+    """
+    positions, uniques = pd.factorize(np.asarray(codes))
+    texts = np.array([None if value == MISSING_CODE
+                      else str(value).zfill(CNPJ_LENGTH)
+                      for value in uniques], dtype=object)
+    return _take(texts, positions, None)
+
+
+class KeyDictionary:
+    """
+    Dicionário compartilhado texto <-> código inteiro (int32).
+
+    Guarda cada chave textual uma única vez; as tabelas carregam só os
+    códigos, e joins e agrupamentos rodam sobre arrays de largura fixa.
+    O texto original (sem normalização) volta com `decode`, nas bordas
+    (gravação dos arquivos de saída).
+
+    Args:
+        values: Chaves textuais; a ordem de primeira ocorrência define o
+            código. Nulos são ignorados.
+    """
+
+    def __init__(self, values=()):
+        values = pd.Series(values, dtype=object).dropna()
+        self.values = pd.Index(pd.unique(values), dtype=object)
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, series):
+        """
+        Traduz uma coluna de chaves textuais para códigos.
+
+        Args:
+            series (pd.Series): Chaves (texto).
+
+        Returns:
+            np.ndarray: int32, `MISSING_CODE` onde nulo ou fora do
+            dicionário.
+        """
+        codes, uniques = pd.factorize(series)
+        mapped = self.values.get_indexer(uniques).astype(np.int32)
+        return _take(mapped, codes, MISSING_CODE)
+
+    def decode(self, codes):
+        """
+        Restaura o texto das chaves.
+
+        Args:
+            codes: Códigos (np.ndarray ou Series, inclusive Int32 com NA).
+
+        Returns:
+            np.ndarray: object, None onde o código é ausente.
+        """
+        codes = pd.Series(codes).fillna(MISSING_CODE).to_numpy(np.int64)
+        return _take(self.values.to_numpy(dtype=object), codes, None)
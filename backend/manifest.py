@@ -0,0 +1,83 @@
+import os
+import json
+import hashlib
+
+MANIFEST_PATH = os.path.join("data", "processed", "manifest.json")
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """Calcula o SHA-256 de um arquivo lendo em blocos de 1 MB."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """
+    Gera a impressão digital (tamanho, mtime e hash) de um arquivo de entrada.
+
+    Args:
+        path (str): Caminho do arquivo.
+
+    Returns:
+        dict: {'size', 'mtime', 'sha256'}.
+    """
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": file_sha256(path),
+    }
+
+
+def is_unchanged(entry, path):
+    """
+    Verifica se um arquivo continua igual ao registrado no manifesto.
+
+    Tamanho e mtime iguais bastam (caminho rápido, sem ler o arquivo). Se
+    apenas o mtime mudou (ex: arquivo copiado de novo), o hash decide.
+
+    Args:
+        entry (dict): Registro anterior do manifesto (ou None).
+        path (str): Caminho atual do arquivo.
+
+    Returns:
+        bool: True se o conteúdo não mudou.
+    """
+    if not entry or not os.path.exists(path):
+        return False
+
+    stat = os.stat(path)
+    if stat.st_size != entry.get("size"):
+        return False
+    if stat.st_mtime == entry.get("mtime"):
+        return True
+    return file_sha256(path) == entry.get("sha256")
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Carrega o manifesto da última execução (vazio se não existir)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"   [Aviso] Manifesto ilegível, reprocessando tudo: {e}")
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """
+    Grava o manifesto de forma atômica (arquivo temporário + rename).
+
+    Uma execução interrompida nunca deixa um manifesto pela metade.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -0,0 +1,64 @@
+import re
+import unicodedata
+
+CNPJ_LENGTH = 14
+
+
+def normalize_cnpj(value):
+    """
+    Normaliza um CNPJ para a chave canônica de 14 dígitos (texto).
+
+    Remove pontuação ('11.222.333/0001-81'), desfaz a conversão para
+    número feita por leitores de CSV (que perde os zeros à esquerda e pode
+    acrescentar '.0') e completa com zeros à esquerda.
+
+    Args:
+        value: CNPJ em qualquer formato (str, int ou float).
+
+    Returns:
+        str: CNPJ com 14 dígitos, ou None se não for possível normalizar.
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    text = re.sub(r'\.0$', '', str(value).strip())
+    digits = re.sub(r'[^0-9]', '', text)
+    if not digits or len(digits) > CNPJ_LENGTH:
+        return None
+    return digits.zfill(CNPJ_LENGTH)
+
+
+def normalize_cnpj_series(series):
+    """
+    Versão vetorizada de `normalize_cnpj` para colunas inteiras.
+
+    Args:
+        series (pd.Series): Coluna de CNPJs (texto ou numérica).
+
+    Returns:
+        pd.Series: CNPJs com 14 dígitos (object), NaN onde inválido.
+    """
+    text = series.astype('string').str.strip().str.replace(
+        r'\.0$', '', regex=True)
+    digits = text.str.replace(r'[^0-9]', '', regex=True)
+    valid = digits.str.len().between(1, CNPJ_LENGTH).fillna(False)
+    return digits.str.zfill(CNPJ_LENGTH).where(valid).astype(object).where(
+        valid, None)
+
+
+def fold_text(value):
+    """
+    Remove acentos e padroniza caixa/espaços para busca ("Saúde" -> "SAUDE").
+
+    Args:
+        value: Texto (ou None).
+
+    Returns:
+        str: Texto sem diacríticos, em maiúsculas e com espaços simples
+        ('' para None).
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(ch for ch in decomposed
+                       if not unicodedata.combining(ch))
+    return ' '.join(stripped.upper().split())
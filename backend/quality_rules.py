@@ -0,0 +1,167 @@
+import time
+import types
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Separador dos motivos quando uma linha falha em mais de uma regra.
+MOTIVO_SEPARATOR = " | "
+MAX_RULES = 63
+
+
+class Rule:
+    """
+    Regra de qualidade declarativa.
+
+    Args:
+        name (str): Identificador curto (chave dos contadores).
+        motivo (str): Texto gravado em `motivo_rejeicao` quando falha.
+        check (callable): Recebe o bloco (DataFrame) e devolve uma máscara
+            booleana com True nas linhas VÁLIDAS para a regra.
+        bit (int): Posição da regra na máscara de falhas.
+    """
+
+    def __init__(self, name, motivo, check, bit):
+        self.name = name
+        self.motivo = motivo
+        self.check = check
+        self.bit = bit
+
+
+class RuleRegistry:
+    """
+    Registro de regras avaliadas em uma única passada vetorizada por bloco.
+
+    Cada regra produz uma máscara sobre o bloco inteiro; as falhas são
+    combinadas em uma máscara de bits por linha (`falhas_bitmask`), de
+    modo que todos os motivos ficam registrados, e não só o último.
+    Contadores de falhas e tempo gasto por regra acumulam entre blocos.
+    """
+
+    def __init__(self):
+        self.rules = []
+        self.reset_stats()
+
+    def add(self, name, motivo, check):
+        """
+        Registra uma regra (ver `Rule`).
+
+        Raises:
+            ValueError: Nome repetido ou limite de regras atingido.
+        """
+        if any(rule.name == name for rule in self.rules):
+            raise ValueError(f"Regra duplicada: '{name}'.")
+        if len(self.rules) >= MAX_RULES:
+            raise ValueError(f"Limite de {MAX_RULES} regras atingido.")
+        rule = Rule(name, motivo, check, bit=len(self.rules))
+        self.rules.append(rule)
+        self.failures.setdefault(name, 0)
+        self.timings.setdefault(name, 0.0)
+        return rule
+
+    def rule(self, name, motivo):
+        """Decorador equivalente a `add` para regras customizadas."""
+        def decorator(check):
+            self.add(name, motivo, check)
+            return check
+        return decorator
+
+    def reset_stats(self):
+        """Zera contadores e tempos (ex: antes de uma nova execução)."""
+        self.rows = 0
+        self.failures = {rule.name: 0 for rule in self.rules}
+        self.timings = {rule.name: 0.0 for rule in self.rules}
+
+    def evaluate(self, df):
+        """
+        Avalia todas as regras em um bloco.
+
+        Args:
+            df (pd.DataFrame): Bloco a validar.
+
+        Returns:
+            np.ndarray: Máscara de falhas (int64) por linha; 0 = válida.
+        """
+        bitmask = np.zeros(len(df), dtype=np.int64)
+        for rule in self.rules:
+            start = time.perf_counter()
+            valid = np.asarray(rule.check(df), dtype=bool)
+            failed = ~valid
+            bitmask |= failed.astype(np.int64) << rule.bit
+            self.timings[rule.name] += time.perf_counter() - start
+            self.failures[rule.name] += int(failed.sum())
+        self.rows += len(df)
+        return bitmask
+
+    def describe(self, bitmask):
+        """
+        Converte máscaras de falhas nos textos de `motivo_rejeicao`.
+
+        Cada máscara distinta é traduzida uma única vez.
+
+        Args:
+            bitmask (np.ndarray): Saída de `evaluate`.
+
+        Returns:
+            pd.Series: Motivos separados por `MOTIVO_SEPARATOR` ('' se
+            válida).
+        """
+        codes, uniques = pd.factorize(bitmask)
+        texts = [MOTIVO_SEPARATOR.join(
+            rule.motivo for rule in self.rules if value >> rule.bit & 1)
+            for value in uniques]
+        return pd.Series(np.asarray(texts, dtype=object)[codes]
+                         if len(texts) else [], dtype=object)
+
+    def signature(self):
+        """
+        Hash das regras registradas (nome, motivo, bit e código do check).
+
+        Muda quando uma regra é adicionada, removida ou tem o corpo
+        alterado; serve para invalidar saídas validadas com outras regras.
+        Funções auxiliares chamadas pelo check não entram no hash.
+
+        Returns:
+            str: SHA-1 hexadecimal.
+        """
+        digest = hashlib.sha1()
+        for rule in self.rules:
+            digest.update(f"{rule.bit}|{rule.name}|{rule.motivo}|".encode())
+            code = getattr(rule.check, "__code__", None)
+            if code is None:
+                digest.update(repr(rule.check).encode())
+            else:
+                _update_code_digest(digest, code)
+        return digest.hexdigest()
+
+    def report(self):
+        """
+        Resumo de contadores e tempos por regra.
+
+        Returns:
+            dict: {'registros', 'regras': {nome: {'bit', 'motivo',
+            'falhas', 'tempo_s'}}}.
+        """
+        return {
+            "registros": self.rows,
+            "regras": {
+                rule.name: {
+                    "bit": rule.bit,
+                    "motivo": rule.motivo,
+                    "falhas": self.failures[rule.name],
+                    "tempo_s": round(self.timings[rule.name], 6),
+                }
+                for rule in self.rules
+            },
+        }
+
+
+def _update_code_digest(digest, code):
+    """Acrescenta ao hash o bytecode, nomes e constantes de uma função."""
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code_digest(digest, const)
+        else:
+            digest.update(repr(const).encode())
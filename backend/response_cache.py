@@ -0,0 +1,82 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Padrões do cache de respostas da API (por processo).
+CACHE_TTL = 5 * 60
+CACHE_MAX_ENTRIES = 1024
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    Cache LRU em memória para corpos de resposta já serializados.
+
+    Cada entrada guarda a versão do dataset em que foi gerada: uma busca
+    com outra versão é tratada como ausência (e a entrada é descartada),
+    então uma nova carga do banco invalida tudo sem varrer o cache.
+    Entradas também expiram após `ttl` segundos. O limite é duplo: número
+    de entradas e bytes totais; ao exceder, sai a menos usada.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """
+        Retorna o corpo salvo para `key` na `version` atual (ou None).
+
+        Args:
+            key (tuple): Rota + parâmetros da requisição.
+            version (str): Versão atual do dataset.
+
+        Returns:
+            bytes: Corpo da resposta, ou None se ausente/expirado.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, stored_at, body = entry
+                if (entry_version == version
+                        and time.monotonic() - stored_at < self.ttl):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, version, body):
+        """Guarda um corpo de resposta, removendo os menos usados se preciso."""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (version, time.monotonic(), body)
+            self._bytes += len(body)
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def clear(self):
+        """Esvazia o cache."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
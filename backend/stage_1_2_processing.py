@@ -1,11 +1,19 @@
 import os
+import shutil
+import argparse
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import shutil
+
+from storage import get_format, csv_to_parquet
+from manifest import load_manifest, save_manifest, file_fingerprint, \
+    is_unchanged
 
 RAW_DIR = os.path.join("data", "raw")
 PROCESSED_DIR = os.path.join("data", "processed")
-TEMP_DIR = os.path.join("data", "temp_extract")
+PARTS_DIR = os.path.join(PROCESSED_DIR, "_partes")
+PARTITIONS_DIR = os.path.join(PROCESSED_DIR, "particoes")
+MANIFEST_SECTION = "stage_1_2"
 
 
 COLUMN_MAPPING = {
@@ -32,6 +40,9 @@ COLUMN_MAPPING = {
 COLUNAS_FINAIS = ["reg_ans", "cd_conta_contabil", "descricao",
                   "vl_saldo_final", "arquivo_origem"]
 
+# Linhas lidas por bloco. Controla o pico de memória da etapa.
+CHUNK_SIZE = 200_000
+
 
 def clean_currency(value):
     """
@@ -55,7 +66,82 @@ def clean_currency(value):
     return value
 
 
-def load_file_content(filepath):
+def parse_currency_series(series):
+    """
+    Versão vetorizada de `clean_currency` para colunas inteiras.
+
+    Converte valores no formato brasileiro ('1.234.567,89', '-50,55') com
+    operações de string do pandas sobre a coluna toda, sem uma chamada
+    Python por linha. Diferente de `clean_currency`, valores que não podem
+    ser convertidos viram NaN (e não um 0.0 falso) e são contabilizados
+    como rejeitados. Vazios e nulos também viram NaN, mas não contam como
+    rejeição.
+
+    Args:
+        series (pd.Series): Coluna com os valores monetários em texto.
+
+    Returns:
+        tuple: (pd.Series de float64, int com a quantidade de rejeitados).
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64'), 0
+
+    text = series.astype('string').str.strip()
+    normalized = (text.str.replace('.', '', regex=False)
+                  .str.replace(',', '.', regex=False))
+    values = pd.to_numeric(normalized, errors='coerce').astype('float64')
+
+    is_blank = text.isna() | (text == '')
+    rejected = int((values.isna() & ~is_blank).sum())
+
+    return values, rejected
+
+
+def iter_file_chunks(filepath, filename=None, chunksize=CHUNK_SIZE):
+    """
+    Lê dados tabulares em blocos de tamanho fixo (memória limitada).
+
+    Aplica a mesma estratégia de fallback de `load_file_content`: tenta
+    Latin-1 com ';' e, se o primeiro bloco falhar, rebobina a fonte e
+    tenta UTF-8 com ','. Assim o pico de memória depende de `chunksize`,
+    e não do tamanho do arquivo.
+
+    Args:
+        filepath (str | file-like): Caminho do arquivo ou stream binário.
+        filename (str): Nome do arquivo, obrigatório quando `filepath` é
+            um stream.
+        chunksize (int): Quantidade de linhas por bloco.
+
+    Yields:
+        pd.DataFrame: Blocos com todas as colunas como texto (`dtype=str`).
+    """
+    if filename is None:
+        filename = os.path.basename(filepath)
+    ext = filename.split('.')[-1].lower()
+
+    if ext == 'csv' or ext == 'txt':
+        try:
+            reader = pd.read_csv(filepath, sep=';', encoding='latin1',
+                                 dtype=str, chunksize=chunksize)
+            first_chunk = next(reader, None)
+        except Exception:
+            if hasattr(filepath, 'seek'):
+                filepath.seek(0)
+            reader = pd.read_csv(filepath, sep=',', encoding='utf-8',
+                                 dtype=str, chunksize=chunksize)
+            first_chunk = next(reader, None)
+
+        if first_chunk is not None:
+            yield first_chunk
+            yield from reader
+
+    elif ext in ['xlsx', 'xls']:
+        df = pd.read_excel(filepath, dtype=str)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize].copy()
+
+
+def load_file_content(filepath, filename=None):
     """
     Carrega dados tabulares abstraindo variações de formato (CSV/Excel).
 
@@ -63,32 +149,34 @@ def load_file_content(filepath):
     (padrão web) e recorrendo a Latin-1 (padrão legado) para maximizar
     a compatibilidade com arquivos governamentais antigos.
 
+    Aceita tanto um caminho em disco quanto um stream binário (ex: membro
+    aberto com `ZipFile.open()`). Para streams, a extensão é obtida de
+    `filename` e o fallback rebobina o stream antes da segunda tentativa.
+
+    Para arquivos grandes prefira `iter_file_chunks`, que mantém o uso de
+    memória constante.
+
     Args:
-        filepath (str): Caminho completo do arquivo extraído.
+        filepath (str | file-like): Caminho do arquivo ou stream binário.
+        filename (str): Nome do arquivo, obrigatório quando `filepath` é
+            um stream.
 
     Returns:
         pd.DataFrame: DataFrame carregado em memória ou None em caso de erro.
     """
-    ext = filepath.split('.')[-1].lower()
-    df = None
+    if filename is None:
+        filename = os.path.basename(filepath)
 
     try:
-        if ext == 'csv' or ext == 'txt':
-            try:
-                df = pd.read_csv(filepath, sep=';', encoding='latin1',
-                                 dtype=str)
-            except Exception:
-                df = pd.read_csv(filepath, sep=',', encoding='utf-8', 
-                                 dtype=str)
-
-        elif ext in ['xlsx', 'xls']:
-            df = pd.read_excel(filepath, dtype=str)
-
+        chunks = list(iter_file_chunks(filepath, filename))
     except Exception as e:
-        print(f"      [Erro Leitura] {os.path.basename(filepath)}: {e}")
+        print(f"      [Erro Leitura] {filename}: {e}")
         return None
 
-    return df
+    if not chunks:
+        return None
+
+    return pd.concat(chunks, ignore_index=True)
 
 
 def normalize_dataframe(df, filename):
@@ -124,90 +212,339 @@ def normalize_dataframe(df, filename):
 
     df_final = df[COLUNAS_FINAIS].copy()
     df_final['arquivo_origem'] = filename
-    df_final['vl_saldo_final'] = df_final[
-        'vl_saldo_final'].apply(clean_currency)
+    df_final['vl_saldo_final'], rejected = parse_currency_series(
+        df_final['vl_saldo_final'])
+
+    if rejected:
+        print(f"      [Aviso] {rejected} valores monetários inválidos "
+              f"convertidos para nulo em {filename}.")
 
     return df_final
 
 
-def main():
+def list_zip_members(zip_ref):
+    """
+    Lista os membros tabulares (CSV/TXT) de um ZIP sem extraí-los.
+
+    Diretórios e arquivos de outros formatos são ignorados. A ordem é a do
+    diretório central do ZIP, o que torna o processamento determinístico.
+
+    Args:
+        zip_ref (zipfile.ZipFile): ZIP já aberto para leitura.
+
+    Returns:
+        list: Lista de `zipfile.ZipInfo` dos arquivos CSV/TXT.
+    """
+    members = []
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+        name = info.filename.lower()
+        if name.endswith('.csv') or name.endswith('.txt'):
+            members.append(info)
+    return members
+
+
+def process_member(zip_ref, info, output_file, chunksize=CHUNK_SIZE):
+    """
+    Normaliza um membro do ZIP bloco a bloco, anexando ao CSV de saída.
+
+    Cada bloco é filtrado (Classe 4) e gravado imediatamente, de modo que
+    apenas `chunksize` linhas brutas ficam em memória por vez. Nenhum
+    cabeçalho é gravado: ele é escrito uma única vez por `write_header`.
+    Se o membro falhar no meio, o CSV é truncado de volta ao tamanho
+    anterior, para que linhas parciais não entrem no consolidado.
+
+    Args:
+        zip_ref (zipfile.ZipFile): ZIP aberto para leitura.
+        info (zipfile.ZipInfo): Membro CSV/TXT a processar.
+        output_file (str): CSV de destino (aberto em modo append).
+        chunksize (int): Quantidade de linhas por bloco.
+
+    Returns:
+        int: Quantidade de registros de despesa gravados.
+    """
+    file = os.path.basename(info.filename)
+    rows_written = 0
+    start = (os.path.getsize(output_file)
+             if os.path.exists(output_file) else 0)
+
+    try:
+        with zip_ref.open(info) as member:
+            for chunk in iter_file_chunks(member, file, chunksize):
+                clean_df = normalize_dataframe(chunk, file)
+                if clean_df is None or clean_df.empty:
+                    continue
+
+                clean_df.to_csv(
+                    output_file,
+                    mode='a',
+                    header=False,
+                    index=False,
+                    sep=';',
+                    encoding='utf-8')
+
+                rows_written += len(clean_df)
+    except BaseException:
+        if os.path.exists(output_file):
+            with open(output_file, 'r+b') as f:
+                f.truncate(start)
+        raise
+
+    return rows_written
+
+
+def write_header(output_file):
+    """Recria o CSV consolidado contendo apenas o cabeçalho canônico."""
+    pd.DataFrame(columns=COLUNAS_FINAIS).to_csv(
+        output_file, index=False, sep=';', encoding='utf-8')
+
+
+def build_tasks(zip_files):
+    """
+    Monta a lista ordenada de tarefas (um membro CSV/TXT por tarefa).
+
+    A ordem (ZIPs em ordem alfabética, membros na ordem do diretório
+    central) define a ordem de concatenação da saída, garantindo um
+    resultado idêntico qualquer que seja o número de workers.
+
+    Args:
+        zip_files (list): Nomes dos ZIPs em `RAW_DIR`.
+
+    Returns:
+        list: Tuplas (zip_name, member_name).
+    """
+    tasks = []
+    for zip_name in sorted(zip_files):
+        zip_path = os.path.join(RAW_DIR, zip_name)
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                members = list_zip_members(zip_ref)
+        except Exception as e:
+            print(f"   [Erro Crítico no ZIP] {zip_name}: {e}")
+            continue
+
+        tasks.extend((zip_name, info.filename) for info in members)
+    return tasks
+
+
+def normalize_member_task(task):
+    """
+    Unidade de trabalho executada em cada processo do pool.
+
+    Abre o ZIP de forma independente (objetos ZipFile não são
+    compartilháveis entre processos) e normaliza um único membro.
+
+    Args:
+        task (tuple): (zip_name, member_name, output_file, chunksize).
+
+    Returns:
+        tuple: (registros gravados, mensagem de erro ou None).
+    """
+    zip_name, member_name, output_file, chunksize = task
+    try:
+        zip_path = os.path.join(RAW_DIR, zip_name)
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            info = zip_ref.getinfo(member_name)
+            rows = process_member(zip_ref, info, output_file, chunksize)
+        return rows, None
+    except Exception as e:
+        return 0, str(e)
+
+
+def collect_results(tasks, results, pending):
+    """
+    Consome os resultados das tarefas, na ordem, exibindo o progresso.
+
+    Args:
+        tasks (list): Tuplas (zip_name, member_name) na ordem canônica.
+        results: Iterável de (registros gravados, erro) de cada tarefa.
+        pending (list): ZIPs reprocessados nesta execução.
+
+    Returns:
+        tuple: (registros por ZIP, conjunto de ZIPs com falha).
+    """
+    rows_by_zip = {zip_name: 0 for zip_name in pending}
+    failed = set()
+    current_zip = None
+
+    for (zip_name, member_name), (rows, error) in zip(tasks, results):
+        if zip_name != current_zip:
+            print(f"\nProcessando ZIP: {zip_name}...")
+            current_zip = zip_name
+
+        file = os.path.basename(member_name)
+        print(f"   -> Normalizando (Filtrando Classe 4): {file}")
+
+        if error:
+            print(f"      [Erro Leitura] {file}: {error}")
+            failed.add(zip_name)
+        elif rows:
+            rows_by_zip[zip_name] += rows
+        else:
+            ignore_msg = ("      [Info] Arquivo ignorado "
+                          "(Sem dados de Despesas).")
+            print(ignore_msg)
+
+    return rows_by_zip, failed
+
+
+def merge_parts(part_files, output_file):
+    """
+    Concatena as saídas parciais, na ordem das tarefas, ao CSV final.
+
+    Args:
+        part_files (list): Caminhos das partes, já na ordem canônica.
+        output_file (str): CSV de destino (aberto em modo append).
+    """
+    with open(output_file, 'ab') as dst:
+        for part in part_files:
+            if not os.path.exists(part):
+                continue
+            with open(part, 'rb') as src:
+                shutil.copyfileobj(src, dst)
+
+
+def partition_path(zip_name):
+    """Caminho da partição normalizada (CSV sem cabeçalho) de um ZIP."""
+    stem = os.path.splitext(zip_name)[0]
+    return os.path.join(PARTITIONS_DIR, f"{stem}.csv")
+
+
+def main(workers=1, chunksize=CHUNK_SIZE, full=False):
     """
     Orquestrador da Etapa 1.2: ETL com filtro de Despesas.
 
     Fluxo operacional:
-    1. Identificação: Localiza ZIPs brutos baixados.
-    2. Extração Controlada: Descompacta em área temporária.
-    3. Transformação: Filtra contas de despesa (Classe 4).
-    4. Carga: Consolida resultados em CSV único.
+    1. Identificação: Localiza ZIPs brutos e compara cada um com o
+       manifesto da última execução (tamanho, mtime e SHA-256).
+    2. Leitura em Streaming: Abre cada CSV/TXT dos ZIPs novos ou alterados
+       direto do ZIP (`ZipFile.open()`), sem cópia descompactada em disco.
+    3. Transformação: Filtra contas de despesa (Classe 4) em blocos de
+       `chunksize` linhas, mantendo a memória constante.
+    4. Particionamento: Cada ZIP gera uma partição em `PARTITIONS_DIR`.
+       Com N workers, cada membro é normalizado em um processo separado
+       e as partes são concatenadas na ordem canônica das tarefas.
+    5. Carga: O CSV consolidado é remontado concatenando as partições
+       (novas e reaproveitadas), idêntico byte a byte para qualquer N.
+
+    Args:
+        workers (int): Quantidade de processos de normalização.
+        chunksize (int): Quantidade de linhas lidas por bloco.
+        full (bool): Ignora o manifesto e reprocessa todos os ZIPs.
     """
     print(">>> Iniciando Etapa 1.2: Processamento e Normalização (ETL)")
-    if os.path.exists(TEMP_DIR):
-        shutil.rmtree(TEMP_DIR)
-    os.makedirs(TEMP_DIR, exist_ok=True)
-    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    os.makedirs(PARTITIONS_DIR, exist_ok=True)
 
     output_file = os.path.join(PROCESSED_DIR, "despesas_consolidadas.csv")
-    zip_files = [f for f in os.listdir(RAW_DIR) if f.endswith('.zip')]
+    zip_files = sorted(f for f in os.listdir(RAW_DIR) if f.endswith('.zip'))
 
     if not zip_files:
         print("Nenhum arquivo ZIP encontrado. Rode a etapa 1.1 primeiro.")
         return
 
-    first_write = True
-    processed_count = 0
+    manifest = load_manifest()
+    previous = {} if full else manifest.get(MANIFEST_SECTION, {})
 
+    pending = []
     for zip_name in zip_files:
-        print(f"\nProcessando ZIP: {zip_name}...")
         zip_path = os.path.join(RAW_DIR, zip_name)
+        unchanged = (is_unchanged(previous.get(zip_name), zip_path)
+                     and os.path.exists(partition_path(zip_name)))
+        if unchanged:
+            print(f"   [Inalterado] {zip_name}: reaproveitando partição.")
+        else:
+            pending.append(zip_name)
+
+    tasks = build_tasks(pending)
+    for zip_name in pending:
+        open(partition_path(zip_name), 'w').close()
+
+    if workers > 1 and tasks:
+        print(f"   -> Paralelizando {len(tasks)} arquivos em "
+              f"{workers} processos...")
+        if os.path.exists(PARTS_DIR):
+            shutil.rmtree(PARTS_DIR)
+        os.makedirs(PARTS_DIR, exist_ok=True)
+        part_files = [os.path.join(PARTS_DIR, f"{i:05d}.csv")
+                      for i in range(len(tasks))]
+        jobs = [(z, m, part, chunksize)
+                for (z, m), part in zip(tasks, part_files)]
+        executor = ProcessPoolExecutor(max_workers=workers)
         try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(TEMP_DIR)
-
-            for root, _, files in os.walk(TEMP_DIR):
-                for file in files:
-                    is_csv = file.lower().endswith('.csv')
-                    is_txt = file.lower().endswith('.txt')
-                    if not (is_csv or is_txt):
-                        continue
-
-                    file_path = os.path.join(root, file)
-                    
-                    log_msg = (f"   -> Normalizando (Filtrando Classe 4): "
-                               f"{file}")
-                    print(log_msg)
-
-                    raw_df = load_file_content(file_path)
-                    clean_df = normalize_dataframe(raw_df, file)
-
-                    if clean_df is not None and not clean_df.empty:
-                        mode = 'w' if first_write else 'a'
-                        header = first_write
-
-                        clean_df.to_csv(
-                            output_file,
-                            mode=mode,
-                            header=header,
-                            index=False,
-                            sep=';',
-                            encoding='utf-8')
-
-                        first_write = False
-                        processed_count += len(clean_df)
-                    else:
-                        ignore_msg = ("      [Info] Arquivo ignorado "
-                                      "(Sem dados de Despesas).")
-                        print(ignore_msg)
-
-        except Exception as e:
-            print(f"   [Erro Crítico no ZIP] {zip_name}: {e}")
-
-        shutil.rmtree(TEMP_DIR)
-        os.makedirs(TEMP_DIR, exist_ok=True)
+            rows_by_zip, failed = collect_results(
+                tasks, executor.map(normalize_member_task, jobs), pending)
+            print("   -> Consolidando saídas parciais...")
+            for zip_name in pending:
+                zip_parts = [part for (z, _), part in zip(tasks, part_files)
+                             if z == zip_name]
+                merge_parts(zip_parts, partition_path(zip_name))
+        finally:
+            # Também em erro/Ctrl-C: cancela o que não começou, espera os
+            # processos saírem e não deixa saídas parciais para trás.
+            executor.shutdown(cancel_futures=True)
+            if os.path.exists(PARTS_DIR):
+                shutil.rmtree(PARTS_DIR)
+    else:
+        jobs = [(z, m, partition_path(z), chunksize) for z, m in tasks]
+        rows_by_zip, failed = collect_results(
+            tasks, map(normalize_member_task, jobs), pending)
+
+    entries = {}
+    task_zips = {zip_name for zip_name, _ in tasks}
+    for zip_name in zip_files:
+        if zip_name not in pending:
+            entries[zip_name] = previous[zip_name]
+        elif zip_name in task_zips and zip_name not in failed:
+            entry = file_fingerprint(os.path.join(RAW_DIR, zip_name))
+            entry["particao"] = partition_path(zip_name)
+            entry["registros"] = rows_by_zip[zip_name]
+            entries[zip_name] = entry
+
+    current_partitions = {os.path.basename(partition_path(z))
+                          for z in zip_files}
+    for name in os.listdir(PARTITIONS_DIR):
+        if name not in current_partitions:
+            os.remove(os.path.join(PARTITIONS_DIR, name))
+
+    print("   -> Remontando CSV consolidado a partir das partições...")
+    write_header(output_file)
+    merge_parts([partition_path(z) for z in zip_files], output_file)
+
+    manifest[MANIFEST_SECTION] = entries
+    save_manifest(manifest)
+
+    processed_count = sum(rows_by_zip.values()) + sum(
+        entry.get("registros", 0) for name, entry in entries.items()
+        if name not in pending)
+
+    if get_format() == "parquet":
+        print("   -> Convertendo saída para Parquet...")
+        output_file = csv_to_parquet(output_file, chunksize)
 
     print("\n>>> Sucesso! Processamento concluído.")
+    print(f"ZIPs reprocessados: {len(pending)} | "
+          f"reaproveitados: {len(zip_files) - len(pending)}")
     print(f"Total de registros de DESPESAS processados: {processed_count}")
     print(f"Arquivo salvo em: {output_file}")
 
 
+def parse_args():
+    """Lê os parâmetros de linha de comando da etapa."""
+    parser = argparse.ArgumentParser(
+        description="Etapa 1.2: Processamento e Normalização (ETL)")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Processos paralelos de normalização (padrão: 1).")
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE,
+        help=f"Linhas lidas por bloco (padrão: {CHUNK_SIZE}).")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Ignora o manifesto e reprocessa todos os ZIPs.")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(workers=args.workers, chunksize=args.chunk_size, full=args.full)
\ No newline at end of file
@@ -1,49 +1,26 @@
 import os
 import pandas as pd
-import requests
 import zipfile
 import urllib3
 
+from storage import read_frame, write_frame
+from stage_2_1_validation import validate_dataframe, print_report
+from cadop_registry import download_cadop, load_registry
+from join_keys import encode_reg_ans
+
 PROCESSED_DIR = os.path.join("data", "processed")
 OUTPUT_ZIP = "consolidado_despesas.zip"
 INPUT_CSV = os.path.join(PROCESSED_DIR, "despesas_consolidadas.csv")
-CADOP_CSV = os.path.join("data", "raw", "Relatorio_cadop.csv")
 FINAL_CSV = "consolidado_despesas.csv"
-CADOP_BASE = "https://dadosabertos.ans.gov.br/FTP/PDA"
-CADOP_URL = (f"{CADOP_BASE}/operadoras_de_plano_de_saude_ativas/"
-             f"Relatorio_cadop.csv")
-
-
-def download_cadop():
-    """
-    Baixa o Relatório de Cadastros (CADOP).
-    Utiliza User-Agent customizado para driblar bloqueios de segurança
-    do site da ANS que rejeitam scripts Python (Erro 404/403).
-    """
-    if os.path.exists(CADOP_CSV):
-        print(f"   [Cache] Usando cadastro já baixado: {CADOP_CSV}")
-        return
-
-    print("   [Download] Baixando dados cadastrais (CNPJ/Razão Social)...")
-    try:
-        r = requests.get(CADOP_URL, headers=HEADERS, verify=False, timeout=60)
-        r.raise_for_status()
-
-        with open(CADOP_CSV, 'wb') as f:
-            f.write(r.content)
-        print("   [Sucesso] Download concluído!")
-
-    except Exception as e:
-        print(f"   [Erro] Falha ao baixar Cadop: {e}")
-        if os.path.exists(CADOP_CSV):
-            os.remove(CADOP_CSV)
-        raise e
 
 
 def load_and_enrich_data():
     """
     Carrega dados processados e realiza o Join com a base cadastral.
 
+    O cadastro vem do `cadop_registry` (lido uma vez e guardado em
+    snapshot); o join é uma consulta ao índice por Registro ANS.
+
     TRATATIVA DE INCONSISTÊNCIA DE DATAS:
     - Problema: Arquivos originais possuem nomes variados para data.
     - Abordagem: Extração via Regex (r'(\d)T' e r'(\d{4})') do nome do
@@ -52,12 +29,13 @@ def load_and_enrich_data():
       padronizados, independente do formato do nome do arquivo (zip/csv).
 
     Returns:
-        pd.DataFrame: DataFrame unificado contendo chaves para o merge.
+        tuple: (DataFrame unificado, com o CNPJ codificado; dicionário
+        `KeyDictionary` dos CNPJs).
     """
     print(">>> Iniciando Etapa 1.3: Análise e Enriquecimento")
 
     print("   -> Lendo arquivo de despesas consolidadas...")
-    df_despesas = pd.read_csv(INPUT_CSV, sep=';', encoding='utf-8')
+    df_despesas = read_frame(INPUT_CSV)
 
     df_despesas['Trimestre'] = df_despesas['arquivo_origem'].str.extract(
         r'(\d)T').fillna(0).astype(int)
@@ -65,62 +43,22 @@ def load_and_enrich_data():
         r'(\d{4})').fillna(0).astype(int)
 
     download_cadop()
-    print("   -> Lendo dados cadastrais...")
+    registry = load_registry()
 
-    try:
-        df_cadop = pd.read_csv(CADOP_CSV, sep=';', encoding='latin1',
-                               dtype=str)
-        if len(df_cadop.columns) < 2:
-            raise ValueError("Separador incorreto")
-    except Exception:
-        print("      [Aviso] Tentando ler Cadop com separador vírgula...")
-        df_cadop = pd.read_csv(CADOP_CSV, sep=',', encoding='utf-8',
-                               dtype=str)
-
-    df_cadop.columns = [c.strip().upper().replace('"', '')
-                        for c in df_cadop.columns]
-
-    possible_names = [
-        'REGISTRO_OPERADORA', 'REGISTRO_ANS', 'CD_OPERADORA', 'REG_ANS',
-        'REGISTRO ANS'
-    ]
-    target_col = None
-
-    for nome in possible_names:
-        if nome in df_cadop.columns:
-            target_col = nome
-            break
-
-    if not target_col:
-        err_msg = (f"Coluna ANS não encontrada. Colunas: "
-                   f"{list(df_cadop.columns)}")
-        raise KeyError(err_msg)
-
-    df_cadop = df_cadop.rename(columns={
-        target_col: 'reg_ans',
-        'RAZAO_SOCIAL': 'RazaoSocial'
-    })
-
-    if 'RazaoSocial' not in df_cadop.columns:
-        social_col = next((c for c in df_cadop.columns if 'SOCIAL' in c), None)
-        if social_col:
-            df_cadop = df_cadop.rename(columns={social_col: 'RazaoSocial'})
-
-    df_despesas['reg_ans'] = df_despesas['reg_ans'].astype(str)
-    df_cadop['reg_ans'] = df_cadop['reg_ans'].astype(str)
-
-    print("   -> Realizando Enriquecimento (Merge)...")
-    cols_to_merge = ['reg_ans', 'CNPJ']
-    if 'RazaoSocial' in df_cadop.columns:
-        cols_to_merge.append('RazaoSocial')
-
-    df_merged = pd.merge(df_despesas, df_cadop[cols_to_merge],
-                         on='reg_ans', how='left')
-
-    return df_merged
-
-
-def analyze_and_clean(df):
+    print("   -> Realizando Enriquecimento (Índice por Registro ANS)...")
+    # Chaves como inteiros: REG_ANS em int32 e o CNPJ como código do
+    # dicionário do cadastro (o texto só volta em `analyze_and_clean`).
+    df_despesas['reg_ans'] = encode_reg_ans(df_despesas['reg_ans'])
+    df_cadastro = registry.lookup_codes(
+        'reg_ans', df_despesas['reg_ans'].to_numpy(),
+        columns=['CNPJ', 'RazaoSocial'])
+    df_cadastro.index = df_despesas.index
+    df_merged = pd.concat([df_despesas, df_cadastro], axis=1)
+
+    return df_merged, registry.cnpj_keys
+
+
+def analyze_and_clean(df, cnpj_keys=None):
     """
     Aplica regras de negócio e documenta a Análise Crítica dos dados.
 
@@ -141,6 +79,10 @@ def analyze_and_clean(df):
 
     Args:
         df (pd.DataFrame): DataFrame bruto enriquecido.
+        cnpj_keys (KeyDictionary): Dicionário dos CNPJs, quando a coluna
+            vem codificada (`load_and_enrich_data`); o mapeamento
+            '1 CNPJ -> 1 Nome' roda sobre os códigos e o texto é
+            restaurado só no DataFrame final.
 
     Returns:
         pd.DataFrame: DataFrame limpo e validado.
@@ -170,6 +112,8 @@ def analyze_and_clean(df):
     df_final = df[cols_finais].copy()
     df_final.rename(columns={'vl_saldo_final': 'ValorDespesas'}, inplace=True)
 
+    if cnpj_keys is not None:
+        df_final['CNPJ'] = cnpj_keys.decode(df_final['CNPJ'])
     df_final['CNPJ'] = df_final['CNPJ'].fillna('N/A')
     df_final['RazaoSocial'] = df_final['RazaoSocial'].fillna('N/A')
 
@@ -190,7 +134,7 @@ def create_zip_package(df):
     csv_path = os.path.join(PROCESSED_DIR, FINAL_CSV)
 
     print(f"   -> Salvando CSV final: {csv_path}")
-    df.to_csv(csv_path, index=False, sep=';', encoding='utf-8')
+    write_frame(df, csv_path, keep_csv=True)
 
     print(f"   -> Compactando para {OUTPUT_ZIP}...")
     with zipfile.ZipFile(OUTPUT_ZIP, 'w', zipfile.ZIP_DEFLATED) as zf:
@@ -203,8 +147,13 @@ if __name__ == "__main__":
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
     try:
-        df_enriched = load_and_enrich_data()
-        df_clean = analyze_and_clean(df_enriched)
+        df_enriched, cnpj_keys = load_and_enrich_data()
+        df_clean = analyze_and_clean(df_enriched, cnpj_keys)
         create_zip_package(df_clean)
+
+        # Valida o consolidado ainda em memória: a Etapa 2.1 não precisa
+        # reler o CSV recém-gravado (o manifesto registra a validação).
+        print(">>> Validando consolidado em memória (Etapa 2.1)...")
+        print_report(validate_dataframe(df_clean))
     except Exception as e:
         print(f"\n[ERRO FATAL] O script parou: {e}")
\ No newline at end of file
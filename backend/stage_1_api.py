@@ -1,32 +1,127 @@
 import os
 import re
+import time
+import argparse
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+
+from http_cache import cached_get
 
 
 BASE_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
 OUTPUT_DIR = os.path.join("data", "raw")
 MAX_RECURSION_DEPTH = 2
 
+# Crawler concorrente: limite global de requisições simultâneas, limite por
+# host (politeness) e política de retentativas com backoff exponencial.
+CRAWL_WORKERS = 8
+HOST_MAX_CONCURRENCY = 4
+HOST_MIN_INTERVAL = 0.05
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+
+# Downloads paralelos e retomáveis (HTTP Range sobre arquivos .part).
+DOWNLOAD_WORKERS = 3
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def build_session(pool_size=CRAWL_WORKERS, retries=MAX_RETRIES,
+                  backoff_factor=BACKOFF_FACTOR):
+    """
+    Cria uma sessão HTTP com pool de conexões e retentativas com backoff.
+
+    A mesma sessão é compartilhada por todas as threads do crawler, de modo
+    que as conexões TCP/TLS com o servidor da ANS são reaproveitadas em vez
+    de abertas a cada requisição.
+
+    Args:
+        pool_size (int): Conexões mantidas por host.
+        retries (int): Tentativas extras para erros de conexão e 429/5xx.
+        backoff_factor (float): Base do backoff exponencial (segundos).
+
+    Returns:
+        requests.Session: Sessão pronta para uso.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HostLimiter:
+    """
+    Politeness por host: limita requisições simultâneas e o intervalo
+    mínimo entre o início de duas requisições ao mesmo servidor.
+    """
 
-def get_soup(url):
+    def __init__(self, max_concurrency=HOST_MAX_CONCURRENCY,
+                 min_interval=HOST_MIN_INTERVAL):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_concurrency)
+            return self._semaphores[host]
+
+    def _reserve_slot(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        return slot - now
+
+    def request(self, session, url, **kwargs):
+        """Executa um GET respeitando os limites do host da URL."""
+        host = urlparse(url).netloc
+        with self._semaphore(host):
+            delay = self._reserve_slot(host)
+            if delay > 0:
+                time.sleep(delay)
+            return session.get(url, **kwargs)
+
+
+def get_soup(url, session=None, limiter=None):
     """
     Realiza uma requisição HTTP GET e retorna o objeto BeautifulSoup parseado.
 
     Gerencia exceções de conexão e timeout para evitar quebra do pipeline.
+    As listagens passam pelo cache HTTP em disco (`http_cache`): dentro do
+    prazo de validade não há requisição, e depois dele a revalidação
+    condicional custa apenas um 304 quando nada mudou.
 
     Args:
         url (str): A URL alvo para raspagem.
+        session (requests.Session): Sessão com pool de conexões (opcional).
+        limiter (HostLimiter): Controle de politeness por host (opcional).
 
     Returns:
         BeautifulSoup: Objeto pronto para extração de tags, ou None se 
         houver erro.
     """
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return BeautifulSoup(response.text, 'html.parser')
+        content, _ = cached_get(url, session=session, limiter=limiter,
+                                timeout=30)
+        return BeautifulSoup(content, 'html.parser')
     except requests.RequestException as e:
         print(f"   [Erro Conexão] {url}: {e}")
         return None
@@ -65,28 +160,19 @@ def parse_quarter_from_filename(filename):
     return None
 
 
-def crawl_for_zips(url, current_depth=0):
+def parse_listing(soup, url):
     """
-    Varre recursivamente a URL e subdiretórios em busca de arquivos .zip.
-
-    Utiliza recursão controlada (MAX_RECURSION_DEPTH) para navegar na estrutura
-    de pastas do servidor FTP/HTTP da ANS sem entrar em loops infinitos.
+    Separa os links de uma listagem de diretório em ZIPs e subpastas.
 
     Args:
-        url (str): URL atual para inspeção.
-        current_depth (str): Profundidade atual da recursão (padrão 0).
+        soup (BeautifulSoup): Listagem já parseada.
+        url (str): URL da listagem (base para links relativos).
 
     Returns:
-        list: Lista de dicionários contendo metadados {'year', 'quarter', 
-        'filename', 'url'}.
+        tuple: (lista de metadados de ZIPs, lista de URLs de subpastas).
     """
-    found_files = [] 
-    if current_depth > MAX_RECURSION_DEPTH:
-        return found_files
-
-    soup = get_soup(url)
-    if not soup:
-        return found_files
+    found_files = []
+    subfolders = []
 
     for a_tag in soup.find_all('a', href=True):
         href = a_tag['href']     
@@ -108,15 +194,256 @@ def crawl_for_zips(url, current_depth=0):
                 })
         
         elif href.endswith('/'):
-            print(f"   [Recursão Nível {current_depth+1}]"
-                  f" Entrando na pasta: {filename}")
-            subfolder_files = crawl_for_zips(full_url, current_depth + 1)
-            found_files.extend(subfolder_files)
+            subfolders.append((filename, full_url))
+
+    return found_files, subfolders
+
+
+def crawl_many(urls, current_depth=0, max_workers=CRAWL_WORKERS,
+               session=None, limiter=None):
+    """
+    Varre várias URLs em paralelo, nível a nível, em busca de arquivos .zip.
+
+    Cada nível da árvore é buscado de forma concorrente por um pool de
+    threads que compartilha uma única sessão HTTP (pool de conexões e
+    retentativas com backoff). O `HostLimiter` garante a politeness com o
+    servidor da ANS. A profundidade continua limitada por
+    `MAX_RECURSION_DEPTH`.
+
+    Args:
+        urls (list): URLs iniciais (ex: pastas de anos).
+        current_depth (int): Profundidade das URLs iniciais.
+        max_workers (int): Limite global de requisições simultâneas.
+        session (requests.Session): Sessão compartilhada (criada se None).
+        limiter (HostLimiter): Politeness por host (criado se None).
+
+    Returns:
+        list: Lista de dicionários contendo metadados {'year', 'quarter', 
+        'filename', 'url'}.
+    """
+    session = session or build_session(pool_size=max_workers)
+    limiter = limiter or HostLimiter()
+    found_files = []
+    frontier = list(urls)
+    depth = current_depth
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while frontier and depth <= MAX_RECURSION_DEPTH:
+            soups = executor.map(
+                lambda u: get_soup(u, session=session, limiter=limiter),
+                frontier)
+
+            next_frontier = []
+            for url, soup in zip(frontier, soups):
+                if not soup:
+                    continue
+                files, subfolders = parse_listing(soup, url)
+                found_files.extend(files)
+                for filename, full_url in subfolders:
+                    if depth + 1 <= MAX_RECURSION_DEPTH:
+                        print(f"   [Recursão Nível {depth+1}]"
+                              f" Entrando na pasta: {filename}")
+                    next_frontier.append(full_url)
+
+            frontier = next_frontier
+            depth += 1
 
     return found_files
 
 
-def main():
+def crawl_for_zips(url, current_depth=0, max_workers=CRAWL_WORKERS,
+                   session=None, limiter=None):
+    """
+    Varre a URL e subdiretórios em busca de arquivos .zip.
+
+    Mantém a interface original; a varredura é feita por `crawl_many`,
+    de forma concorrente e limitada por `MAX_RECURSION_DEPTH`.
+
+    Args:
+        url (str): URL atual para inspeção.
+        current_depth (int): Profundidade atual da recursão (padrão 0).
+        max_workers (int): Limite global de requisições simultâneas.
+        session (requests.Session): Sessão compartilhada (opcional).
+        limiter (HostLimiter): Politeness por host (opcional).
+
+    Returns:
+        list: Lista de dicionários contendo metadados {'year', 'quarter', 
+        'filename', 'url'}.
+    """
+    return crawl_many([url], current_depth, max_workers, session, limiter)
+
+
+def verify_zip(path, expected_size=None):
+    """
+    Verifica a integridade de um ZIP baixado.
+
+    Confere o tamanho esperado (quando conhecido) e roda `testzip`, que
+    valida o CRC de todos os membros.
+
+    Args:
+        path (str): Caminho do arquivo.
+        expected_size (int): Tamanho em bytes informado pelo servidor.
+
+    Returns:
+        bool: True se o arquivo está íntegro.
+    """
+    if expected_size is not None and os.path.getsize(path) != expected_size:
+        return False
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return zf.testzip() is None
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+def _expected_total(response, resume_from):
+    """Extrai o tamanho total do arquivo dos cabeçalhos da resposta."""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    if response.status_code == 200 and 'Content-Length' in response.headers:
+        return int(response.headers['Content-Length'])
+    if 'Content-Length' in response.headers:
+        return resume_from + int(response.headers['Content-Length'])
+    return None
+
+
+def download_file(item, output_dir=OUTPUT_DIR, session=None,
+                  chunk_size=DOWNLOAD_CHUNK_SIZE, retries=MAX_RETRIES):
+    """
+    Baixa um arquivo de forma retomável e atômica.
+
+    Os bytes são gravados em `<arquivo>.part`. Se a transferência cair,
+    a próxima tentativa (nesta ou em outra execução) envia
+    `Range: bytes=<tamanho do .part>-` e continua de onde parou. Ao final,
+    o tamanho e o `testzip` são verificados e o `.part` é renomeado
+    atomicamente para o nome final, então um ZIP truncado nunca fica com
+    o nome definitivo.
+
+    Args:
+        item (dict): Metadados {'filename', 'url', ...} do crawler.
+        output_dir (str): Pasta de destino.
+        session (requests.Session): Sessão HTTP (opcional).
+        chunk_size (int): Tamanho dos blocos lidos da rede.
+        retries (int): Retomadas após falhas no meio da transferência.
+
+    Returns:
+        dict: {'filename', 'status', 'bytes', 'seconds', 'resumed_from'}.
+    """
+    session = session or requests
+    filepath = os.path.join(output_dir, item['filename'])
+    part_path = f"{filepath}.part"
+    started = time.monotonic()
+
+    if os.path.exists(filepath):
+        if verify_zip(filepath):
+            return {"filename": item['filename'], "status": "skip",
+                    "bytes": 0, "seconds": 0.0, "resumed_from": 0}
+        print(f"   [Corrompido] {item['filename']}: retomando download.")
+        os.replace(filepath, part_path)
+
+    first_offset = None
+    downloaded = 0
+    last_error = None
+
+    for _ in range(retries + 1):
+        resume_from = (os.path.getsize(part_path)
+                       if os.path.exists(part_path) else 0)
+        if first_offset is None:
+            first_offset = resume_from
+        headers = {'Range': f'bytes={resume_from}-'} if resume_from else {}
+
+        try:
+            with session.get(item['url'], stream=True, timeout=60,
+                             headers=headers) as r:
+                if r.status_code == 416:
+                    expected = _expected_total(r, resume_from)
+                else:
+                    r.raise_for_status()
+                    if resume_from and r.status_code != 206:
+                        resume_from = 0
+                    expected = _expected_total(r, resume_from)
+                    mode = 'ab' if resume_from else 'wb'
+                    with open(part_path, mode) as f:
+                        for chunk in r.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                            downloaded += len(chunk)
+        except requests.RequestException as e:
+            last_error = e
+            continue
+
+        if verify_zip(part_path, expected):
+            os.replace(part_path, filepath)
+            return {"filename": item['filename'],
+                    "status": "resumed" if first_offset else "ok",
+                    "bytes": downloaded,
+                    "seconds": time.monotonic() - started,
+                    "resumed_from": first_offset}
+
+        if expected is not None and os.path.getsize(part_path) < expected:
+            last_error = IOError("transferência incompleta")
+            continue
+
+        os.remove(part_path)
+        last_error = IOError("falha na verificação de integridade "
+                             "(tamanho/testzip)")
+
+    raise IOError(f"{item['filename']}: download não concluído após "
+                  f"{retries + 1} tentativas ({last_error}).")
+
+
+def download_all(items, output_dir=OUTPUT_DIR, workers=DOWNLOAD_WORKERS,
+                 chunk_size=DOWNLOAD_CHUNK_SIZE, session=None):
+    """
+    Baixa vários arquivos em paralelo e imprime o relatório de vazão.
+
+    Args:
+        items (list): Metadados dos arquivos (saída do crawler).
+        output_dir (str): Pasta de destino.
+        workers (int): Downloads simultâneos.
+        chunk_size (int): Tamanho dos blocos lidos da rede.
+        session (requests.Session): Sessão HTTP compartilhada.
+
+    Returns:
+        list: Resultados de `download_file` (ou {'status': 'error'}).
+    """
+    session = session or build_session(pool_size=workers)
+    started = time.monotonic()
+
+    def worker(item):
+        try:
+            return download_file(item, output_dir, session, chunk_size)
+        except Exception as e:
+            return {"filename": item['filename'], "status": "error",
+                    "bytes": 0, "seconds": 0.0, "resumed_from": 0,
+                    "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(worker, items))
+
+    for res in results:
+        if res['status'] == 'skip':
+            print(f"   [Pular] {res['filename']} já existe e está íntegro.")
+        elif res['status'] == 'error':
+            print(f"   [Falha] Erro ao baixar {res['filename']}: "
+                  f"{res['error']}")
+        else:
+            mb = res['bytes'] / (1024 * 1024)
+            rate = mb / res['seconds'] if res['seconds'] else 0.0
+            extra = (f" (retomado de {res['resumed_from']} bytes)"
+                     if res['status'] == 'resumed' else "")
+            print(f"   [Sucesso] {res['filename']}: {mb:.1f} MB em "
+                  f"{res['seconds']:.1f}s ({rate:.2f} MB/s){extra}")
+
+    elapsed = time.monotonic() - started
+    total_mb = sum(r['bytes'] for r in results) / (1024 * 1024)
+    rate = total_mb / elapsed if elapsed else 0.0
+    print(f"   -> Total: {total_mb:.1f} MB em {elapsed:.1f}s "
+          f"({rate:.2f} MB/s)")
+    return results
+
+
+def main(workers=DOWNLOAD_WORKERS, chunk_size=DOWNLOAD_CHUNK_SIZE):
     """
     Pipeline de Extração (Etapa 1.1).
 
@@ -125,13 +452,21 @@ def main():
     2. Identifica pastas de Anos (ex: '2025/', '2024/').
     3. Varre os 3 anos mais recentes buscando ZIPs recursivamente.
     4. Seleciona apenas os 3 trimestres cronologicamente mais novos.
-    5. Realiza o download dos arquivos selecionados para 'data/raw'.
+    5. Realiza o download paralelo e retomável dos arquivos selecionados
+       para 'data/raw', validando cada ZIP antes de publicá-lo.
+
+    Args:
+        workers (int): Downloads simultâneos.
+        chunk_size (int): Tamanho dos blocos lidos da rede.
     """
     print(">>> Iniciando Etapa 1.1: Coleta Resiliente e Recursiva")
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+    session = build_session()
+    limiter = HostLimiter()
+
     print(f"Acessando Raiz: {BASE_URL}...")
-    soup = get_soup(BASE_URL)  
+    soup = get_soup(BASE_URL, session=session, limiter=limiter)
     if not soup:
         print("Erro crítico: Não foi possível acessar a URL base.")
         return
@@ -148,12 +483,9 @@ def main():
         print("Nenhum ano encontrado.")
         return
 
-    all_candidates = []
     print(f"Varrendo os anos mais recentes: {[y[0] for y in years_found[:3]]}") 
-    for year_val, year_url in years_found[:3]:
-        print(f"\nVerificando ano: {year_val}...")
-        files_in_year = crawl_for_zips(year_url)
-        all_candidates.extend(files_in_year)
+    all_candidates = crawl_many([url for _, url in years_found[:3]],
+                                session=session, limiter=limiter)
 
     all_candidates.sort(key=lambda x: (x['year'], x['quarter']))
     last_3_quarters = all_candidates[-3:]
@@ -167,23 +499,23 @@ def main():
         print(f" -> {item['year']} / {item['quarter']}º Tri: {item['filename']}")
 
     print("\n>>> Iniciando Downloads...")
-    for item in last_3_quarters:
-        filepath = os.path.join(OUTPUT_DIR, item['filename']) 
-        if os.path.exists(filepath):
-            print(f"   [Pular] {item['filename']} já existe.")
-            continue
+    download_all(last_3_quarters, workers=workers, chunk_size=chunk_size,
+                 session=session)
 
-        print(f"   [Baixando] {item['filename']}...")
-        try:
-            with requests.get(item['url'], stream=True, timeout=60) as r:
-                r.raise_for_status()
-                with open(filepath, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            print("   Sucesso!")
-        except Exception as e:
-            print(f"   [Falha] Erro ao baixar {item['filename']}: {e}")
+
+def parse_args():
+    """Lê os parâmetros de linha de comando da etapa."""
+    parser = argparse.ArgumentParser(
+        description="Etapa 1.1: Coleta dos ZIPs da ANS")
+    parser.add_argument(
+        "--workers", type=int, default=DOWNLOAD_WORKERS,
+        help=f"Downloads simultâneos (padrão: {DOWNLOAD_WORKERS}).")
+    parser.add_argument(
+        "--chunk-size", type=int, default=DOWNLOAD_CHUNK_SIZE,
+        help=f"Bytes por bloco de leitura (padrão: {DOWNLOAD_CHUNK_SIZE}).")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(workers=args.workers, chunk_size=args.chunk_size)
\ No newline at end of file
@@ -1,12 +1,32 @@
+import numpy as np
 import pandas as pd
 import os
 import re
+import json
+import argparse
+
+from storage import get_format, csv_to_parquet, frame_exists
+from manifest import load_manifest, save_manifest, file_fingerprint, \
+    is_unchanged
+from quality_rules import RuleRegistry
 
 
 PROCESSED_DIR = os.path.join("data", "processed")
 INPUT_CSV = os.path.join(PROCESSED_DIR, "consolidado_despesas.csv")
 OUTPUT_VALID = os.path.join(PROCESSED_DIR, "despesas_validas.csv")
 OUTPUT_INVALID = os.path.join(PROCESSED_DIR, "despesas_rejeitadas.csv")
+OUTPUT_REPORT = os.path.join(PROCESSED_DIR, "relatorio_validacao.json")
+MANIFEST_SECTION = "stage_2_1"
+CHUNK_SIZE = 200_000
+INPUT_COLUMNS = ['CNPJ', 'RazaoSocial', 'Trimestre', 'Ano', 'ValorDespesas']
+# Incrementar ao mudar funções auxiliares das regras (ex: a validação de
+# CNPJ): o hash de `RuleRegistry.signature` só enxerga o corpo dos checks.
+RULES_VERSION = 1
+# Preenchimento de nulos da etapa 1.3 (`analyze_and_clean`).
+NA_MARKER = 'N/A'
+
+CNPJ_WEIGHTS_1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+CNPJ_WEIGHTS_2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
 
 
 def validate_cnpj_math(cnpj):
@@ -37,63 +57,271 @@ def validate_cnpj_math(cnpj):
     return cnpj[-2:] == f"{digit_1}{digit_2}"
 
 
-def run_validation_pipeline():
+def _check_digit(digits, weights):
+    """Dígito verificador (vetorizado) para cada linha da matriz."""
+    remainder = (digits @ weights) % 11
+    return np.where(remainder < 2, 0, 11 - remainder)
+
+
+def validate_cnpj_vectorized(series):
+    """
+    Versão vetorizada de `validate_cnpj_math` para uma coluna inteira.
+
+    Cada CNPJ distinto é validado uma única vez (o mesmo CNPJ se repete em
+    milhares de lançamentos): os dígitos viram uma matriz (n x 14) e os
+    verificadores saem de produtos escalares com os pesos, em NumPy.
+
+    Args:
+        series (pd.Series): Coluna de CNPJs (texto, com ou sem pontuação).
+
+    Returns:
+        pd.Series: Booleanos alinhados ao índice de `series`.
+    """
+    codes, uniques = pd.factorize(series)
+    digits = pd.Series(uniques, dtype=object).astype(str).str.replace(
+        r'[^0-9]', '', regex=True)
+    has_14 = (digits.str.len() == 14).to_numpy()
+
+    valid_unique = np.zeros(len(uniques), dtype=bool)
+    if has_14.any():
+        raw = ''.join(digits[has_14]).encode('ascii')
+        matrix = (np.frombuffer(raw, dtype=np.uint8).reshape(-1, 14)
+                  - ord('0')).astype(np.int64)
+        repeated = (matrix == matrix[:, :1]).all(axis=1)
+        digit_1 = _check_digit(matrix[:, :12], CNPJ_WEIGHTS_1)
+        digit_2 = _check_digit(matrix[:, :13], CNPJ_WEIGHTS_2)
+        valid_unique[has_14] = ((matrix[:, 12] == digit_1)
+                                & (matrix[:, 13] == digit_2) & ~repeated)
+
+    # Código -1 do factorize = valor nulo (inválido).
+    valid = np.where(codes >= 0, valid_unique[codes], False)
+    return pd.Series(valid, index=series.index)
+
+
+def build_default_rules():
+    """
+    Monta o registro com as regras padrão da etapa.
+
+    Novas regras entram aqui (ou via `registry.rule(...)` em quem chama),
+    sem nova leitura do arquivo: todas rodam na mesma passada por bloco.
+
+    Returns:
+        RuleRegistry: Completude, faixa de valor e CNPJ, nessa ordem.
+    """
+    registry = RuleRegistry()
+    registry.add(
+        "razao_social", "Razão Social Vazia",
+        lambda df: (df['RazaoSocial'].notna()
+                    & (df['RazaoSocial'].astype(str).str.strip() != '')
+                    & (df['RazaoSocial'] != 'N/A')))
+    registry.add(
+        "valor_positivo", "Valor Zerado ou Negativo",
+        lambda df: df['ValorDespesas'] > 0)
+    registry.add(
+        "cnpj", "CNPJ Inválido",
+        lambda df: validate_cnpj_vectorized(df['CNPJ']))
+    return registry
+
+
+def rules_version(registry):
+    """Versão das regras gravada no manifesto junto com o consolidado."""
+    return f"{RULES_VERSION}-{registry.signature()}"
+
+
+def prepare_chunk(df):
+    """
+    Converte o valor para número (inválidos viram 0.0, e falham).
+
+    O marcador 'N/A' da etapa 1.3 vira nulo, como no `read_csv`, para que
+    o consolidado validado em memória e o relido do disco gerem as mesmas
+    saídas.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].mask(df[col] == NA_MARKER)
+    df['ValorDespesas'] = pd.to_numeric(
+        df['ValorDespesas'], errors='coerce'
+    ).fillna(0.0)
+    return df
+
+
+def _at_least_one(chunks, columns):
+    """Repassa os blocos; sem nenhum, entrega um bloco vazio com `columns`."""
+    empty = True
+    for chunk in chunks:
+        empty = False
+        yield chunk
+    if empty:
+        yield pd.DataFrame(columns=list(columns))
+
+
+def validate_chunks(chunks, registry=None, chunksize=CHUNK_SIZE,
+                    columns=INPUT_COLUMNS):
+    """
+    Valida blocos de lançamentos e grava os destinos válido e rejeitado.
+
+    Cada bloco passa uma única vez pelo registro de regras; os dois CSVs
+    são escritos por acréscimo, então a memória depende do tamanho do
+    bloco. No modo Parquet, o arquivo de válidos é convertido ao final.
+    Mesmo sem blocos, os dois CSVs são recriados (só com cabeçalho), para
+    que saídas de uma execução anterior não sobrevivam.
+
+    Args:
+        chunks: Iterável de DataFrames (colunas do consolidado).
+        registry (RuleRegistry): Regras; usa `build_default_rules()` se None.
+        chunksize (int): Linhas por row group na conversão para Parquet.
+        columns (list): Colunas das saídas quando não há nenhum bloco.
+
+    Returns:
+        dict: Relatório (`registry.report()` + válidos/rejeitados).
+    """
+    registry = registry or build_default_rules()
+    registry.reset_stats()
+    valid_rows = invalid_rows = 0
+    first = True
+
+    for chunk in _at_least_one(chunks, columns):
+        chunk = prepare_chunk(chunk)
+        bitmask = registry.evaluate(chunk)
+        is_valid = bitmask == 0
+
+        df_valid = chunk[is_valid]
+        df_invalid = chunk[~is_valid].copy()
+        df_invalid['motivo_rejeicao'] = registry.describe(
+            bitmask[~is_valid]).values
+        df_invalid['falhas_bitmask'] = bitmask[~is_valid]
+
+        mode = 'w' if first else 'a'
+        df_valid.to_csv(OUTPUT_VALID, index=False, sep=';', encoding='utf-8',
+                        mode=mode, header=first)
+        df_invalid.to_csv(OUTPUT_INVALID, index=False, sep=';',
+                          encoding='utf-8', mode=mode, header=first)
+        first = False
+        valid_rows += len(df_valid)
+        invalid_rows += len(df_invalid)
+
+    if get_format() == "parquet":
+        csv_to_parquet(OUTPUT_VALID, chunksize)
+
+    report = registry.report()
+    report.update(validos=valid_rows, rejeitados=invalid_rows)
+    with open(OUTPUT_REPORT, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def print_report(report):
+    """Exibe contadores e tempos por regra."""
+    print(f"   -> Registros validados: {report['registros']}")
+    for name, stats in report['regras'].items():
+        print(f"      [{name}] falhas: {stats['falhas']} | "
+              f"tempo: {stats['tempo_s']:.3f}s")
+    print(f"   -> Válidos: {report['validos']} | "
+          f"Rejeitados: {report['rejeitados']}")
+
+
+def record_input(registry, path=INPUT_CSV):
+    """Registra no manifesto o consolidado validado e a versão das regras."""
+    manifest = load_manifest()
+    manifest[MANIFEST_SECTION] = {"input": file_fingerprint(path),
+                                  "regras": rules_version(registry)}
+    save_manifest(manifest)
+
+
+def validate_dataframe(df, registry=None, chunksize=CHUNK_SIZE):
+    """
+    Valida um consolidado já em memória (chamado pela etapa 1.3).
+
+    Evita que a etapa 2.1 releia `consolidado_despesas.csv` logo depois
+    de ele ser gravado: o próprio DataFrame é fatiado em blocos.
+
+    Args:
+        df (pd.DataFrame): Consolidado (mesmas colunas do CSV).
+        registry (RuleRegistry): Regras; usa as padrão se None.
+        chunksize (int): Linhas por bloco.
+
+    Returns:
+        dict: Relatório da validação.
+    """
+    registry = registry or build_default_rules()
+    chunks = (df.iloc[start:start + chunksize]
+              for start in range(0, len(df), chunksize))
+    report = validate_chunks(chunks, registry, chunksize, df.columns)
+    if os.path.exists(INPUT_CSV):
+        record_input(registry)
+    return report
+
+
+def run_validation_pipeline(chunksize=CHUNK_SIZE, full=False, registry=None):
     """
     Executa o pipeline de Qualidade de Dados (Data Quality).
 
-    REGRAS DE VALIDAÇÃO APLICADAS:
+    REGRAS DE VALIDAÇÃO APLICADAS (ver `build_default_rules`):
     1. Completude: Razão Social não pode ser vazia ou nula.
     2. Consistência Financeira: Valores de despesas devem ser estritamente
        positivos (> 0). Valores zerados ou negativos são segregados.
     3. Integridade Fiscal: O CNPJ deve ser matematicamente válido.
 
+    Todas as regras são avaliadas em uma passada por bloco; uma linha que
+    falha em várias regras registra todos os motivos (`motivo_rejeicao`,
+    separados por ' | ') e a máscara `falhas_bitmask`.
+
     ESTRATÉGIA DE TRATAMENTO DE ERROS (TRADE-OFF):
     - Abordagem: Segregação (Valid & Invalid Sinks).
     - Justificativa: Ao invés de descartar registros com CNPJ inválido ou
       valores negativos (que podem ser estornos legítimos), salvamos em
       'despesas_rejeitadas.csv' para permitir auditoria e correção posterior
       sem interromper o fluxo principal.
+
+    Se a etapa 1.3 já validou este mesmo consolidado em memória, com as
+    mesmas regras (manifesto), a releitura é pulada.
+
+    Args:
+        chunksize (int): Linhas lidas por bloco.
+        full (bool): Revalida mesmo que o consolidado não tenha mudado.
+        registry (RuleRegistry): Regras; usa as padrão se None.
     """
     print(">>> Iniciando Etapa 2.1: Validação e Qualidade de Dados")
 
-    if not os.path.exists(INPUT_CSV):
+    if not frame_exists(INPUT_CSV):
         print(f"Erro: Arquivo de entrada não encontrado: {INPUT_CSV}")
         return
 
-    df = pd.read_csv(INPUT_CSV, sep=';', encoding='utf-8', dtype=str)
-    print(f"   -> Total de registros carregados: {len(df)}")
-
-    df['ValorDespesas'] = pd.to_numeric(
-        df['ValorDespesas'], errors='coerce'
-    ).fillna(0.0)
-
-    mask_razao = df['RazaoSocial'].notna() & (df['RazaoSocial'].str.strip() != '') & (df['RazaoSocial'] != 'N/A')
-
-    mask_valor = df['ValorDespesas'] > 0
-
-    print("   -> Validando dígitos verificadores de CNPJ...")
-    mask_cnpj = df['CNPJ'].apply(validate_cnpj_math)
-
-    df['is_valid'] = mask_razao & mask_valor & mask_cnpj
-
-    df.loc[~mask_razao, 'motivo_rejeicao'] = 'Razão Social Vazia'
-    df.loc[~mask_valor, 'motivo_rejeicao'] = 'Valor Zerado ou Negativo'
-    df.loc[~mask_cnpj, 'motivo_rejeicao'] = 'CNPJ Inválido'
-
-    df_valid = df[df['is_valid']].copy().drop(
-        columns=['is_valid','motivo_rejeicao']
-    )
+    entry = load_manifest().get(MANIFEST_SECTION, {})
+    default_rules = registry is None
+    registry = registry or build_default_rules()
+    if (not full and default_rules
+            and entry.get("regras") == rules_version(registry)
+            and is_unchanged(entry.get("input"), INPUT_CSV)
+            and frame_exists(OUTPUT_VALID) and os.path.exists(OUTPUT_INVALID)):
+        print("   -> Consolidado já validado pela Etapa 1.3 "
+              "(sem alterações). Nada a fazer.")
+        return
 
-    df_invalid = df[~df['is_valid']].copy().drop(columns=['is_valid'])
+    print(f"   -> Validando em blocos de {chunksize} linhas...")
+    chunks = pd.read_csv(INPUT_CSV, sep=';', encoding='utf-8', dtype=str,
+                         chunksize=chunksize)
+    report = validate_chunks(chunks, registry, chunksize)
+    record_input(registry)
+    print_report(report)
 
-    print(f"   -> Salvando Válidos: {len(df_valid)} registros")
-    df_valid.to_csv(OUTPUT_VALID, index=False, sep=';', encoding='utf-8')
+    print(">>> Validação concluída com sucesso.")
 
-    print(f"   -> Salvando Rejeitados: {len(df_invalid)} registros")
-    df_invalid.to_csv(OUTPUT_INVALID, index=False, sep=';', encoding='utf-8')
 
-    print(">>> Validação concluída com sucesso.")
+def parse_args():
+    """Lê os parâmetros de linha de comando da etapa."""
+    parser = argparse.ArgumentParser(
+        description="Etapa 2.1: Validação e Qualidade de Dados")
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE,
+        help=f"Linhas lidas por bloco (padrão: {CHUNK_SIZE}).")
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Revalida mesmo que o consolidado não tenha mudado.")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    run_validation_pipeline()
\ No newline at end of file
+    args = parse_args()
+    run_validation_pipeline(chunksize=args.chunk_size, full=args.full)
@@ -1,20 +1,80 @@
 import pandas as pd
 import os
 import zipfile
+import argparse
+
+from storage import iter_frame, write_frame, frame_exists
+from group_stats import GroupStats
 
 PROCESSED_DIR = os.path.join("data", "processed")
 INPUT_FILE = os.path.join(PROCESSED_DIR, "dados_enriquecido.csv")
 OUTPUT_CSV = os.path.join(PROCESSED_DIR, "despesas_agregadas.csv")
 
 FINAL_ZIP = os.path.join(os.getcwd(), "Teste_ConceicaoRocha.zip")
+CHUNK_SIZE = 200_000
+GROUP_KEYS = ['RazaoSocial', 'UF']
+
+
+def aggregate_chunks(chunks):
+    """
+    Acumula as estatísticas por (RazaoSocial, UF) bloco a bloco.
+
+    Args:
+        chunks: Iterável de DataFrames com as chaves e 'ValorDespesas'.
+
+    Returns:
+        tuple: (GroupStats com o estado parcial, registros lidos). Estados
+        de partes diferentes do arquivo podem ser combinados com
+        `GroupStats.merge`.
+    """
+    stats = GroupStats(GROUP_KEYS, 'ValorDespesas')
+    rows = 0
+    for chunk in chunks:
+        chunk['ValorDespesas'] = pd.to_numeric(
+            chunk['ValorDespesas'], errors='coerce').fillna(0.0)
+        # Chaves em texto: as categorias do Parquet variam por bloco.
+        for col in GROUP_KEYS:
+            chunk[col] = chunk[col].astype(object)
+        stats.update(chunk)
+        rows += len(chunk)
+    return stats, rows
+
+
+def build_report(stats):
+    """
+    Converte o estado agregado na tabela de entrega.
+
+    Args:
+        stats (GroupStats): Estado final.
+
+    Returns:
+        pd.DataFrame: Total, média, desvio padrão amostral (0.0 quando há
+        um só lançamento) e quantidade, com 2 casas decimais.
+    """
+    df_agg = stats.result().rename(columns={
+        'sum': 'Total_Despesas',
+        'mean': 'Media_Despesas',
+        'std': 'Desvio_Padrao',
+        'count': 'Qtd_Registros',
+    })
+
+    df_agg['Desvio_Padrao'] = df_agg['Desvio_Padrao'].fillna(0.0)
 
+    cols_float = ['Total_Despesas', 'Media_Despesas', 'Desvio_Padrao']
+    df_agg[cols_float] = df_agg[cols_float].round(2)
+    return df_agg
 
-def run_aggregation():
+
+def run_aggregation(chunksize=CHUNK_SIZE):
     """
     Executa a etapa final de Agregação Analítica e geração da entrega.
 
     TRANSFORMAÇÕES REALIZADAS:
-    1. Group By: Agrupa os dados transacionais por 'RazaoSocial' e 'UF'.
+    1. Group By: Agrupa os dados transacionais por 'RazaoSocial' e 'UF',
+       em streaming: o arquivo é lido em blocos e cada grupo mantém
+       acumuladores mescláveis (`GroupStats`: contagem, soma e termos de
+       variância de Welford/Chan). A memória depende do número de grupos,
+       não de linhas, e o resultado equivale ao `groupby().agg()`.
     2. Engenharia de Features:
        - Total_Despesas: Soma do valor financeiro.
        - Media_Despesas: Média simples por registro.
@@ -33,36 +93,31 @@ def run_aggregation():
     ENTREGA:
     - Gera o CSV 'despesas_agregadas.csv'.
     - Compacta o arquivo num ZIP 'Teste_ConceicaoRocha.zip' conforme requisito.
+
+    Args:
+        chunksize (int): Linhas lidas por bloco.
     """
     print(">>> Iniciando Etapa 2.3: Agregação e Estatísticas")
 
-    if not os.path.exists(INPUT_FILE):
+    if not frame_exists(INPUT_FILE):
         print("Erro: Arquivo enriquecido não encontrado. Rode a etapa 2.2.")
         return
 
-    df = pd.read_csv(INPUT_FILE, sep=';', encoding='utf-8')
+    print(f"   -> Agrupando em blocos de {chunksize} linhas...")
+    chunks = iter_frame(INPUT_FILE, chunksize, columns=GROUP_KEYS +
+                        ['ValorDespesas'],
+                        dtype={'RazaoSocial': str, 'UF': str})
+    stats, rows = aggregate_chunks(chunks)
+    print(f"   -> Dados processados: {rows} registros em {len(stats)} "
+          f"grupos.")
 
-    df['ValorDespesas'] = pd.to_numeric(df['ValorDespesas'], errors='coerce').fillna(0.0)
-
-    print(f"   -> Dados carregados: {len(df)} registros. Agrupando...")
-
-    df_agg = df.groupby(['RazaoSocial', 'UF'])['ValorDespesas'].agg(
-        Total_Despesas='sum',
-        Media_Despesas='mean',
-        Desvio_Padrao='std',
-        Qtd_Registros='count'
-    ).reset_index()
-
-    df_agg['Desvio_Padrao'] = df_agg['Desvio_Padrao'].fillna(0.0)
-
-    cols_float = ['Total_Despesas', 'Media_Despesas', 'Desvio_Padrao']
-    df_agg[cols_float] = df_agg[cols_float].round(2)
+    df_agg = build_report(stats)
 
     print("   -> Ordenando por Total de Despesas (Decrescente)...")
     df_agg = df_agg.sort_values(by='Total_Despesas', ascending=False)
 
     print(f"   -> Salvando CSV Agregado: {len(df_agg)} linhas.")
-    df_agg.to_csv(OUTPUT_CSV, index=False, sep=';', encoding='utf-8')
+    write_frame(df_agg, OUTPUT_CSV, keep_csv=True)
 
     print(f"   -> Compactando entrega final: {FINAL_ZIP}")
     with zipfile.ZipFile(FINAL_ZIP, 'w', zipfile.ZIP_DEFLATED) as zf:
@@ -72,5 +127,16 @@ def run_aggregation():
     print(f"Arquivo pronto para envio: {FINAL_ZIP}")
 
 
+def parse_args():
+    """Lê os parâmetros de linha de comando da etapa."""
+    parser = argparse.ArgumentParser(
+        description="Etapa 2.3: Agregação e Estatísticas")
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE,
+        help=f"Linhas lidas por bloco (padrão: {CHUNK_SIZE}).")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    run_aggregation()
\ No newline at end of file
+    args = parse_args()
+    run_aggregation(chunksize=args.chunk_size)
\ No newline at end of file
@@ -1,12 +1,123 @@
 import sqlite3
+import hashlib
+import time
 import pandas as pd
 import os
 
+from storage import read_frame, frame_exists
+from normalization import fold_text
+from join_keys import encode_cnpj, decode_cnpj, MISSING_CODE
+
 DB_NAME = "teste_intu.db"
 SQL_FILE = os.path.join("sql", "2_queries_analytics.sql")
 CSV_ENRIQUECIDO = os.path.join("data", "processed", "dados_enriquecido.csv")
 CSV_VALIDO = os.path.join("data", "processed", "despesas_validas.csv")
 
+# Schema de `sql/1_schema_ddl.sql` adaptado aos tipos do SQLite:
+# VARCHAR/CHAR -> TEXT, DECIMAL -> REAL, SERIAL -> INTEGER PRIMARY KEY
+# (alias do rowid) e DATE -> TEXT ISO 8601 ('YYYY-MM-DD').
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dim_operadoras (
+    cnpj TEXT PRIMARY KEY,
+    razao_social TEXT,
+    registro_ans TEXT,
+    modalidade TEXT,
+    uf TEXT
+);
+
+-- Ordem da listagem da API: permite paginação por chave (cursor).
+CREATE INDEX IF NOT EXISTS idx_operadoras_razao
+    ON dim_operadoras(razao_social, cnpj);
+
+CREATE TABLE IF NOT EXISTS fact_despesas (
+    id INTEGER PRIMARY KEY,
+    cnpj TEXT NOT NULL REFERENCES dim_operadoras(cnpj),
+    data_referencia TEXT NOT NULL,
+    conta_contabil TEXT,
+    valor_despesa REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS manifesto_carga (
+    data_referencia TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    registros INTEGER NOT NULL
+);
+
+-- Agregados materializados (ver `refresh_aggregates`).
+CREATE TABLE IF NOT EXISTS agg_operadora_trimestre (
+    cnpj TEXT NOT NULL,
+    data_referencia TEXT NOT NULL,
+    total REAL NOT NULL,
+    qtd_lancamentos INTEGER NOT NULL,
+    PRIMARY KEY (cnpj, data_referencia)
+);
+
+CREATE TABLE IF NOT EXISTS agg_trimestre (
+    data_referencia TEXT PRIMARY KEY,
+    total REAL NOT NULL,
+    qtd_lancamentos INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_resumo (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_geral REAL NOT NULL,
+    qtd_lancamentos INTEGER NOT NULL,
+    media_lancamento REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_top_operadoras (
+    posicao INTEGER PRIMARY KEY,
+    razao_social TEXT,
+    total REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_uf (
+    uf TEXT PRIMARY KEY,
+    total REAL NOT NULL
+);
+
+-- Versão do conteúdo carregado (lida pela API para invalidar o cache).
+CREATE TABLE IF NOT EXISTS dataset_meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+# Índice de busca textual da API: razão social sem acentos, com o mesmo
+# rowid de dim_operadoras. Opcional: exige o SQLite compilado com FTS5.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS busca_operadoras USING fts5(
+    nome,
+    tokenize = 'unicode61'
+);
+"""
+
+# Quantidade de operadoras guardadas no ranking materializado.
+TOP_OPERADORAS_N = 10
+
+# Índices criados somente após a carga (ver `load_fact_incremental`).
+SQLITE_INDEXES = {
+    "idx_despesas_data": ("CREATE INDEX IF NOT EXISTS idx_despesas_data "
+                          "ON fact_despesas(data_referencia)"),
+    # (cnpj, data_referencia) atende às buscas por CNPJ do DDL original e
+    # ainda entrega o histórico da API já ordenado por data.
+    "idx_despesas_cnpj": ("CREATE INDEX IF NOT EXISTS idx_despesas_cnpj "
+                          "ON fact_despesas(cnpj, data_referencia)"),
+}
+
+# PRAGMAs da carga em lote: WAL (leitores da API não bloqueiam a carga),
+# sem fsync durante a transação e cache de ~256 MB.
+LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": -262144,
+    "temp_store": "MEMORY",
+}
+# PRAGMAs restaurados ao fim da carga, para o uso normal do banco.
+RUNTIME_PRAGMAS = {
+    "synchronous": "NORMAL",
+}
+
 
 def find_column(df, candidates):
     """Encontra a primeira coluna que bate com a lista de candidatos."""
@@ -32,19 +143,279 @@ def reconstruir_data(row):
     
     return f"{ano}-{month}-01"
 
+
+def quarter_hash(df_quarter):
+    """
+    Calcula uma assinatura do conteúdo de um trimestre da tabela fato.
+
+    As linhas são ordenadas antes do hash, então a assinatura independe da
+    ordem em que chegaram no CSV.
+    """
+    ordered = df_quarter.sort_values(list(df_quarter.columns))
+    row_hashes = pd.util.hash_pandas_object(ordered, index=False)
+    return hashlib.sha256(row_hashes.values.tobytes()).hexdigest()
+
+
+def apply_pragmas(conn, pragmas):
+    """Aplica um dicionário de PRAGMAs do SQLite na conexão."""
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def ensure_schema(conn):
+    """
+    Cria o schema tipado (adaptado de `sql/1_schema_ddl.sql`).
+
+    Bancos antigos, criados pelo `to_sql` sem tipos nem chave primária,
+    são detectados pela ausência da coluna `id` e recriados.
+    """
+    columns = [row[1] for row in conn.execute(
+        "PRAGMA table_info(fact_despesas)")]
+    if columns and 'id' not in columns:
+        print("   -> Schema legado detectado (to_sql). Recriando tabelas...")
+        conn.executescript("""
+            DROP TABLE IF EXISTS fact_despesas;
+            DROP TABLE IF EXISTS dim_operadoras;
+            DROP TABLE IF EXISTS manifesto_carga;
+            DROP TABLE IF EXISTS agg_operadora_trimestre;
+            DROP TABLE IF EXISTS agg_trimestre;
+        """)
+    conn.executescript(SQLITE_SCHEMA)
+    try:
+        conn.executescript(SEARCH_SCHEMA)
+    except sqlite3.OperationalError as e:
+        print(f"   [Aviso] FTS5 indisponível, busca da API usará LIKE: {e}")
+
+
+def refresh_search_index(conn):
+    """
+    Reconstrói o índice FTS5 de busca a partir de `dim_operadoras`.
+
+    A dimensão é substituída a cada carga (e com ela os rowids), então o
+    índice é refeito por inteiro; o custo é proporcional ao cadastro de
+    operadoras, não à tabela fato. Deve rodar na transação da carga.
+
+    Returns:
+        int: Operadoras indexadas (0 se o FTS5 não estiver disponível).
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'busca_operadoras'"
+    ).fetchone()
+    if not exists:
+        return 0
+
+    rows = [(rowid, fold_text(razao_social)) for rowid, razao_social in
+            conn.execute("SELECT rowid, razao_social FROM dim_operadoras")]
+    conn.execute("DELETE FROM busca_operadoras")
+    conn.executemany(
+        "INSERT INTO busca_operadoras (rowid, nome) VALUES (?, ?)", rows)
+    return len(rows)
+
+
+def insert_rows(conn, table, df):
+    """
+    Insere um DataFrame com `executemany` (sem montar SQL por linha).
+
+    Args:
+        conn (sqlite3.Connection): Conexão em transação aberta.
+        table (str): Tabela de destino.
+        df (pd.DataFrame): Linhas, com colunas no nome das colunas da tabela.
+    """
+    cols = ", ".join(df.columns)
+    marks = ", ".join("?" for _ in df.columns)
+    conn.executemany(f"INSERT INTO {table} ({cols}) VALUES ({marks})",
+                     df.itertuples(index=False, name=None))
+
+
+def load_fact_incremental(conn, df_fact):
+    """
+    Carrega a tabela fato trimestre a trimestre, apenas o que mudou.
+
+    O manifesto da carga (`manifesto_carga`) fica no próprio banco e
+    guarda a assinatura e a quantidade de linhas de cada trimestre
+    carregado. Trimestres com a mesma assinatura são pulados; os
+    alterados são apagados e reinseridos; os que sumiram da entrada são
+    removidos. Assim, um trimestre novo da ANS custa apenas a sua carga.
+
+    Quando o volume a inserir é grande em relação ao que já está na
+    tabela (ex: carga inicial), os índices são removidos antes e
+    recriados depois, o que é bem mais rápido que mantê-los linha a linha.
+    Deve ser chamada dentro de uma transação aberta.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco.
+        df_fact (pd.DataFrame): Fato completo (cnpj, data_referencia,
+            valor_despesa).
+
+    Returns:
+        tuple: (trimestres recarregados, trimestres inalterados).
+    """
+    loaded = dict(conn.execute(
+        "SELECT data_referencia, hash FROM manifesto_carga").fetchall())
+
+    changed, skipped = [], []
+    for data_ref, df_quarter in df_fact.groupby('data_referencia', sort=True):
+        signature = quarter_hash(df_quarter)
+        if loaded.get(data_ref) == signature:
+            skipped.append(data_ref)
+        else:
+            changed.append((data_ref, signature, df_quarter))
+
+    stale = set(loaded) - set(df_fact['data_referencia'])
+    existing = conn.execute("SELECT COUNT(*) FROM fact_despesas").fetchone()[0]
+    incoming = sum(len(df_quarter) for _, _, df_quarter in changed)
+    rebuild_indexes = incoming * 2 >= existing
+
+    if rebuild_indexes and (changed or stale):
+        for index_name in SQLITE_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+    for data_ref in stale:
+        conn.execute("DELETE FROM fact_despesas WHERE data_referencia = ?",
+                     (data_ref,))
+        conn.execute("DELETE FROM manifesto_carga WHERE data_referencia = ?",
+                     (data_ref,))
+
+    for data_ref, signature, df_quarter in changed:
+        conn.execute("DELETE FROM fact_despesas WHERE data_referencia = ?",
+                     (data_ref,))
+        insert_rows(conn, 'fact_despesas', df_quarter)
+        conn.execute(
+            "INSERT OR REPLACE INTO manifesto_carga VALUES (?, ?, ?)",
+            (data_ref, signature, len(df_quarter)))
+
+    print("   -> Construindo índices...")
+    for index_name, ddl in SQLITE_INDEXES.items():
+        conn.execute(ddl)
+
+    return [data_ref for data_ref, _, _ in changed], skipped
+
+
+def refresh_aggregates(conn, reloaded):
+    """
+    Atualiza os agregados materializados usados pelo dashboard da API.
+
+    - `agg_operadora_trimestre` e `agg_trimestre` são recalculados só para
+      os trimestres recarregados (ou ainda ausentes dos agregados, ex: banco
+      criado antes destas tabelas); os trimestres removidos da fato somem.
+    - `agg_resumo`, `agg_top_operadoras` e `agg_uf` são refeitos a partir
+      do agregado por operadora/trimestre, que é ordens de grandeza menor
+      que a fato. Como a dimensão é substituída a cada carga, refazê-los
+      sempre mantém razão social e UF atualizadas.
+
+    Deve ser chamada dentro da transação da carga, após a tabela fato.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco.
+        reloaded (list): Trimestres (data_referencia) recarregados.
+
+    Returns:
+        int: Quantidade de trimestres reagregados.
+    """
+    conn.execute("""
+        DELETE FROM agg_operadora_trimestre WHERE data_referencia NOT IN
+            (SELECT data_referencia FROM manifesto_carga)""")
+    conn.execute("""
+        DELETE FROM agg_trimestre WHERE data_referencia NOT IN
+            (SELECT data_referencia FROM manifesto_carga)""")
+
+    missing = [row[0] for row in conn.execute("""
+        SELECT data_referencia FROM manifesto_carga
+        WHERE data_referencia NOT IN (SELECT data_referencia FROM agg_trimestre)
+    """)]
+    quarters = sorted(set(reloaded) | set(missing))
+
+    for data_ref in quarters:
+        conn.execute(
+            "DELETE FROM agg_operadora_trimestre WHERE data_referencia = ?",
+            (data_ref,))
+        conn.execute("""
+            INSERT INTO agg_operadora_trimestre
+            SELECT cnpj, data_referencia, SUM(valor_despesa), COUNT(*)
+            FROM fact_despesas
+            WHERE data_referencia = ?
+            GROUP BY cnpj""", (data_ref,))
+        conn.execute("""
+            INSERT OR REPLACE INTO agg_trimestre
+            SELECT data_referencia, SUM(valor_despesa), COUNT(*)
+            FROM fact_despesas
+            WHERE data_referencia = ?
+            GROUP BY data_referencia""", (data_ref,))
+
+    conn.execute("DELETE FROM agg_resumo")
+    conn.execute("""
+        INSERT INTO agg_resumo
+        SELECT 1, COALESCE(SUM(total), 0), COALESCE(SUM(qtd_lancamentos), 0),
+               COALESCE(SUM(total) / SUM(qtd_lancamentos), 0)
+        FROM agg_trimestre""")
+
+    conn.execute("DELETE FROM agg_top_operadoras")
+    conn.execute("""
+        INSERT INTO agg_top_operadoras (posicao, razao_social, total)
+        SELECT ROW_NUMBER() OVER (ORDER BY SUM(a.total) DESC),
+               o.razao_social, SUM(a.total)
+        FROM agg_operadora_trimestre a
+        JOIN dim_operadoras o ON a.cnpj = o.cnpj
+        GROUP BY o.razao_social
+        ORDER BY SUM(a.total) DESC
+        LIMIT ?""", (TOP_OPERADORAS_N,))
+
+    conn.execute("DELETE FROM agg_uf")
+    conn.execute("""
+        INSERT INTO agg_uf
+        SELECT o.uf, SUM(a.total)
+        FROM agg_operadora_trimestre a
+        JOIN dim_operadoras o ON a.cnpj = o.cnpj
+        WHERE o.uf != 'Não Informado'
+        GROUP BY o.uf""")
+
+    return len(quarters)
+
+
+def write_dataset_version(conn, df_dim):
+    """
+    Grava em `dataset_meta` a versão do conteúdo carregado.
+
+    A versão é derivada das assinaturas dos trimestres (manifesto) e da
+    dimensão: só muda quando os dados mudam, então uma recarga sem
+    alterações preserva os ETags e o cache da API.
+
+    Args:
+        conn (sqlite3.Connection): Conexão em transação aberta.
+        df_dim (pd.DataFrame): Dimensão de operadoras carregada.
+
+    Returns:
+        str: Versão gravada.
+    """
+    digest = hashlib.sha256(quarter_hash(df_dim.astype(str)).encode())
+    for data_ref, signature in conn.execute(
+            "SELECT data_referencia, hash FROM manifesto_carga "
+            "ORDER BY data_referencia"):
+        digest.update(f"{data_ref}:{signature}".encode())
+    version = digest.hexdigest()[:16]
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO dataset_meta (chave, valor) VALUES (?, ?)",
+        [("versao", version),
+         ("atualizado_em", time.strftime("%Y-%m-%dT%H:%M:%S"))])
+    return version
+
+
 def create_and_load_db():
     print(">>> Iniciando Teste de Banco de Dados (SQLite Lab)")
     
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(DB_NAME, isolation_level=None)
+    apply_pragmas(conn, LOAD_PRAGMAS)
+    ensure_schema(conn)
     print(f"   -> Banco de dados criado: {DB_NAME}")
 
     print("   -> Carregando CSVs...")
-    if not os.path.exists(CSV_ENRIQUECIDO) or not os.path.exists(CSV_VALIDO):
+    if not frame_exists(CSV_ENRIQUECIDO) or not frame_exists(CSV_VALIDO):
         print(f"ERRO CRÍTICO: Arquivos CSV não encontrados.")
         exit()
 
-    df_full = pd.read_csv(CSV_ENRIQUECIDO, sep=';', encoding='utf-8')
-    df_despesas = pd.read_csv(CSV_VALIDO, sep=';', encoding='utf-8')
+    df_full = read_frame(CSV_ENRIQUECIDO)
+    df_despesas = read_frame(CSV_VALIDO)
 
     print(f"   -> Colunas no CSV: {list(df_despesas.columns)}")
 
@@ -68,8 +439,16 @@ def create_and_load_db():
     df_fact = df_despesas[[col_cnpj, col_data, col_valor]].copy()
     df_fact.columns = ['cnpj', 'data_referencia', 'valor_despesa']
 
-    # Ajuste de Tipos
-    df_fact['valor_despesa'] = pd.to_numeric(df_fact['valor_despesa'], errors='coerce').fillna(0)
+    # Ajuste de Tipos (o sqlite3 só aceita tipos nativos do Python)
+    # CNPJ vira a chave canônica de 14 dígitos em texto: a API compara
+    # direto com a coluna (sem CAST), e o índice pode ser usado.
+    # A normalização roda só nos CNPJs distintos (int64 de 14 dígitos);
+    # o texto é restaurado por código, na borda de gravação.
+    cnpj_codes = encode_cnpj(df_fact['cnpj'])
+    df_fact = df_fact[cnpj_codes != MISSING_CODE]
+    df_fact['cnpj'] = decode_cnpj(cnpj_codes[cnpj_codes != MISSING_CODE])
+    df_fact['data_referencia'] = df_fact['data_referencia'].astype(str)
+    df_fact['valor_despesa'] = pd.to_numeric(df_fact['valor_despesa'], errors='coerce').fillna(0).astype(float)
 
     # Preparação da Dimensão Operadoras
     col_uf = find_column(df_full, ['UF', 'uf'])
@@ -81,16 +460,51 @@ def create_and_load_db():
         df_full['Modalidade'] = 'N/A'
         col_mod = 'Modalidade'
 
-    df_dim = df_full[[col_cnpj, col_razao, col_uf, col_mod]].drop_duplicates(subset=[col_cnpj])
-    df_dim.columns = ['cnpj', 'razao_social', 'uf', 'modalidade']
+    col_reg = find_column(df_full, ['RegistroANS', 'reg_ans', 'REG_ANS'])
+    if not col_reg:
+        df_full['RegistroANS'] = None
+        col_reg = 'RegistroANS'
+
+    # Deduplicação sobre o CNPJ em int64 (largura fixa), não sobre texto:
+    # primeira ocorrência de cada CNPJ válido.
+    dim_codes = encode_cnpj(df_full[col_cnpj])
+    first = (dim_codes != MISSING_CODE) & ~pd.Series(dim_codes).duplicated().to_numpy()
+    df_dim = df_full.loc[first, [col_cnpj, col_razao, col_reg, col_mod, col_uf]]
+    df_dim.columns = ['cnpj', 'razao_social', 'registro_ans', 'modalidade', 'uf']
+    df_dim = df_dim.astype(object).where(df_dim.notna(), None)
+    df_dim['cnpj'] = decode_cnpj(dim_codes[first])
+    df_dim['registro_ans'] = df_dim['registro_ans'].map(
+        lambda v: None if v is None
+        else str(int(v)) if isinstance(v, float) else str(v))
+
+    # Carga no Banco: uma única transação para dimensão + fato
+    start = time.perf_counter()
+    conn.execute("BEGIN")
+    try:
+        print("   -> Inserindo dados na tabela 'dim_operadoras'...")
+        conn.execute("DELETE FROM dim_operadoras")
+        insert_rows(conn, 'dim_operadoras', df_dim)
+        refresh_search_index(conn)
+
+        print("   -> Inserindo dados na tabela 'fact_despesas' (incremental)...")
+        reloaded, skipped = load_fact_incremental(conn, df_fact)
+
+        print("   -> Atualizando agregados materializados...")
+        reaggregated = refresh_aggregates(conn, reloaded)
+        version = write_dataset_version(conn, df_dim)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
 
-    # Carga no Banco
-    print("   -> Inserindo dados na tabela 'dim_operadoras'...")
-    df_dim.to_sql('dim_operadoras', conn, if_exists='replace', index=False)
+    apply_pragmas(conn, RUNTIME_PRAGMAS)
+    conn.execute("PRAGMA optimize")
+    print(f"      Trimestres recarregados: {len(reloaded)} | "
+          f"inalterados: {len(skipped)}")
+    print(f"      Trimestres reagregados: {reaggregated}")
+    print(f"      Versão do dataset: {version}")
+    print(f"   -> Carga concluída em {time.perf_counter() - start:.2f}s")
 
-    print("   -> Inserindo dados na tabela 'fact_despesas'...")
-    df_fact.to_sql('fact_despesas', conn, if_exists='replace', index=False)
- 
     return conn
 
 
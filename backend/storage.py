@@ -0,0 +1,226 @@
+import os
+import pandas as pd
+
+# Formato dos arquivos intermediários trocados entre as etapas.
+# 'csv' (padrão) mantém o comportamento original; 'parquet' grava arquivos
+# colunares tipados ao lado dos CSVs (mesmo nome, extensão .parquet).
+FORMAT_ENV_VAR = "PIPELINE_FORMAT"
+SUPPORTED_FORMATS = ("csv", "parquet")
+
+CATEGORICAL_COLUMNS = ["UF", "Modalidade"]
+FLOAT_COLUMNS = ["vl_saldo_final", "ValorDespesas"]
+INT_COLUMNS = ["Ano", "Trimestre"]
+TEXT_COLUMNS = ["CNPJ", "reg_ans", "RazaoSocial", "RegistroANS",
+                "cd_conta_contabil", "descricao", "arquivo_origem"]
+
+
+def get_format():
+    """
+    Retorna o formato intermediário configurado em `PIPELINE_FORMAT`.
+
+    Raises:
+        ValueError: Se o formato configurado não for suportado.
+    """
+    fmt = os.environ.get(FORMAT_ENV_VAR, "csv").strip().lower()
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"{FORMAT_ENV_VAR} inválido: '{fmt}'. "
+                         f"Use um de {SUPPORTED_FORMATS}.")
+    return fmt
+
+
+def parquet_path(csv_path):
+    """Caminho do arquivo Parquet equivalente a um CSV intermediário."""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def _require_pyarrow():
+    """Importa o pyarrow sob demanda (dependência opcional)."""
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "O formato 'parquet' requer o pacote opcional pyarrow "
+            "(pip install pyarrow).") from e
+    return pyarrow
+
+
+def apply_types(df):
+    """
+    Aplica os tipos canônicos das colunas conhecidas do pipeline.
+
+    - UF/Modalidade: categóricas (dictionary encoding no Parquet).
+    - Valores monetários: float64.
+    - Ano/Trimestre: inteiros anuláveis (Int64).
+    - Chaves e textos: string (CNPJ e REG_ANS nunca viram número, o que
+      preserva zeros à esquerda).
+
+    Args:
+        df (pd.DataFrame): DataFrame a tipar.
+
+    Returns:
+        pd.DataFrame: Cópia com os tipos aplicados.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype("category")
+        elif col in FLOAT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(
+                "float64")
+        elif col in INT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif col in TEXT_COLUMNS:
+            df[col] = df[col].astype("str")
+    return df
+
+
+def write_frame(df, csv_path, fmt=None, keep_csv=False):
+    """
+    Grava um artefato intermediário no formato configurado.
+
+    Args:
+        df (pd.DataFrame): Dados a persistir.
+        csv_path (str): Caminho canônico (CSV) do artefato.
+        fmt (str): Formato explícito; usa `get_format()` se None.
+        keep_csv (bool): No modo Parquet, grava também o CSV (para os
+            artefatos que também são entregáveis).
+
+    Returns:
+        str: Caminho do arquivo gravado no formato intermediário.
+    """
+    fmt = fmt or get_format()
+
+    if fmt == "parquet":
+        _require_pyarrow()
+        path = parquet_path(csv_path)
+        apply_types(df).to_parquet(path, index=False, compression="zstd")
+        if not keep_csv:
+            return path
+
+    df.to_csv(csv_path, index=False, sep=';', encoding='utf-8')
+    return csv_path if fmt == "csv" else parquet_path(csv_path)
+
+
+def read_frame(csv_path, fmt=None, **csv_kwargs):
+    """
+    Lê um artefato intermediário, preferindo o Parquet quando configurado.
+
+    No modo Parquet os tipos já vêm prontos e `csv_kwargs` (ex: `dtype`)
+    são ignorados. Se o Parquet não existir, cai para o CSV, o que permite
+    misturar etapas executadas em modos diferentes.
+
+    Args:
+        csv_path (str): Caminho canônico (CSV) do artefato.
+        fmt (str): Formato explícito; usa `get_format()` se None.
+        **csv_kwargs: Parâmetros extras repassados ao `pd.read_csv`.
+
+    Returns:
+        pd.DataFrame: Dados carregados.
+    """
+    fmt = fmt or get_format()
+
+    if fmt == "parquet" and os.path.exists(parquet_path(csv_path)):
+        _require_pyarrow()
+        return pd.read_parquet(parquet_path(csv_path))
+
+    return pd.read_csv(csv_path, sep=';', encoding='utf-8', **csv_kwargs)
+
+
+def iter_frame(csv_path, chunksize=200_000, columns=None, fmt=None,
+               **csv_kwargs):
+    """
+    Lê um artefato intermediário em blocos (mesma escolha de `read_frame`).
+
+    No modo Parquet, cada bloco vem de `iter_batches` do pyarrow; no CSV,
+    de `pd.read_csv(chunksize=...)`. A memória depende de `chunksize`.
+
+    Args:
+        csv_path (str): Caminho canônico (CSV) do artefato.
+        chunksize (int): Linhas por bloco.
+        columns (list): Colunas a ler (todas se None).
+        fmt (str): Formato explícito; usa `get_format()` se None.
+        **csv_kwargs: Parâmetros extras repassados ao `pd.read_csv`.
+
+    Yields:
+        pd.DataFrame: Blocos de até `chunksize` linhas.
+    """
+    fmt = fmt or get_format()
+
+    if fmt == "parquet" and os.path.exists(parquet_path(csv_path)):
+        pa = _require_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(parquet_path(csv_path))
+        for batch in parquet_file.iter_batches(batch_size=chunksize,
+                                               columns=columns):
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(csv_path, sep=';', encoding='utf-8',
+                           usecols=columns, chunksize=chunksize,
+                           **csv_kwargs)
+
+
+def frame_exists(csv_path, fmt=None):
+    """Indica se o artefato existe em algum dos formatos aceitos."""
+    fmt = fmt or get_format()
+    if fmt == "parquet" and os.path.exists(parquet_path(csv_path)):
+        return True
+    return os.path.exists(csv_path)
+
+
+def csv_to_parquet(csv_path, chunksize=200_000, remove_csv=True):
+    """
+    Converte um CSV intermediário grande em Parquet, bloco a bloco.
+
+    Cada bloco vira um row group; o schema é fixado pelo primeiro bloco,
+    de modo que a memória usada depende de `chunksize` e não do arquivo.
+
+    Args:
+        csv_path (str): CSV (separador ';') a converter.
+        chunksize (int): Linhas por bloco/row group.
+        remove_csv (bool): Remove o CSV após a conversão.
+
+    Returns:
+        str: Caminho do Parquet gerado.
+    """
+    pa = _require_pyarrow()
+    path = parquet_path(csv_path)
+    writer = None
+
+    try:
+        for chunk in pd.read_csv(csv_path, sep=';', encoding='utf-8',
+                                 dtype=str, chunksize=chunksize):
+            chunk = apply_types(chunk)
+            for col in CATEGORICAL_COLUMNS:
+                if col in chunk.columns:
+                    chunk[col] = chunk[col].astype("str")
+
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                schema = _dictionary_schema(pa, table.schema)
+                writer = pa.parquet.ParquetWriter(path, schema,
+                                                  compression="zstd")
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        header = pd.read_csv(csv_path, sep=';', encoding='utf-8',
+                             dtype=str, nrows=0)
+        apply_types(header).to_parquet(path, index=False)
+
+    if remove_csv:
+        os.remove(csv_path)
+    return path
+
+
+def _dictionary_schema(pa, schema):
+    """Troca as colunas categóricas conhecidas por dictionary<string>."""
+    fields = []
+    for field in schema:
+        if field.name in CATEGORICAL_COLUMNS:
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        fields.append(field.remove_metadata())
+    return pa.schema(fields)
@@ -0,0 +1,127 @@
+import unittest
+import sys
+import os
+import io
+import pickle
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import stage_2_3_aggregation  # noqa: E402
+from group_stats import GroupStats  # noqa: E402
+from stage_2_3_aggregation import aggregate_chunks, build_report  # noqa: E402
+
+
+def make_enriched(rows=5000, seed=3):
+    """Dados enriquecidos sintéticos: grupos grandes, unitários e chaves nulas."""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"OPERADORA {i}" for i in range(40)], dtype=object)
+    ufs = np.array(['SP', 'RJ', 'MG', 'Não Informado'], dtype=object)
+    df = pd.DataFrame({
+        'RazaoSocial': names[rng.integers(0, len(names), rows)],
+        'UF': ufs[rng.integers(0, len(ufs), rows)],
+        # Valores grandes com média alta: caso ruim para a fórmula ingênua.
+        'ValorDespesas': np.round(rng.normal(1e7, 5e4, rows), 2),
+    })
+    df.loc[rng.integers(0, rows, 50), 'RazaoSocial'] = np.nan
+    df.loc[rng.integers(0, rows, 50), 'UF'] = np.nan
+    df.loc[rng.integers(0, rows, 30), 'ValorDespesas'] = np.nan
+    singles = pd.DataFrame({'RazaoSocial': ['UNICA A', 'UNICA B'],
+                            'UF': ['BA', 'AM'],
+                            'ValorDespesas': [123.45, -10.0]})
+    return pd.concat([df, singles], ignore_index=True)
+
+
+def reference_report(df):
+    """Implementação anterior da etapa 2.3 (tudo em memória)."""
+    df = df.copy()
+    df['ValorDespesas'] = pd.to_numeric(
+        df['ValorDespesas'], errors='coerce').fillna(0.0)
+    df_agg = df.groupby(['RazaoSocial', 'UF'], observed=True)[
+        'ValorDespesas'].agg(
+        Total_Despesas='sum',
+        Media_Despesas='mean',
+        Desvio_Padrao='std',
+        Qtd_Registros='count'
+    ).reset_index()
+    df_agg['Desvio_Padrao'] = df_agg['Desvio_Padrao'].fillna(0.0)
+    cols_float = ['Total_Despesas', 'Media_Despesas', 'Desvio_Padrao']
+    df_agg[cols_float] = df_agg[cols_float].round(2)
+    return df_agg
+
+
+def split(df, size):
+    return [df.iloc[start:start + size].copy()
+            for start in range(0, len(df), size)]
+
+
+class TestStreamingAggregation(unittest.TestCase):
+
+    def test_matches_groupby_agg(self):
+        """Testa a equivalência com `groupby().agg()` para vários tamanhos de bloco."""
+        df = make_enriched()
+        expected = reference_report(df)
+        for size in (len(df), 1000, 333, 50):
+            stats, rows = aggregate_chunks(split(df, size))
+            self.assertEqual(rows, len(df))
+            pd.testing.assert_frame_equal(build_report(stats), expected)
+
+    def test_raw_statistics(self):
+        """Testa soma, média, desvio amostral e contagem sem arredondamento."""
+        df = make_enriched(rows=2000).dropna(subset=['ValorDespesas'])
+        expected = df.groupby(['RazaoSocial', 'UF'])['ValorDespesas'].agg(
+            ['sum', 'mean', 'std', 'count']).reset_index()
+        stats = GroupStats(['RazaoSocial', 'UF'], 'ValorDespesas')
+        for chunk in split(df, 77):
+            stats.update(chunk)
+        result = stats.result()
+
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-9)
+        self.assertTrue(result['std'][result['count'] == 1].isna().all())
+
+    def test_partial_states_merge(self):
+        """Testa se estados parciais (ex: de outros processos) se combinam."""
+        df = make_enriched()
+        expected = build_report(aggregate_chunks(split(df, 500))[0])
+
+        parts = split(df, 1700)
+        states = [pickle.loads(pickle.dumps(aggregate_chunks([part])[0]))
+                  for part in parts]
+        merged = states[2].merge(states[0]).merge(states[1])
+        pd.testing.assert_frame_equal(build_report(merged), expected)
+
+    def test_run_aggregation_output(self):
+        """Testa o CSV da etapa contra a implementação anterior."""
+        df = make_enriched()
+        cwd = os.getcwd()
+        final_zip = stage_2_3_aggregation.FINAL_ZIP
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            stage_2_3_aggregation.FINAL_ZIP = os.path.join(tmp, 'entrega.zip')
+            try:
+                os.makedirs(os.path.join('data', 'processed'))
+                df.to_csv(stage_2_3_aggregation.INPUT_FILE, sep=';',
+                          index=False)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stage_2_3_aggregation.run_aggregation(chunksize=400)
+                with open(stage_2_3_aggregation.OUTPUT_CSV, 'rb') as f:
+                    output = f.read()
+
+                source = pd.read_csv(stage_2_3_aggregation.INPUT_FILE,
+                                     sep=';')
+                reference = reference_report(source).sort_values(
+                    by='Total_Despesas', ascending=False)
+                expected = reference.to_csv(index=False, sep=';',
+                                            encoding='utf-8').encode()
+            finally:
+                stage_2_3_aggregation.FINAL_ZIP = final_zip
+                os.chdir(cwd)
+
+        self.assertEqual(output, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,541 @@
+import unittest
+import sys
+import os
+import io
+import json
+import hashlib
+import importlib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import OperationalError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from test_database import DatabaseTestCase  # noqa: E402
+
+
+class ApiTestCase(DatabaseTestCase):
+    """Carrega o banco de teste e sobe a API apontando para ele."""
+
+    def setUp(self):
+        super().setUp()
+        conn, _ = self.load()
+        conn.close()
+        os.makedirs('frontend')
+        import api
+        self.api = importlib.reload(api)
+        self.client = TestClient(self.api.app)
+
+    def tearDown(self):
+        self.client.close()
+        self.api.engine.dispose()
+        self.api.export_engine.dispose()
+        super().tearDown()
+
+
+class TestCnpjLookups(ApiTestCase):
+
+    def test_cnpj_key_keeps_leading_zeros(self):
+        """Testa se a chave de 14 dígitos sobrevive ao CSV e à busca sem zeros."""
+        for cnpj in ('04455566000199', '4455566000199', '04.455.566.0001-99'):
+            res = self.client.get(f'/api/operadoras/{cnpj}')
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.json()['cnpj'], '04455566000199')
+
+    def test_history_uses_index(self):
+        """Testa se o histórico por CNPJ usa índice (sem CAST na coluna)."""
+        res = self.client.get('/api/operadoras/11222333000181/despesas')
+        self.assertEqual([d['valor_despesa'] for d in res.json()],
+                         [150.0, 100.0])
+
+        with self.api.engine.connect() as conn:
+            plan = conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT data_referencia, valor_despesa "
+                "FROM fact_despesas WHERE cnpj = ? "
+                "ORDER BY data_referencia DESC", ('11222333000181',)).all()
+        self.assertIn('USING INDEX idx_despesas_cnpj', plan[0][-1])
+
+    def test_unknown_cnpj_returns_404(self):
+        """Testa o 404 para CNPJ inexistente ou malformado."""
+        self.assertEqual(
+            self.client.get('/api/operadoras/00000000000000').status_code, 404)
+        self.assertEqual(
+            self.client.get('/api/operadoras/abc/despesas').status_code, 404)
+
+
+class TestPagination(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_inputs([
+            (f'{i:014d}', f'OPERADORA {i % 7}', 'SP', 1, 10.0)
+            for i in range(1, 26)
+        ])
+        conn, _ = self.load()
+        conn.close()
+
+    def test_cursor_walks_whole_registry(self):
+        """Testa se os cursores percorrem tudo, sem repetir nem pular."""
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 4}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/api/operadoras', params=params).json()
+            seen.extend((op['razao_social'], op['cnpj'])
+                        for op in body['data'])
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_page_mode_matches_cursor_mode(self):
+        """Testa se page/limit (frontend) continuam iguais ao modo cursor."""
+        page_1 = self.client.get('/api/operadoras',
+                                 params={'page': 1, 'limit': 5}).json()
+        page_2 = self.client.get('/api/operadoras',
+                                 params={'page': 2, 'limit': 5}).json()
+        by_cursor = self.client.get(
+            '/api/operadoras',
+            params={'limit': 5, 'cursor': page_1['next_cursor']}).json()
+
+        self.assertEqual(page_1['total'], 25)
+        self.assertEqual(page_2['page'], 2)
+        self.assertEqual(by_cursor['data'], page_2['data'])
+        self.assertIsNone(by_cursor['total'])
+
+    def test_cursor_with_search_and_total(self):
+        """Testa cursor combinado com busca e total opcional."""
+        first = self.client.get('/api/operadoras', params={
+            'limit': 2, 'search': 'OPERADORA 3'}).json()
+        rest = self.client.get('/api/operadoras', params={
+            'limit': 2, 'search': 'OPERADORA 3', 'include_total': 'true',
+            'cursor': first['next_cursor']}).json()
+
+        self.assertEqual(first['total'], 4)
+        self.assertEqual(rest['total'], 4)
+        self.assertEqual(len(rest['data']), 2)
+        self.assertIsNone(rest['next_cursor'])
+
+    def test_invalid_cursor_returns_400(self):
+        """Testa o 400 para cursor malformado."""
+        res = self.client.get('/api/operadoras', params={'cursor': 'xx'})
+        self.assertEqual(res.status_code, 400)
+
+    def test_page_and_limit_are_validated(self):
+        """Testa o 422 para limit/page fora da faixa (antes: 500 com limit=0)."""
+        for params in ({'limit': 0}, {'limit': -1}, {'page': 0},
+                       {'limit': self.api.LIST_MAX_LIMIT + 1}):
+            res = self.client.get('/api/operadoras', params=params)
+            self.assertEqual(res.status_code, 422, params)
+
+        res = self.client.get('/api/operadoras',
+                              params={'limit': self.api.LIST_MAX_LIMIT})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()['data']), 25)
+
+    def test_keyset_uses_index(self):
+        """Testa se a ordenação usa o índice (sem ordenação temporária)."""
+        with self.api.engine.connect() as conn:
+            plan = conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT cnpj FROM dim_operadoras "
+                "WHERE (razao_social, cnpj) > (?, ?) "
+                "ORDER BY razao_social, cnpj LIMIT 5", ('A', '1')).all()
+        detail = ' '.join(row[-1] for row in plan)
+        self.assertIn('idx_operadoras_razao', detail)
+        self.assertNotIn('TEMP B-TREE', detail)
+
+
+class TestSearch(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_inputs([
+            ('11222333000181', 'UNIMED SAÚDE LTDA', 'SP', 1, 10.0),
+            ('11299999000100', 'SAÚDE SAÚDE ASSISTÊNCIA', 'SP', 1, 10.0),
+            ('04455566000199', 'AMIL ASSISTENCIA MEDICA', 'RJ', 1, 10.0),
+            ('55666777000155', 'CLINICA SAO JOSE', 'MG', 1, 10.0),
+        ])
+        conn, _ = self.load()
+        conn.close()
+
+    def search(self, term, **params):
+        return self.client.get('/api/operadoras',
+                               params={'search': term, **params}).json()
+
+    def test_accent_folded_prefix_search(self):
+        """Testa se a busca ignora acentos/caixa e aceita prefixos."""
+        for term in ('SAUDE', 'saúde', 'Sau'):
+            body = self.search(term)
+            self.assertEqual(body['total'], 2)
+        self.assertEqual(self.search('assistencia')['total'], 2)
+        self.assertEqual(self.search('nada parecido')['total'], 0)
+
+    def test_results_are_ranked(self):
+        """Testa se a operadora com mais ocorrências do termo vem primeiro."""
+        body = self.search('saude')
+        self.assertEqual(body['data'][0]['razao_social'],
+                         'SAÚDE SAÚDE ASSISTÊNCIA')
+
+    def test_ranked_cursor(self):
+        """Testa o cursor sobre resultados ranqueados."""
+        first = self.search('saude', limit=1)
+        rest = self.search('saude', limit=1, cursor=first['next_cursor'])
+
+        self.assertEqual(rest['data'][0]['razao_social'], 'UNIMED SAÚDE LTDA')
+        self.assertIsNone(rest['next_cursor'])
+
+    def test_cnpj_prefix_search(self):
+        """Testa a busca por prefixo de CNPJ (com ou sem pontuação)."""
+        self.assertEqual(self.search('112')['total'], 2)
+        self.assertEqual(self.search('11.222.333')['total'], 1)
+        self.assertEqual(self.search('044')['data'][0]['cnpj'],
+                         '04455566000199')
+
+    def test_search_uses_indexes(self):
+        """Testa se as buscas usam o FTS5 e a PRIMARY KEY (sem varredura)."""
+        source, where, params, ranked = self.api.build_search('saude')
+        self.assertTrue(ranked)
+        with self.api.engine.connect() as conn:
+            fts = conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN SELECT o.cnpj FROM {source}{where}",
+                params).all()
+            prefix = conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT o.cnpj FROM dim_operadoras o "
+                "WHERE o.cnpj >= ? AND o.cnpj < ?", ('112', '112:')).all()
+        self.assertIn('VIRTUAL TABLE', fts[0][-1])
+        self.assertIn('SEARCH', prefix[0][-1])
+
+
+class TestExport(ApiTestCase):
+
+    def export(self, **params):
+        return self.client.get('/api/export/despesas', params=params)
+
+    def test_ndjson_export_with_filters(self):
+        """Testa a exportação NDJSON com filtros de CNPJ, UF e datas."""
+        res = self.export(formato='ndjson')
+        rows = [json.loads(line) for line in res.text.splitlines()]
+        self.assertEqual(res.headers['content-type'], 'application/x-ndjson')
+        self.assertEqual(sum(r['valor_despesa'] for r in rows), 300.0)
+
+        rows = [json.loads(line) for line in self.export(
+            cnpj=['4455566000199', '11222333000181'],
+            data_inicio='2025-04-01').text.splitlines()]
+        self.assertEqual([(r['cnpj'], r['valor_despesa']) for r in rows],
+                         [('11222333000181', 150.0)])
+
+        rows = self.export(uf='rj').text.splitlines()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.export(cnpj=['abc']).text, '')
+
+    def test_csv_export_gzip(self):
+        """Testa o CSV comprimido em gzip quando o cliente aceita."""
+        res = self.export(formato='csv', modalidade='Cooperativa Médica')
+        self.assertEqual(res.headers['content-encoding'], 'gzip')
+
+        df = pd.read_csv(io.StringIO(res.text), sep=';', dtype={'cnpj': str})
+        self.assertEqual(list(df.columns), self.api.EXPORT_COLUMNS)
+        self.assertIn('04455566000199', set(df['cnpj']))
+        self.assertEqual(df['valor_despesa'].sum(), 300.0)
+
+    def test_export_respects_refused_gzip(self):
+        """Testa se `gzip;q=0` desliga a compressão da exportação."""
+        for accept in ('gzip;q=0, br', 'identity', 'br'):
+            res = self.client.get('/api/export/despesas',
+                                  params={'formato': 'csv'},
+                                  headers={'Accept-Encoding': accept})
+            self.assertNotIn('content-encoding', res.headers, accept)
+            self.assertTrue(res.text.startswith('cnpj;'))
+
+        res = self.client.get('/api/export/despesas',
+                              params={'formato': 'csv'},
+                              headers={'Accept-Encoding': 'br, gzip;q=0.5'})
+        self.assertEqual(res.headers['content-encoding'], 'gzip')
+
+    def test_arrow_export(self):
+        """Testa a exportação em Arrow IPC (stream)."""
+        try:
+            import pyarrow.ipc
+        except ImportError:
+            self.skipTest('pyarrow não instalado')
+        res = self.export(formato='arrow')
+        table = pyarrow.ipc.open_stream(res.content).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(str(table.schema.field('valor_despesa').type),
+                         'double')
+
+    def test_export_batches_are_bounded(self):
+        """Testa se o cursor entrega lotes do tamanho configurado."""
+        self.api.EXPORT_BATCH_SIZE = 2
+        query, params = self.api.build_export_query(None, None, None,
+                                                    None, None)
+        sizes = [len(b) for b in self.api.iter_export_batches(query, params)]
+        self.assertEqual(sizes, [2, 1])
+
+    def test_exports_do_not_use_read_pool(self):
+        """Testa se exportações abertas não ocupam o pool das consultas."""
+        self.api.EXPORT_BATCH_SIZE = 1
+        query, params = self.api.build_export_query(None, None, None,
+                                                    None, None)
+        exports = [self.api.iter_export_batches(query, params)
+                   for _ in range(self.api.API_THREADS)]
+        try:
+            for batches in exports:
+                self.assertEqual(len(next(batches)), 1)
+            self.assertEqual(self.api.engine.pool.checkedout(), 0)
+            res = self.client.get('/api/operadoras/11222333000181/despesas')
+            self.assertEqual(res.status_code, 200)
+        finally:
+            for batches in exports:
+                batches.close()
+
+    def test_invalid_parameters(self):
+        """Testa o 400 para formato ou data inválidos."""
+        self.assertEqual(self.export(formato='xml').status_code, 400)
+        self.assertEqual(self.export(data_fim='31/12/2025').status_code, 400)
+
+
+class TestSerialization(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_inputs([
+            (f'{i:014d}', f'OPERADORA {i}', 'SP', 1, 10.0)
+            for i in range(1, 60)
+        ])
+        conn, _ = self.load()
+        conn.close()
+
+    def test_compact_by_default_pretty_on_request(self):
+        """Testa o JSON compacto padrão e o indentado com ?pretty=1."""
+        compact = self.client.get('/api/operadoras', params={'limit': 50})
+        pretty = self.client.get('/api/operadoras',
+                                 params={'limit': 50, 'pretty': 1})
+
+        self.assertNotIn(b'\n', compact.content)
+        self.assertIn(b'\n    "data": [', pretty.content)
+        self.assertEqual(compact.json(), pretty.json())
+        self.assertLess(len(compact.content), len(pretty.content) * 0.7)
+
+    def test_negotiated_compression(self):
+        """Testa gzip/brotli acima do limite e resposta pequena sem compressão."""
+        import compression
+        encodings = ['gzip'] + (['br'] if compression.brotli else [])
+        for encoding in encodings:
+            res = self.client.get('/api/operadoras', params={'limit': 50},
+                                  headers={'Accept-Encoding': encoding})
+            self.assertEqual(res.headers['content-encoding'], encoding)
+            self.assertIn('Accept-Encoding', res.headers['vary'])
+            self.assertTrue(res.headers['etag'].startswith('W/'))
+            self.assertEqual(len(res.json()['data']), 50)
+
+        small = self.client.get('/api/operadoras/00000000000001',
+                                headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('content-encoding', small.headers)
+
+        plain = self.client.get('/api/operadoras', params={'limit': 50},
+                                headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('content-encoding', plain.headers)
+
+    def test_weak_etag_still_revalidates(self):
+        """Testa o 304 com o ETag fraco da resposta comprimida."""
+        res = self.client.get('/api/operadoras', params={'limit': 50},
+                              headers={'Accept-Encoding': 'gzip'})
+        again = self.client.get('/api/operadoras', params={'limit': 50},
+                                headers={'Accept-Encoding': 'gzip',
+                                         'If-None-Match': res.headers['etag']})
+        self.assertEqual(again.status_code, 304)
+
+
+class TestReadPool(ApiTestCase):
+
+    def test_read_only_pool(self):
+        """Testa se o pool da API é somente leitura e do tamanho configurado."""
+        self.assertEqual(self.api.engine.pool.size(), self.api.API_THREADS)
+        with self.api.engine.connect() as conn:
+            with self.assertRaises(OperationalError):
+                conn.exec_driver_sql("DELETE FROM fact_despesas")
+
+    def test_concurrent_requests(self):
+        """Testa requisições simultâneas compartilhando o pool."""
+        paths = ['/api/estatisticas',
+                 '/api/operadoras/11222333000181/despesas',
+                 '/api/operadoras?search=operadora'] * 10
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            codes = list(pool.map(
+                lambda path: self.client.get(path).status_code, paths))
+        self.assertEqual(set(codes), {200})
+
+
+class TestBatchLookup(ApiTestCase):
+
+    def test_profiles_and_histories_in_one_call(self):
+        """Testa o lote com históricos, duplicados e CNPJs desconhecidos."""
+        res = self.client.post('/api/operadoras/lote', json={'cnpjs': [
+            '04.455.566.0001-99', '11222333000181', '4455566000199',
+            '99999999000199', 'abc']})
+        body = res.json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([op['cnpj'] for op in body['operadoras']],
+                         ['04455566000199', '11222333000181'])
+        self.assertEqual(
+            [d['valor_despesa'] for d in body['operadoras'][1]['despesas']],
+            [150.0, 100.0])
+        self.assertEqual(body['nao_encontrados'], ['99999999000199', 'abc'])
+
+    def test_profiles_only(self):
+        """Testa o lote sem históricos."""
+        body = self.client.post('/api/operadoras/lote', json={
+            'cnpjs': ['11222333000181'], 'incluir_despesas': False}).json()
+        self.assertIsNone(body['operadoras'][0]['despesas'])
+
+    def test_batch_size_limit(self):
+        """Testa o limite de CNPJs por chamada."""
+        cnpjs = [f'{i:014d}' for i in range(self.api.BATCH_MAX_CNPJS + 1)]
+        res = self.client.post('/api/operadoras/lote', json={'cnpjs': cnpjs})
+        self.assertEqual(res.status_code, 422)
+
+
+class TestSerie(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_inputs([
+            ('11222333000181', 'OPERADORA A', 'SP', 1, 100.0),
+            ('11222333000181', 'OPERADORA A', 'SP', 1, 100.0),
+            ('11222333000181', 'OPERADORA A', 'SP', 2, 300.0),
+            ('11222333000181', 'OPERADORA A', 'SP', 3, 150.0),
+            ('04455566000199', 'OPERADORA B', 'RJ', 1, 50.0),
+        ])
+        conn, _ = self.load()
+        conn.close()
+
+    def test_quarterly_series_with_growth(self):
+        """Testa a série trimestral somada e o crescimento (LAG)."""
+        body = self.client.get('/api/operadoras/11222333000181/serie').json()
+
+        self.assertEqual(
+            [(p['periodo'], p['total'], p['qtd_lancamentos'],
+              p['crescimento_pct']) for p in body['pontos']],
+            [('2025-01-01', 200.0, 2, None),
+             ('2025-04-01', 300.0, 1, 50.0),
+             ('2025-07-01', 150.0, 1, -50.0)])
+
+    def test_yearly_series(self):
+        """Testa a série anual."""
+        body = self.client.get('/api/operadoras/11222333000181/serie',
+                               params={'granularidade': 'ano'}).json()
+        self.assertEqual(body['pontos'], [{
+            'periodo': '2025', 'total': 650.0, 'qtd_lancamentos': 4,
+            'crescimento_pct': None}])
+
+    def test_invalid_requests(self):
+        """Testa granularidade inválida e operadora inexistente."""
+        self.assertEqual(self.client.get(
+            '/api/operadoras/11222333000181/serie',
+            params={'granularidade': 'mes'}).status_code, 400)
+        self.assertEqual(self.client.get(
+            '/api/operadoras/99999999000199/serie').status_code, 404)
+
+
+class TestEstatisticas(ApiTestCase):
+
+    def test_statistics_from_aggregates(self):
+        """Testa se o dashboard responde a partir dos agregados da carga."""
+        res = self.client.get('/api/estatisticas')
+        body = res.json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(body['total_geral'], 300.0)
+        self.assertEqual(body['media_lancamento'], 100.0)
+        self.assertEqual(body['top_5_operadoras'][0],
+                         {'razao_social': 'OPERADORA A', 'total': 250.0})
+        self.assertEqual([u['uf'] for u in body['distribuicao_uf']],
+                         ['SP', 'RJ'])
+
+
+class TestResponseCache(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api.VERSION_CHECK_INTERVAL = 0
+
+    def test_etag_revalidation_returns_304(self):
+        """Testa o ETag/Cache-Control e o 304 com If-None-Match."""
+        res = self.client.get('/api/estatisticas')
+        etag = res.headers['etag']
+        self.assertIn('max-age', res.headers['cache-control'])
+
+        again = self.client.get('/api/estatisticas',
+                                headers={'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_conditional_request_on_missing_resource(self):
+        """Testa se `*` ou um ETag forjado não viram 304 num recurso inexistente."""
+        path = '/api/operadoras/00000000000000/despesas'
+        forged = self.client.get(
+            '/api/operadoras/11222333000181/despesas').headers['etag']
+        version = forged.strip('"').rsplit('-', 1)[0]
+        key = (path, ())
+        forged = (f'"{version}-'
+                  f'{hashlib.sha1(repr(key).encode()).hexdigest()[:12]}"')
+
+        for tag in ('*', forged):
+            res = self.client.get(path, headers={'If-None-Match': tag})
+            self.assertEqual(res.status_code, 404, tag)
+        res = self.client.get('/api/operadoras', params={'cursor': 'xx'},
+                              headers={'If-None-Match': '*'})
+        self.assertEqual(res.status_code, 400)
+
+        res = self.client.get('/api/estatisticas',
+                              headers={'If-None-Match': '*'})
+        self.assertEqual(res.status_code, 304)
+
+    def test_repeated_requests_hit_cache(self):
+        """Testa se a mesma rota + parâmetros é servida do cache."""
+        first = self.client.get('/api/operadoras', params={'limit': 1})
+        second = self.client.get('/api/operadoras', params={'limit': 1})
+        other = self.client.get('/api/operadoras', params={'limit': 2})
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(self.api.response_cache.hits, 1)
+        self.assertNotEqual(first.headers['etag'], other.headers['etag'])
+
+    def test_reload_invalidates_cache(self):
+        """Testa se uma nova carga (nova versão do dataset) invalida o cache."""
+        before = self.client.get('/api/estatisticas')
+
+        self.write_inputs([
+            ('11222333000181', 'OPERADORA A', 'SP', 1, 100.0),
+            ('04455566000199', 'OPERADORA B', 'RJ', 1, 900.0),
+        ])
+        conn, _ = self.load()
+        conn.close()
+
+        after = self.client.get('/api/estatisticas',
+                                headers={'If-None-Match':
+                                         before.headers['etag']})
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()['total_geral'], 1000.0)
+        self.assertNotEqual(after.headers['etag'], before.headers['etag'])
+
+    def test_unchanged_reload_keeps_etag(self):
+        """Testa se recarregar os mesmos dados preserva a versão/ETag."""
+        before = self.client.get('/api/estatisticas')
+        conn, _ = self.load()
+        conn.close()
+        after = self.client.get('/api/estatisticas')
+
+        self.assertEqual(after.headers['etag'], before.headers['etag'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+import contextlib
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cadop_registry import load_registry  # noqa: E402
+
+CADOP_SEMICOLON = (
+    '"Registro_Operadora";"CNPJ";"Razao_Social";"Modalidade";"UF"\n'
+    '300001;11222333000181;OPERADORA SAÚDE;Medicina de Grupo;SP\n'
+    '300002;22333444000155;OPERADORA VIDA;Autogestão;RJ\n'
+    '300003;11222333000181;DUPLICADA;Cooperativa Médica;MG\n'
+)
+
+
+class TestCadopRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, 'cadop.csv')
+        self.snapshot = os.path.join(self.tmp.name, 'cadop.pkl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_cadop(self, text, encoding='latin1'):
+        with open(self.csv_path, 'w', encoding=encoding) as f:
+            f.write(text)
+
+    def load(self):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            registry = load_registry(self.csv_path, self.snapshot)
+        return registry, log.getvalue()
+
+    def test_indexes_by_reg_ans_and_cnpj(self):
+        """Testa as consultas pelos dois índices (primeira ocorrência vence)."""
+        self.write_cadop(CADOP_SEMICOLON)
+        registry, _ = self.load()
+
+        self.assertEqual(registry.get('reg_ans', '300002')['RazaoSocial'],
+                         'OPERADORA VIDA')
+        self.assertEqual(registry.get('CNPJ', '11222333000181')['reg_ans'],
+                         '300001')
+        self.assertIsNone(registry.get('CNPJ', '00000000000000'))
+        self.assertEqual(registry.rows, 3)
+        self.assertEqual(len(registry.by_cnpj), 2)
+
+    def test_lookup_matches_left_merge(self):
+        """Testa se o join pelo índice equivale ao `pd.merge` à esquerda."""
+        self.write_cadop(CADOP_SEMICOLON)
+        registry, _ = self.load()
+        despesas = pd.DataFrame(
+            {'reg_ans': ['300002', '999999', '300001', '300002'],
+             'valor': [1.0, 2.0, 3.0, 4.0]}, index=[5, 6, 7, 8])
+
+        result = pd.concat([despesas, registry.lookup(
+            'reg_ans', despesas['reg_ans'],
+            columns=['CNPJ', 'RazaoSocial'])], axis=1)
+
+        cadop = pd.read_csv(self.csv_path, sep=';', encoding='latin1',
+                            dtype=str).rename(columns={
+                                'Registro_Operadora': 'reg_ans',
+                                'Razao_Social': 'RazaoSocial'})
+        expected = pd.merge(despesas, cadop[['reg_ans', 'CNPJ',
+                                             'RazaoSocial']],
+                            on='reg_ans', how='left')
+        pd.testing.assert_frame_equal(result.reset_index(drop=True),
+                                      expected)
+
+    def test_comma_separated_utf8_fallback(self):
+        """Testa a leitura do cadastro separado por vírgula em UTF-8."""
+        self.write_cadop('REG_ANS,CNPJ,NOME_RAZAO_SOCIAL,UF\n'
+                         '300001,11222333000181,OPERADORA SAÚDE,SP\n',
+                         encoding='utf-8')
+        registry, _ = self.load()
+        self.assertEqual(registry.get('reg_ans', '300001'),
+                         {'CNPJ': '11222333000181',
+                          'RazaoSocial': 'OPERADORA SAÚDE', 'UF': 'SP'})
+
+    def test_snapshot_reused_until_file_changes(self):
+        """Testa se o snapshot evita reler um cadastro inalterado."""
+        self.write_cadop(CADOP_SEMICOLON)
+        _, first_log = self.load()
+        registry, second_log = self.load()
+
+        self.assertIn('Lendo dados cadastrais', first_log)
+        self.assertIn('reaproveitado', second_log)
+        self.assertEqual(registry.get('reg_ans', '300001')['UF'], 'SP')
+
+        self.write_cadop(CADOP_SEMICOLON.replace('Medicina de Grupo;SP',
+                                                 'Medicina;AM'))
+        registry, third_log = self.load()
+        self.assertIn('Lendo dados cadastrais', third_log)
+        self.assertEqual(registry.get('reg_ans', '300001')['UF'], 'AM')
+
+    def test_missing_reg_ans_column(self):
+        """Testa o erro quando o cadastro não tem coluna de Registro ANS."""
+        self.write_cadop('CNPJ;UF\n11222333000181;SP\n')
+        with self.assertRaises(KeyError):
+            self.load()
+
+
+if __name__ == '__main__':
+    unittest.main()
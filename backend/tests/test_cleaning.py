@@ -1,12 +1,22 @@
 import unittest
 import sys
 import os
+import io
+import contextlib
+import tempfile
+import zipfile
+import multiprocessing
+from unittest import mock
 import pandas as pd
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-from stage_1_2_processing import clean_currency, normalize_dataframe  # noqa: E402
+import stage_1_2_processing  # noqa: E402
+from stage_1_2_processing import (  # noqa: E402
+    clean_currency, normalize_dataframe, load_file_content, list_zip_members,
+    iter_file_chunks, process_member, parse_currency_series, write_header
+)
 
 
 class TestDataCleaning(unittest.TestCase):
@@ -22,6 +32,23 @@ class TestDataCleaning(unittest.TestCase):
         self.assertEqual(clean_currency(""), 0.0)
         self.assertEqual(clean_currency(None), None)
         
+    def test_parse_currency_series_matches_clean_currency(self):
+        """Testa se a versão vetorizada bate com clean_currency."""
+        casos = ["1.000,00", "50,55", "0,00", "-1.234.567,89", "+7,10"]
+        valores, rejeitados = parse_currency_series(pd.Series(casos))
+
+        self.assertEqual(valores.tolist(), [clean_currency(c) for c in casos])
+        self.assertEqual(rejeitados, 0)
+
+    def test_parse_currency_series_rejects_instead_of_zero(self):
+        """Testa se sujeira vira NaN contabilizado, e não 0.0 falso."""
+        serie = pd.Series(["", None, "abc", "12,5"], dtype=object)
+        valores, rejeitados = parse_currency_series(serie)
+
+        self.assertTrue(valores.iloc[:3].isna().all())
+        self.assertEqual(valores.iloc[3], 12.5)
+        self.assertEqual(rejeitados, 1)
+
     def test_normalization_columns(self):
         """Testa se as colunas estranhas são renomeadas para o padrão oficial."""
         data = {
@@ -40,6 +67,184 @@ class TestDataCleaning(unittest.TestCase):
 
         self.assertEqual(df_clean.iloc[0]['vl_saldo_final'], 100.0)
 
+    def test_load_file_content_from_zip_stream(self):
+        """Testa a leitura direta de um membro do ZIP, sem extração."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('1T2025/1T2025.csv',
+                        'REG_ANS;CD_CONTA_CONTABIL;VL_SALDO_FINAL\n'
+                        '123456;411;1.000,50\n')
+            zf.writestr('leiame.pdf', b'%PDF')
+
+        with zipfile.ZipFile(buffer) as zf:
+            members = list_zip_members(zf)
+            self.assertEqual([m.filename for m in members],
+                             ['1T2025/1T2025.csv'])
+            with zf.open(members[0]) as member:
+                df = load_file_content(member, '1T2025.csv')
+
+        df_clean = normalize_dataframe(df, '1T2025.csv')
+        self.assertEqual(len(df_clean), 1)
+        self.assertEqual(df_clean.iloc[0]['vl_saldo_final'], 1000.5)
+
+    def test_chunked_processing_matches_full_read(self):
+        """Testa se o processamento em blocos gera o mesmo CSV que a leitura integral."""
+        linhas = ['REG_ANS;CD_CONTA_CONTABIL;VL_SALDO_FINAL']
+        for i in range(7):
+            conta = '411' if i % 2 == 0 else '311'
+            linhas.append(f'{100 + i};{conta};{i},50')
+        conteudo = ('\n'.join(linhas) + '\n').encode('latin1')
+
+        chunks = list(iter_file_chunks(io.BytesIO(conteudo), 'a.csv', 3))
+        self.assertEqual([len(c) for c in chunks], [3, 3, 1])
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('a.csv', conteudo)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'saida.csv')
+            with zipfile.ZipFile(buffer) as zf:
+                write_header(output)
+                rows = process_member(zf, zf.infolist()[0], output,
+                                      chunksize=2)
+            df_out = pd.read_csv(output, sep=';', dtype=str)
+
+        expected = normalize_dataframe(
+            load_file_content(io.BytesIO(conteudo), 'a.csv'), 'a.csv')
+        self.assertEqual(rows, 4)
+        self.assertEqual(df_out['reg_ans'].tolist(),
+                         expected['reg_ans'].tolist())
+
+    def test_failed_member_leaves_no_partial_rows(self):
+        """Testa se um membro que falha no meio não deixa linhas na saída."""
+        linhas = ['REG_ANS;CD_CONTA_CONTABIL;VL_SALDO_FINAL']
+        linhas += [f'{100 + i};411;{i},00' for i in range(6)]
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('ok.csv', '\n'.join(linhas))
+            zf.writestr('quebrado.csv', '\n'.join(linhas))
+
+        original = stage_1_2_processing.normalize_dataframe
+        blocos = []
+
+        def falha_no_segundo_bloco(df, filename):
+            if filename == 'quebrado.csv':
+                blocos.append(filename)
+                if len(blocos) == 2:
+                    raise ValueError('arquivo corrompido')
+            return original(df, filename)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'saida.csv')
+            with zipfile.ZipFile(buffer) as zf:
+                write_header(output)
+                ok, quebrado = zf.infolist()
+                process_member(zf, ok, output, chunksize=2)
+                with open(output, 'rb') as f:
+                    esperado = f.read()
+
+                with mock.patch.object(stage_1_2_processing,
+                                       'normalize_dataframe',
+                                       falha_no_segundo_bloco):
+                    with self.assertRaises(ValueError):
+                        process_member(zf, quebrado, output, chunksize=2)
+            with open(output, 'rb') as f:
+                self.assertEqual(f.read(), esperado)
+
+    def test_parallel_output_is_identical_to_sequential(self):
+        """Testa se --workers N gera o mesmo arquivo, byte a byte, que 1 worker."""
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                os.makedirs(os.path.join('data', 'raw'))
+                for tri in (1, 2):
+                    zip_path = os.path.join('data', 'raw', f'{tri}T2025.zip')
+                    with zipfile.ZipFile(zip_path, 'w') as zf:
+                        for parte in range(3):
+                            linhas = ['REG_ANS;CD_CONTA_CONTABIL;VL_SALDO_FINAL']
+                            linhas += [f'{tri}{parte}{i};41{i % 3};{i},10'
+                                       for i in range(20)]
+                            zf.writestr(f'{tri}T2025_{parte}.csv',
+                                        '\n'.join(linhas))
+
+                saidas = []
+                for workers in (1, 3):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        stage_1_2_processing.main(workers=workers,
+                                                  chunksize=7, full=True)
+                    caminho = os.path.join('data', 'processed',
+                                           'despesas_consolidadas.csv')
+                    with open(caminho, 'rb') as f:
+                        saidas.append(f.read())
+            finally:
+                os.chdir(cwd)
+
+        self.assertEqual(saidas[0], saidas[1])
+        self.assertEqual(saidas[0].count(b'\n'), 1 + 2 * 3 * 20)
+
+    def test_parallel_failure_cleans_up_workers_and_parts(self):
+        """Testa se uma falha no modo paralelo encerra os processos e remove as partes."""
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                os.makedirs(os.path.join('data', 'raw'))
+                with zipfile.ZipFile(os.path.join('data', 'raw', '1T2025.zip'),
+                                     'w') as zf:
+                    for parte in range(3):
+                        zf.writestr(f'{parte}.csv',
+                                    'REG_ANS;CD_CONTA_CONTABIL;VL_SALDO_FINAL\n'
+                                    f'{parte};411;1,00\n')
+
+                with mock.patch.object(stage_1_2_processing, 'merge_parts',
+                                       side_effect=KeyboardInterrupt):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        with self.assertRaises(KeyboardInterrupt):
+                            stage_1_2_processing.main(workers=2)
+
+                self.assertFalse(os.path.exists(
+                    stage_1_2_processing.PARTS_DIR))
+                self.assertEqual(multiprocessing.active_children(), [])
+            finally:
+                os.chdir(cwd)
+
+    def test_incremental_run_only_reprocesses_changed_zips(self):
+        """Testa se o manifesto evita reprocessar ZIPs inalterados."""
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                os.makedirs(os.path.join('data', 'raw'))
+
+                def gravar_zip(tri, valor):
+                    caminho = os.path.join('data', 'raw', f'{tri}T2025.zip')
+                    with zipfile.ZipFile(caminho, 'w') as zf:
+                        zf.writestr(f'{tri}T2025.csv',
+                                    'REG_ANS;CD_CONTA_CONTABIL;VL_SALDO_FINAL\n'
+                                    f'{tri}00;411;{valor}\n')
+
+                gravar_zip(1, '1,00')
+                gravar_zip(2, '2,00')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stage_1_2_processing.main()
+
+                gravar_zip(2, '25,00')
+                gravar_zip(3, '3,00')
+                log = io.StringIO()
+                with contextlib.redirect_stdout(log):
+                    stage_1_2_processing.main()
+
+                df = pd.read_csv(os.path.join(
+                    'data', 'processed', 'despesas_consolidadas.csv'), sep=';')
+            finally:
+                os.chdir(cwd)
+
+        self.assertIn('[Inalterado] 1T2025.zip', log.getvalue())
+        self.assertNotIn('Processando ZIP: 1T2025.zip', log.getvalue())
+        self.assertEqual(df['vl_saldo_final'].tolist(), [1.0, 25.0, 3.0])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+import stage_3_db_test  # noqa: E402
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Monta os CSVs de entrada da etapa 3 em uma pasta temporária."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs(os.path.join('data', 'processed'))
+        self.write_inputs([
+            ('11222333000181', 'OPERADORA A', 'SP', 1, 100.0),
+            ('11222333000181', 'OPERADORA A', 'SP', 2, 150.0),
+            ('04455566000199', 'OPERADORA B', 'RJ', 1, 50.0),
+        ])
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write_inputs(self, rows):
+        df = pd.DataFrame(rows, columns=['CNPJ', 'RazaoSocial', 'UF',
+                                         'Trimestre', 'ValorDespesas'])
+        df['Ano'] = 2025
+        df['Modalidade'] = 'Cooperativa Médica'
+        df['RegistroANS'] = '300001'
+        valid = df[['CNPJ', 'RazaoSocial', 'Trimestre', 'Ano',
+                    'ValorDespesas']]
+        valid.to_csv(stage_3_db_test.CSV_VALIDO, sep=';', index=False)
+        df.to_csv(stage_3_db_test.CSV_ENRIQUECIDO, sep=';', index=False)
+
+    def load(self):
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            conn = stage_3_db_test.create_and_load_db()
+        return conn, log.getvalue()
+
+
+class TestSqliteLoader(DatabaseTestCase):
+
+    def test_schema_types_and_indexes(self):
+        """Testa se o loader cria o schema tipado e os índices do DDL."""
+        conn, _ = self.load()
+        tipos = {row[1]: row[2] for row in
+                 conn.execute("PRAGMA table_info(fact_despesas)")}
+        indices = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        total = conn.execute(
+            "SELECT SUM(valor_despesa) FROM fact_despesas").fetchone()[0]
+        conn.close()
+
+        self.assertEqual(tipos['cnpj'], 'TEXT')
+        self.assertEqual(tipos['valor_despesa'], 'REAL')
+        self.assertTrue({'idx_despesas_cnpj', 'idx_despesas_data'} <= indices)
+        self.assertEqual(total, 300.0)
+
+    def test_reload_only_touches_changed_quarters(self):
+        """Testa se a recarga só reinsere os trimestres alterados."""
+        conn, _ = self.load()
+        conn.close()
+
+        self.write_inputs([
+            ('11222333000181', 'OPERADORA A', 'SP', 1, 100.0),
+            ('11222333000181', 'OPERADORA A', 'SP', 2, 999.0),
+            ('04455566000199', 'OPERADORA B', 'RJ', 1, 50.0),
+        ])
+        conn, log = self.load()
+        total = conn.execute(
+            "SELECT SUM(valor_despesa) FROM fact_despesas").fetchone()[0]
+        conn.close()
+
+        self.assertIn('Trimestres recarregados: 1 | inalterados: 1', log)
+        self.assertEqual(total, 1149.0)
+
+    def test_aggregates_follow_reload(self):
+        """Testa se os agregados materializados acompanham a recarga."""
+        conn, _ = self.load()
+        conn.close()
+
+        self.write_inputs([
+            ('11222333000181', 'OPERADORA A', 'SP', 1, 100.0),
+            ('04455566000199', 'OPERADORA B', 'RJ', 1, 50.0),
+            ('04455566000199', 'OPERADORA B', 'RJ', 3, 400.0),
+        ])
+        conn, log = self.load()
+        resumo = conn.execute("SELECT total_geral, qtd_lancamentos "
+                              "FROM agg_resumo").fetchone()
+        trimestres = conn.execute("SELECT data_referencia, total "
+                                  "FROM agg_trimestre ORDER BY 1").fetchall()
+        top = conn.execute("SELECT razao_social, total FROM "
+                           "agg_top_operadoras ORDER BY posicao").fetchall()
+        ufs = dict(conn.execute("SELECT uf, total FROM agg_uf").fetchall())
+        conn.close()
+
+        self.assertIn('Trimestres reagregados: 1', log)
+        self.assertEqual(resumo, (550.0, 3))
+        self.assertEqual(trimestres, [('2025-01-01', 150.0),
+                                      ('2025-07-01', 400.0)])
+        self.assertEqual(top, [('OPERADORA B', 450.0),
+                               ('OPERADORA A', 100.0)])
+        self.assertEqual(ufs, {'RJ': 450.0, 'SP': 100.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
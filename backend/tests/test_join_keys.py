@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from join_keys import (KeyDictionary, encode_reg_ans,  # noqa: E402
+                       encode_cnpj, decode_cnpj, MISSING_CODE)
+from normalization import normalize_cnpj_series  # noqa: E402
+from cadop_registry import CadopRegistry  # noqa: E402
+from stage_1_3_analysis import analyze_and_clean  # noqa: E402
+
+
+class TestJoinKeys(unittest.TestCase):
+
+    def test_encode_reg_ans(self):
+        """Testa a conversão do Registro ANS (texto, float de CSV e inválidos)."""
+        codes = encode_reg_ans(pd.Series(
+            ['300001', ' 300002 ', '300001.0', None, 'abc', '12.5',
+             '99999999999', '300001'], dtype=object))
+        self.assertEqual(codes.dtype, np.int32)
+        self.assertEqual(codes.tolist(), [300001, 300002, 300001, -1, -1,
+                                          -1, -1, 300001])
+
+    def test_key_dictionary_round_trip(self):
+        """Testa se o dicionário devolve o texto original das chaves."""
+        keys = KeyDictionary(['11.222.333/0001-81', '22333444000155', None,
+                              '11.222.333/0001-81'])
+        self.assertEqual(len(keys), 2)
+
+        series = pd.Series(['22333444000155', 'desconhecido', None,
+                            '11.222.333/0001-81'], dtype=object)
+        codes = keys.encode(series)
+        self.assertEqual(codes.dtype, np.int32)
+        self.assertEqual(codes.tolist(), [1, MISSING_CODE, MISSING_CODE, 0])
+        self.assertEqual(keys.decode(codes).tolist(),
+                         ['22333444000155', None, None,
+                          '11.222.333/0001-81'])
+        self.assertEqual(keys.decode(pd.array([0, None], dtype='Int32'))
+                         .tolist(), ['11.222.333/0001-81', None])
+
+    def test_cnpj_int64_matches_normalization(self):
+        """Testa se encode/decode em int64 equivale a `normalize_cnpj_series`."""
+        series = pd.Series(['11.222.333/0001-81', '00012345000195',
+                            12345000195, 12345000195.0, None, '',
+                            '123456789012345', 'N/A'], dtype=object)
+        codes = encode_cnpj(series)
+        self.assertEqual(codes.dtype, np.int64)
+        self.assertEqual(decode_cnpj(codes).tolist(),
+                         normalize_cnpj_series(series).tolist())
+
+    def test_coded_cleaning_matches_text(self):
+        """Testa se a limpeza sobre códigos gera o mesmo resultado que sobre texto."""
+        cadop = pd.DataFrame({
+            'reg_ans': ['300001', '300002', '300003', '300004'],
+            'CNPJ': ['11222333000181', '22333444000155', '11222333000181',
+                     None],
+            'RazaoSocial': ['NOME A', 'NOME B', 'NOME C', 'NOME D'],
+        })
+        despesas = pd.DataFrame({
+            'reg_ans': [300003, 300001, 300002, 999999, 300004, 300001],
+            'cd_conta_contabil': ['411', '411', '311', '411', '41', '4'],
+            'vl_saldo_final': [10.0, 0.0, 5.0, 7.0, -3.0, 2.5],
+            'Trimestre': [1] * 6,
+            'Ano': [2025] * 6,
+        })
+        registry = CadopRegistry(cadop)
+
+        coded = despesas.copy()
+        coded['reg_ans'] = encode_reg_ans(coded['reg_ans'])
+        coded = pd.concat([coded, registry.lookup_codes(
+            'reg_ans', coded['reg_ans'].to_numpy(),
+            columns=['CNPJ', 'RazaoSocial'])], axis=1)
+
+        text = despesas.assign(reg_ans=despesas['reg_ans'].astype(str))
+        text = pd.merge(text, cadop, on='reg_ans', how='left')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = analyze_and_clean(coded, registry.cnpj_keys)
+            expected = analyze_and_clean(text)
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertEqual(result['RazaoSocial'].tolist(),
+                         ['NOME C', 'N/A', 'NOME D', 'NOME C'])
+
+    def test_operators_without_cnpj_keep_their_names(self):
+        """Testa se operadoras sem CNPJ no cadastro não compartilham o nome."""
+        cadop = pd.DataFrame({
+            'reg_ans': ['1', '2', '3'],
+            'CNPJ': ['11222333000181', None, np.nan],
+            'RazaoSocial': ['A', 'B', 'C'],
+        })
+        registry = CadopRegistry(cadop)
+        despesas = pd.DataFrame({
+            'reg_ans': encode_reg_ans(pd.Series([2, 3, 1])),
+            'vl_saldo_final': [1.0, 2.0, 3.0],
+            'Trimestre': [1] * 3,
+            'Ano': [2025] * 3,
+        })
+        coded = pd.concat([despesas, registry.lookup_codes(
+            'reg_ans', despesas['reg_ans'].to_numpy(),
+            columns=['CNPJ', 'RazaoSocial'])], axis=1)
+        self.assertEqual(coded['CNPJ'].isna().tolist(), [True, True, False])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = analyze_and_clean(coded, registry.cnpj_keys)
+        self.assertEqual(result['RazaoSocial'].tolist(), ['B', 'C', 'A'])
+        self.assertEqual(result['CNPJ'].tolist(),
+                         ['N/A', 'N/A', '11222333000181'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from response_cache import ResponseCache  # noqa: E402
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_version_mismatch_is_a_miss(self):
+        """Testa se uma entrada de outra versão do dataset é descartada."""
+        cache = ResponseCache()
+        cache.set(('/a', ()), 'v1', b'{}')
+
+        self.assertEqual(cache.get(('/a', ()), 'v1'), b'{}')
+        self.assertIsNone(cache.get(('/a', ()), 'v2'))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction_by_entries_and_bytes(self):
+        """Testa a remoção da entrada menos usada ao exceder os limites."""
+        cache = ResponseCache(max_entries=2, max_bytes=10)
+        cache.set('a', 'v', b'1234')
+        cache.set('b', 'v', b'1234')
+        cache.get('a', 'v')
+        cache.set('c', 'v', b'1234')
+
+        self.assertIsNone(cache.get('b', 'v'))
+        self.assertEqual(cache.get('a', 'v'), b'1234')
+
+        cache.set('d', 'v', b'12345678')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get('d', 'v'), b'12345678')
+
+    def test_ttl_expiration(self):
+        """Testa se entradas expiram após o TTL."""
+        cache = ResponseCache(ttl=0.01)
+        cache.set('a', 'v', b'x')
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('a', 'v'))
+
+
+if __name__ == '__main__':
+    unittest.main()
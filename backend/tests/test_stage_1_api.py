@@ -0,0 +1,208 @@
+import unittest
+import sys
+import os
+import io
+import contextlib
+import tempfile
+import threading
+import functools
+import time
+import zipfile
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from stage_1_api import (  # noqa: E402
+    crawl_for_zips, crawl_many, download_file, verify_zip
+)
+from http_cache import cached_get  # noqa: E402
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Servidor estático silencioso com suporte a `Range: bytes=N-`."""
+
+    range_requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        path = self.translate_path(self.path)
+        if not range_header or not os.path.isfile(path):
+            return super().do_GET()
+
+        QuietHandler.range_requests.append(range_header)
+        with open(path, 'rb') as f:
+            data = f.read()
+        start = int(range_header.split('=')[1].rstrip('-'))
+        if start >= len(data):
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(data)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = data[start:]
+        self.send_response(206)
+        self.send_header('Content-Range',
+                         f'bytes {start}-{len(data) - 1}/{len(data)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """Sobe um servidor HTTP local servindo uma árvore de diretórios falsa."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'www')
+        os.makedirs(self.root)
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        handler = functools.partial(QuietHandler, directory=self.root)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write(self, relpath, content=b'x'):
+        path = os.path.join(self.root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+
+class TestConcurrentCrawler(LocalServerTestCase):
+
+    def test_crawl_returns_same_records(self):
+        """Testa se o crawler concorrente encontra os ZIPs da árvore local."""
+        self.write('2024/1T2024.zip')
+        self.write('2024/leiame.txt')
+        self.write('2025/1T2025.zip')
+        self.write('2025/extras/2025_2_trimestre.zip')
+        self.write('2025/extras/sem_trimestre.zip')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = crawl_many([self.base_url + '2024/',
+                                  self.base_url + '2025/'], max_workers=4)
+
+        found = sorted((r['year'], r['quarter'], r['filename'], r['url'])
+                       for r in records)
+        self.assertEqual(found, [
+            (2024, 1, '1T2024.zip', self.base_url + '2024/1T2024.zip'),
+            (2025, 1, '1T2025.zip', self.base_url + '2025/1T2025.zip'),
+            (2025, 2, '2025_2_trimestre.zip',
+             self.base_url + '2025/extras/2025_2_trimestre.zip'),
+        ])
+
+    def test_crawl_respects_max_depth(self):
+        """Testa se a profundidade máxima continua sendo respeitada."""
+        self.write('a/b/c/d/1T2020.zip')
+        self.write('a/b/2T2020.zip')
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = crawl_for_zips(self.base_url + 'a/')
+
+        self.assertEqual([r['filename'] for r in records], ['2T2020.zip'])
+
+
+class TestHttpCache(LocalServerTestCase):
+
+    def test_conditional_revalidation(self):
+        """Testa 304 para recurso inalterado e atualização quando muda."""
+        self.write('Relatorio_cadop.csv', b'v1')
+        url = self.base_url + 'Relatorio_cadop.csv'
+        cache_dir = os.path.join(self.tmp.name, 'cache')
+
+        self.assertEqual(cached_get(url, cache_dir=cache_dir),
+                         (b'v1', 'updated'))
+        self.assertEqual(cached_get(url, cache_dir=cache_dir),
+                         (b'v1', 'fresh'))
+        self.assertEqual(cached_get(url, cache_dir=cache_dir, max_age=0),
+                         (b'v1', 'revalidated'))
+
+        self.write('Relatorio_cadop.csv', b'v2')
+        futuro = time.time() + 10
+        os.utime(os.path.join(self.root, 'Relatorio_cadop.csv'),
+                 (futuro, futuro))
+        self.assertEqual(cached_get(url, cache_dir=cache_dir, max_age=0),
+                         (b'v2', 'updated'))
+
+    def test_size_based_eviction(self):
+        """Testa se o cache remove os itens menos usados ao estourar o limite."""
+        cache_dir = os.path.join(self.tmp.name, 'cache')
+        for nome in ('a', 'b', 'c'):
+            self.write(nome, b'x' * 100)
+            cached_get(self.base_url + nome, cache_dir=cache_dir,
+                       max_bytes=250)
+
+        corpos = [n for n in os.listdir(cache_dir) if n.endswith('.body')]
+        self.assertEqual(len(corpos), 2)
+        self.assertEqual(cached_get(self.base_url + 'c',
+                                    cache_dir=cache_dir)[1], 'fresh')
+
+
+class TestResumableDownload(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        QuietHandler.range_requests = []
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('1T2025.csv', 'REG_ANS;VALOR\n' * 5000)
+        self.payload = buffer.getvalue()
+        self.write('1T2025.zip', self.payload)
+        self.out = tempfile.TemporaryDirectory()
+        self.item = {'filename': '1T2025.zip',
+                     'url': self.base_url + '1T2025.zip'}
+
+    def tearDown(self):
+        self.out.cleanup()
+        super().tearDown()
+
+    def test_download_is_atomic_and_verified(self):
+        """Testa o download completo com rename atômico e testzip."""
+        res = download_file(self.item, self.out.name, chunk_size=1024)
+        final = os.path.join(self.out.name, '1T2025.zip')
+
+        self.assertEqual(res['status'], 'ok')
+        self.assertTrue(verify_zip(final, len(self.payload)))
+        self.assertFalse(os.path.exists(final + '.part'))
+
+    def test_truncated_file_is_resumed_with_range(self):
+        """Testa se um ZIP truncado é retomado via Range e não pulado."""
+        metade = len(self.payload) // 2
+        final = os.path.join(self.out.name, '1T2025.zip')
+        with open(final, 'wb') as f:
+            f.write(self.payload[:metade])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            res = download_file(self.item, self.out.name)
+
+        self.assertEqual(res['status'], 'resumed')
+        self.assertEqual(res['resumed_from'], metade)
+        self.assertEqual(QuietHandler.range_requests, [f'bytes={metade}-'])
+        with open(final, 'rb') as f:
+            self.assertEqual(f.read(), self.payload)
+
+    def test_intact_file_is_skipped(self):
+        """Testa se um ZIP íntegro já baixado não é baixado de novo."""
+        with open(os.path.join(self.out.name, '1T2025.zip'), 'wb') as f:
+            f.write(self.payload)
+
+        res = download_file(self.item, self.out.name)
+        self.assertEqual(res['status'], 'skip')
+
+
+if __name__ == '__main__':
+    unittest.main()
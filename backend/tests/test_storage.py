@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import importlib.util
+import tempfile
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+from storage import (  # noqa: E402
+    write_frame, read_frame, csv_to_parquet, parquet_path, iter_frame
+)
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow não instalado")
+class TestParquetStorage(unittest.TestCase):
+
+    def test_roundtrip_keeps_types(self):
+        """Testa se o Parquet preserva tipos reais, categorias e zeros à esquerda."""
+        df = pd.DataFrame({
+            'CNPJ': ['01234567000189', '98765432000100'],
+            'UF': ['SP', 'RJ'],
+            'Ano': ['2025', '2025'],
+            'ValorDespesas': ['10.5', '-3'],
+        })
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'dados.csv')
+            write_frame(df, csv_path, fmt='parquet', keep_csv=True)
+            self.assertTrue(os.path.exists(csv_path))
+
+            lido = read_frame(csv_path, fmt='parquet')
+
+        self.assertEqual(lido['CNPJ'].iloc[0], '01234567000189')
+        self.assertEqual(str(lido['UF'].dtype), 'category')
+        self.assertEqual(str(lido['Ano'].dtype), 'Int64')
+        self.assertEqual(lido['ValorDespesas'].tolist(), [10.5, -3.0])
+
+    def test_csv_to_parquet_in_chunks(self):
+        """Testa a conversão em blocos de um CSV intermediário."""
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'despesas.csv')
+            pd.DataFrame({
+                'reg_ans': [f'{i:06d}' for i in range(10)],
+                'vl_saldo_final': [float(i) for i in range(10)],
+            }).to_csv(csv_path, sep=';', index=False)
+
+            caminho = csv_to_parquet(csv_path, chunksize=3)
+            self.assertEqual(caminho, parquet_path(csv_path))
+            self.assertFalse(os.path.exists(csv_path))
+
+            lido = pd.read_parquet(caminho)
+
+        self.assertEqual(len(lido), 10)
+        self.assertEqual(lido['reg_ans'].iloc[0], '000000')
+        self.assertEqual(lido['vl_saldo_final'].sum(), 45.0)
+
+    def test_iter_frame_in_chunks(self):
+        """Testa a leitura em blocos nos dois formatos, só com as colunas pedidas."""
+        df = pd.DataFrame({
+            'UF': ['SP', 'RJ', 'MG', 'SP', 'BA'],
+            'ValorDespesas': [1.0, 2.0, 3.0, 4.0, 5.0],
+            'CNPJ': ['0'] * 5,
+        })
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'dados.csv')
+            write_frame(df, csv_path, fmt='parquet', keep_csv=True)
+
+            for fmt in ('csv', 'parquet'):
+                blocos = list(iter_frame(csv_path, 2, fmt=fmt,
+                                         columns=['UF', 'ValorDespesas']))
+                self.assertEqual([len(b) for b in blocos], [2, 2, 1])
+                lido = pd.concat(blocos, ignore_index=True)
+                self.assertEqual(list(lido.columns), ['UF', 'ValorDespesas'])
+                self.assertEqual(lido['UF'].astype(str).tolist(),
+                                 df['UF'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
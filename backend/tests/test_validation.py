@@ -0,0 +1,255 @@
+import unittest
+import sys
+import os
+import io
+import json
+import random
+import tempfile
+import contextlib
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+import stage_2_1_validation  # noqa: E402
+from stage_2_1_validation import (validate_cnpj_math,  # noqa: E402
+                                  validate_cnpj_vectorized,
+                                  build_default_rules)
+
+
+def make_valid_cnpj(rng):
+    """Gera um CNPJ com dígitos verificadores corretos."""
+    base = [rng.randint(0, 9) for _ in range(12)]
+    for weights in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2],
+                    [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        remainder = sum(d * w for d, w in zip(base, weights)) % 11
+        base.append(0 if remainder < 2 else 11 - remainder)
+    return ''.join(map(str, base))
+
+
+class TestCnpjValidation(unittest.TestCase):
+
+    def test_vectorized_matches_reference(self):
+        """Testa a equivalência com `validate_cnpj_math` em CNPJs aleatórios."""
+        rng = random.Random(123)
+        values = []
+        for _ in range(2000):
+            cnpj = make_valid_cnpj(rng)
+            kind = rng.randint(0, 5)
+            if kind == 1:
+                # Troca um dígito verificador
+                cnpj = cnpj[:13] + str((int(cnpj[13]) + 1) % 10)
+            elif kind == 2:
+                cnpj = f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+            elif kind == 3:
+                cnpj = cnpj[:rng.randint(0, 13)]
+            elif kind == 4:
+                cnpj = ''.join(rng.choice('0123456789abc ./-')
+                               for _ in range(rng.randint(0, 20)))
+            values.append(cnpj)
+        values += ['00000000000000', '11111111111111', '', ' ', None,
+                   np.nan, '112223330001810', '11222333000181']
+        values += values[:500]  # repetições, como nos lançamentos
+
+        series = pd.Series(values, dtype=object)
+        expected = [validate_cnpj_math(v) for v in values]
+
+        self.assertEqual(validate_cnpj_vectorized(series).tolist(), expected)
+        self.assertGreater(sum(expected), 100)
+
+    def test_keeps_index(self):
+        """Testa se o resultado fica alinhado ao índice da entrada."""
+        series = pd.Series(['11222333000181', '11222333000182'],
+                           index=[10, 20])
+        result = validate_cnpj_vectorized(series)
+        self.assertEqual(result.to_dict(), {10: True, 20: False})
+
+
+def make_consolidado(rows=300, seed=7):
+    """Consolidado sintético com linhas válidas e falhas combinadas."""
+    rng = random.Random(seed)
+    data = []
+    for i in range(rows):
+        cnpj = make_valid_cnpj(rng)
+        kind = i % 5
+        razao = f"OPERADORA {i}"
+        valor = f"{rng.uniform(1, 1000):.2f}"
+        if kind == 1:
+            cnpj = cnpj[:13] + str((int(cnpj[13]) + 1) % 10)
+        elif kind == 2:
+            valor = "0"
+        elif kind == 3:
+            cnpj, razao, valor = "N/A", "N/A", "-10.5"
+        data.append((cnpj, razao, "1", "2025", valor))
+    return pd.DataFrame(data, columns=['CNPJ', 'RazaoSocial', 'Trimestre',
+                                       'Ano', 'ValorDespesas'])
+
+
+class TestQualityRules(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs(os.path.join('data', 'processed'))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_stage(self, **kwargs):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            stage_2_1_validation.run_validation_pipeline(**kwargs)
+        return log.getvalue()
+
+    def read_outputs(self):
+        valid = pd.read_csv(stage_2_1_validation.OUTPUT_VALID, sep=';',
+                            dtype=str)
+        invalid = pd.read_csv(stage_2_1_validation.OUTPUT_INVALID, sep=';',
+                              dtype=str)
+        return valid, invalid
+
+    def test_records_every_failed_rule(self):
+        """Testa se uma linha que falha em várias regras guarda todos os motivos."""
+        make_consolidado().to_csv(stage_2_1_validation.INPUT_CSV, sep=';',
+                                  index=False)
+        self.run_stage()
+        valid, invalid = self.read_outputs()
+
+        self.assertEqual(len(valid), 120)
+        self.assertEqual(len(invalid), 180)
+        motivos = invalid.set_index('falhas_bitmask')['motivo_rejeicao']
+        self.assertEqual(motivos['7'].iloc[0],
+                         'Razão Social Vazia | Valor Zerado ou Negativo | '
+                         'CNPJ Inválido')
+        self.assertEqual(motivos['4'].iloc[0], 'CNPJ Inválido')
+
+        with open(stage_2_1_validation.OUTPUT_REPORT,
+                  encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual(report['registros'], 300)
+        self.assertEqual(report['regras']['cnpj']['falhas'], 120)
+        self.assertEqual(report['regras']['valor_positivo']['falhas'], 120)
+        self.assertEqual(report['regras']['razao_social']['falhas'], 60)
+
+    def test_chunked_matches_single_block(self):
+        """Testa se o tamanho do bloco não altera as saídas."""
+        make_consolidado().to_csv(stage_2_1_validation.INPUT_CSV, sep=';',
+                                  index=False)
+        outputs = []
+        for chunksize in (1_000, 7):
+            self.run_stage(chunksize=chunksize, full=True)
+            outputs.append(self.read_outputs())
+        for single, chunked in zip(*outputs):
+            pd.testing.assert_frame_equal(single, chunked)
+
+    def test_custom_rule(self):
+        """Testa se uma regra registrada por quem chama entra na mesma passada."""
+        make_consolidado().to_csv(stage_2_1_validation.INPUT_CSV, sep=';',
+                                  index=False)
+        registry = build_default_rules()
+
+        @registry.rule("ano_recente", "Ano Anterior a 2026")
+        def ano_recente(df):
+            return pd.to_numeric(df['Ano']) >= 2026
+
+        self.run_stage(registry=registry)
+        valid, invalid = self.read_outputs()
+        self.assertEqual(len(valid), 0)
+        self.assertTrue(invalid['motivo_rejeicao']
+                        .str.endswith('Ano Anterior a 2026').all())
+        self.assertEqual(registry.report()['regras']['ano_recente']['bit'], 3)
+        with self.assertRaises(ValueError):
+            registry.add("cnpj", "Duplicada", lambda df: df['CNPJ'].notna())
+
+    def test_skips_input_validated_in_memory(self):
+        """Testa se a etapa 2.1 não relê um consolidado já validado na 1.3."""
+        df = make_consolidado()
+        df.to_csv(stage_2_1_validation.INPUT_CSV, sep=';', index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_2_1_validation.validate_dataframe(df, chunksize=50)
+        in_memory = self.read_outputs()
+
+        self.assertIn('Nada a fazer', self.run_stage())
+        self.assertIn('Validando em blocos', self.run_stage(full=True))
+        for expected, result in zip(in_memory, self.read_outputs()):
+            pd.testing.assert_frame_equal(expected, result)
+
+    def test_in_memory_and_csv_paths_write_same_files(self):
+        """Testa se validar o DataFrame ou o CSV relido gera arquivos idênticos."""
+        df = make_consolidado()
+        df['Ano'] = 2025
+        df.loc[::7, 'RazaoSocial'] = ''
+
+        def read_bytes():
+            with open(stage_2_1_validation.OUTPUT_VALID, 'rb') as f:
+                valid = f.read()
+            with open(stage_2_1_validation.OUTPUT_INVALID, 'rb') as f:
+                return valid, f.read()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_2_1_validation.validate_dataframe(df, chunksize=50)
+        in_memory = read_bytes()
+
+        df.to_csv(stage_2_1_validation.INPUT_CSV, sep=';', index=False)
+        chunks = pd.read_csv(stage_2_1_validation.INPUT_CSV, sep=';',
+                             encoding='utf-8', dtype=str, chunksize=50)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_2_1_validation.validate_chunks(chunks)
+
+        self.assertEqual(read_bytes(), in_memory)
+        self.assertNotIn(b'N/A', in_memory[1])
+
+    def test_changed_rules_trigger_revalidation(self):
+        """Testa se editar as regras padrão invalida o consolidado já validado."""
+        df = make_consolidado()
+        df.to_csv(stage_2_1_validation.INPUT_CSV, sep=';', index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_2_1_validation.validate_dataframe(df)
+        self.assertEqual(build_default_rules().signature(),
+                         build_default_rules().signature())
+
+        def regras_editadas():
+            registry = build_default_rules()
+            registry.rules[1].check = lambda df: df['ValorDespesas'] >= 0
+            return registry
+
+        with mock.patch.object(stage_2_1_validation, 'build_default_rules',
+                               regras_editadas):
+            self.assertIn('Validando em blocos', self.run_stage())
+            self.assertIn('Nada a fazer', self.run_stage())
+        self.assertIn('Validando em blocos', self.run_stage())
+
+    def test_empty_input_replaces_previous_outputs(self):
+        """Testa se um consolidado vazio recria as saídas só com cabeçalho."""
+        df = make_consolidado()
+        df.to_csv(stage_2_1_validation.INPUT_CSV, sep=';', index=False)
+        self.run_stage()
+
+        vazio = df.iloc[0:0]
+        vazio.to_csv(stage_2_1_validation.INPUT_CSV, sep=';', index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = stage_2_1_validation.validate_dataframe(vazio)
+        valid, invalid = self.read_outputs()
+        self.assertEqual(report['registros'], 0)
+        self.assertEqual((len(valid), len(invalid)), (0, 0))
+        self.assertEqual(list(valid.columns), list(df.columns))
+        self.assertEqual(list(invalid.columns)[-2:],
+                         ['motivo_rejeicao', 'falhas_bitmask'])
+
+        self.run_stage(full=True)
+        self.assertEqual([len(out) for out in self.read_outputs()], [0, 0])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_2_1_validation.validate_chunks(iter([]))
+        valid, invalid = self.read_outputs()
+        self.assertEqual(list(valid.columns),
+                         stage_2_1_validation.INPUT_COLUMNS)
+        self.assertEqual(len(invalid), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
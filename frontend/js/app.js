@@ -68,8 +68,9 @@ createApp({
             selectedOperadora.value = op;
             loadingDetails.value = true;
             try {
-                const res = await axios.get(`${API_URL}/operadoras/${op.cnpj}/despesas`);
-                operadoraDespesas.value = res.data;
+                // Série já somada por trimestre no servidor (mais recente primeiro)
+                const res = await axios.get(`${API_URL}/operadoras/${op.cnpj}/serie`);
+                operadoraDespesas.value = [...res.data.pontos].reverse();
             } catch (e) { 
                 operadoraDespesas.value = []; 
             }
@@ -99,6 +100,7 @@ createApp({
 
         const tabClass = (tab) => `px-4 py-2 font-medium rounded ${currentTab.value === tab ? 'bg-blue-600 text-white' : 'bg-white text-gray-700 hover:bg-gray-50'}`;
         const formatMoney = (val) => val ? val.toLocaleString('pt-BR', { minimumFractionDigits: 2 }) : '0,00';
+        const formatPct = (val) => val === null || val === undefined ? '-' : `${val > 0 ? '+' : ''}${val.toLocaleString('pt-BR', { minimumFractionDigits: 2 })}%`;
         const formatDate = (dateStr) => {
             if(!dateStr) return '-';
             const [y, m, d] = dateStr.split(' ')[0].split('-');
@@ -110,7 +112,7 @@ createApp({
         return { 
             currentTab, operadoras, loading, errorMsg, page, totalItems, totalPages, searchQuery,
             stats, selectedOperadora, operadoraDespesas, loadingDetails,
-            fetchOperadoras, limparBusca, loadStats, openDetails, tabClass, formatMoney, formatDate 
+            fetchOperadoras, limparBusca, loadStats, openDetails, tabClass, formatMoney, formatPct, formatDate 
         };
     }
 }).mount('#app');
\ No newline at end of file